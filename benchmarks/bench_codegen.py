@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Native (codegen) backend vs the eval_rpn interpreter vs a hand-written lambda,
+and the native backend with the optimizer pass on and off.
+
+    python benchmarks/bench_codegen.py
+"""
+
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+
+# (expr, mode, variables, equivalent lambda)
+CASES = [
+    ('2 + 3 * 4', 'basic', {}, lambda: 2.0 + 3.0 * 4.0),
+    ('sin(3.14159/2) * 2 ^ 8', 'scientific', {}, lambda: math.sin(3.14159 / 2) * 2.0 ** 8.0),
+    ('sqrt(x^2 + y^2) * k', 'scientific', {'x': 3.0, 'y': 4.0, 'k': 2.0},
+     lambda x, y, k: math.sqrt(x ** 2.0 + y ** 2.0) * k),
+    ('0xFF & 0x0F | 15 << 2', 'programmer', {}, lambda: 0xFF & 0x0F | 15 << 2),
+]
+
+
+def per_call(fn, number: int) -> float:
+    """Best-of-5 time per call in microseconds."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    ev = Evaluator()
+    number = 20_000
+    print(f"{'expression':<28} {'mode':<11} {'interp µs':>10} {'native µs':>10} {'lambda µs':>10} {'speedup':>8}")
+    print('-' * 82)
+    for expr, mode, variables, native in CASES:
+        compiled = ev.compile(expr, mode)
+        rpn = compiled.rpn
+        t_interp = per_call(lambda: ev.eval_rpn(rpn, mode, variables), number)
+        t_native = per_call(lambda: compiled(**variables), number)
+        t_lambda = per_call(lambda: native(**variables), number)
+        print(f'{expr:<28} {mode:<11} {t_interp:>10.3f} {t_native:>10.3f} {t_lambda:>10.3f} '
+              f'{t_interp / t_native:>7.1f}x')
+
+    # generated formula with repeated constant calls and subexpressions
+    term = 'sin(3.14159/2) * x * 1 + sqrt(x^2 + y^2) - 0'
+    expr = ' + '.join([term] * 50)
+    variables = {'x': 3.0, 'y': 4.0}
+    plain = Evaluator(optimize=False).compile(expr, 'scientific')
+    optimized = Evaluator(optimize=True).compile(expr, 'scientific')
+    t_plain = per_call(lambda: plain(**variables), 2_000)
+    t_opt = per_call(lambda: optimized(**variables), 2_000)
+    print()
+    print(f'generated formula ({len(expr)} chars): optimize=False {t_plain:.2f} µs, '
+          f'optimize=True {t_opt:.2f} µs ({t_plain / t_opt:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
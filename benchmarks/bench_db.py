@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Cost of the SQLite history and result cache (kalc_engine.db).
+
+Times COUNT evaluations of distinct expressions four ways: without a store,
+with a Store (queued, batched writes), with a naive log that commits every
+row, and a second session that is answered from the result cache.
+
+    python benchmarks/bench_db.py [COUNT]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.db import SCHEMA, Store
+from kalc_engine.evaluator import Evaluator
+
+
+def expressions(count: int) -> list:
+    return [f'sqrt({i}) * {i % 97} + {i} ^ 2 / 7' for i in range(count)]
+
+
+def timed(exprs: list, ev: Evaluator) -> float:
+    t0 = time.perf_counter()
+    for expr in exprs:
+        ev.evaluate(expr, mode='scientific')
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    exprs = expressions(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        t_plain = timed(exprs, Evaluator(cache_size=0))
+
+        path = os.path.join(tmp, 'store.sqlite3')
+        store = Store(path)
+        t_store = timed(exprs, Evaluator(cache_size=0, store=store))
+        t0 = time.perf_counter()
+        store.close()
+        t_drain = time.perf_counter() - t0
+
+        # the obvious alternative: write and commit each row as it happens
+        conn = sqlite3.connect(os.path.join(tmp, 'naive.sqlite3'))
+        conn.executescript(SCHEMA)
+        ev = Evaluator(cache_size=0)
+        t0 = time.perf_counter()
+        for expr in exprs:
+            value = ev.evaluate(expr, mode='scientific')
+            conn.execute('INSERT INTO history (expression, mode, result, error, time) VALUES (?, ?, ?, ?, ?)',
+                         (expr, 'scientific', repr(value), None, time.time()))
+            conn.commit()
+        t_naive = time.perf_counter() - t0
+        conn.close()
+
+        with Store(path) as store:
+            t_warm = timed(exprs, Evaluator(cache_size=0, store=store))
+
+    per = 1e6 / count
+    print(f'{count} distinct expressions, scientific mode')
+    print(f'  no store                  : {t_plain * per:8.2f} µs/expr')
+    print(f'  Store, batched writer     : {t_store * per:8.2f} µs/expr (+{t_drain * 1e3:.0f} ms to drain at close)')
+    print(f'  commit per row            : {t_naive * per:8.2f} µs/expr')
+    print(f'  Store, next session (hits): {t_warm * per:8.2f} µs/expr')
+
+
+if __name__ == '__main__':
+    main()
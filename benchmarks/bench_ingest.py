@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Peak RSS and throughput of the mmap ingestion path as the input file grows.
+
+Each size runs in a fresh process, so ru_maxrss is that run's peak. Peak RSS
+should stay flat while the file grows.
+
+    python benchmarks/bench_ingest.py [MAX_MB]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+CHILD = '''
+import os, resource, sys, time
+sys.path.insert(0, {src!r})
+from kalc_engine.ingest import evaluate_file
+t0 = time.perf_counter()
+with open(os.devnull, 'w') as out:
+    evaluate_file({path!r}, out)
+print(time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+FORMULAS = [
+    '2 + 3 * 4 - 5 / 6',
+    '(1.5 + 2.25) * 8 % 7',
+    '.mode scientific',
+    'sin(3.14159 / 2) * 2 ^ 8',
+    'sqrt(2) * ln(10) + exp(1)',
+    '.mode programmer',
+    '0xFF & 0x0F | 15 << 2',
+    '.mode basic',
+]
+
+
+def make_file(path: str, size: int) -> None:
+    block = ('\n'.join(FORMULAS) + '\n').encode('ascii') * 4096
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block)
+            written += len(block)
+
+
+def main() -> None:
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    sizes = [mb for mb in (1, 4, 16, 64, 256, 1024) if mb <= max_mb]
+    print(f"{'file MB':>8} {'seconds':>9} {'MB/s':>8} {'peak RSS MB':>12}")
+    print('-' * 41)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'exprs.txt')
+        for mb in sizes:
+            make_file(path, mb << 20)
+            actual = os.path.getsize(path) / (1 << 20)
+            res = subprocess.run([sys.executable, '-c', CHILD.format(src=SRC, path=path)],
+                                 capture_output=True, text=True, check=True)
+            seconds, maxrss_kb = res.stdout.split()
+            seconds = float(seconds)
+            print(f'{actual:>8.0f} {seconds:>9.2f} {actual / seconds:>8.2f} {int(maxrss_kb) / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    t0 = time.perf_counter()
+    main()
+    print(f'total {time.perf_counter() - t0:.1f}s')
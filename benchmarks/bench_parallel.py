@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Throughput of evaluate_many() from 1 to N worker processes.
+
+Every expression is distinct, so each one is tokenized, parsed and evaluated:
+the worst case for the compile cache and the best case for extra cores.
+
+    python benchmarks/bench_parallel.py [COUNT] [MAX_WORKERS]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+
+
+def make_exprs(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    ops = ['+', '-', '*', '/']
+    return [' '.join(f'{rng.randint(1, 999)} {rng.choice(ops)}' for _ in range(12)) + ' 1'
+            for _ in range(count)]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    exprs = make_exprs(count)
+    ev = Evaluator()
+    print(f'{count} distinct expressions, {os.cpu_count()} CPUs')
+    print(f"{'workers':>8} {'seconds':>9} {'expr/s':>12} {'speedup':>8}")
+    print('-' * 40)
+    counts = sorted({2 ** i for i in range(max_workers.bit_length()) if 2 ** i < max_workers} | {max_workers})
+    base = None
+    for workers in counts:
+        t0 = time.perf_counter()
+        for _ in ev.evaluate_many(exprs, mode='basic', workers=workers, return_exceptions=True):
+            pass
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        print(f'{workers:>8} {elapsed:>9.2f} {count / elapsed:>12,.0f} {base / elapsed:>7.2f}x')
+        ev.cache_clear()
+
+if __name__ == '__main__':
+    main()
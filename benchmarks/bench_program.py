@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Packed Program vs List[Tuple[str, str]] RPN: memory, interpreter speed, pickling.
+
+    python benchmarks/bench_program.py [COUNT]
+"""
+
+import os
+import pickle
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.program import Program
+
+
+def make_exprs(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    ops = ['+', '-', '*', '/']
+    return [f'sqrt(x^2 + {rng.randint(1, 999)}) ' + ' '.join(
+        f'{rng.choice(ops)} {rng.uniform(0, 100):.3f}' for _ in range(8)) for _ in range(count)]
+
+
+def retained(build) -> int:
+    """Bytes still allocated after build() returns (its result is kept alive)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ev = Evaluator()
+    mode = 'scientific'
+    exprs = make_exprs(count)
+    rpns = [ev.to_rpn(ev.tokenize(e), mode) for e in exprs]
+
+    mem_rpn = retained(lambda: [ev.to_rpn(ev.tokenize(e), mode) for e in exprs])
+    mem_prog = retained(lambda: [Program.from_rpn(r, mode) for r in rpns])
+    print(f'{count} formulas')
+    print(f'  memory, tuple lists : {mem_rpn / 2**20:8.1f} MB ({mem_rpn / count:6.0f} B each)')
+    print(f'  memory, Programs    : {mem_prog / 2**20:8.1f} MB ({mem_prog / count:6.0f} B each)')
+
+    programs = [Program.from_rpn(r, mode) for r in rpns]
+    env = {'x': 1.5}
+    sample = list(zip(rpns, programs))[:2000]
+    t_rpn = min(timeit.repeat(lambda: [ev.eval_rpn(r, mode, env) for r, _ in sample], number=5, repeat=3))
+    t_prog = min(timeit.repeat(lambda: [p.run(mode, ev.functions, env) for _, p in sample], number=5, repeat=3))
+    n = len(sample) * 5
+    print(f'  interpret, eval_rpn : {t_rpn / n * 1e6:8.2f} µs/eval')
+    print(f'  interpret, Program  : {t_prog / n * 1e6:8.2f} µs/eval ({t_rpn / t_prog:.1f}x)')
+
+    for label, obj in (('tuple lists', rpns), ('Programs', programs)):
+        t0 = time.perf_counter()
+        blob = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        t1 = time.perf_counter()
+        pickle.loads(blob)
+        t2 = time.perf_counter()
+        print(f'  pickle, {label:<12}: {len(blob) / 2**20:6.1f} MB, dumps {t1 - t0:.2f}s, loads {t2 - t1:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Incremental Sheet recalculation vs re-evaluating every formula.
+
+Builds a sheet of COUNT cells: a row of inputs, and per input a short chain
+of formulas plus running totals that fan in every 100 rows, then changes one
+input, and a batch of inputs, and times the recalculation.
+
+    python benchmarks/bench_sheet.py [COUNT]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.sheet import Sheet
+
+
+def build(count: int) -> dict:
+    cells = {}
+    rows = count // 4
+    for i in range(rows):
+        cells[f'in{i}'] = float(i)
+        cells[f'net{i}'] = f'in{i} * 1.2 - 3'
+        cells[f'tax{i}'] = f'net{i} * 0.2'
+        cells[f'sum{i}'] = f'net{i} + tax{i}' if i % 100 == 0 else f'sum{i - 1} + net{i} + tax{i}'
+    return cells
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cells = build(count)
+    sheet = Sheet(ev=Evaluator(cache_size=0))
+    t0 = time.perf_counter()
+    sheet.update(cells)
+    t_build = time.perf_counter() - t0
+    print(f'{len(sheet)} cells, {len(sheet._formulas)} formulas')
+    print(f'  build + first calculation : {t_build:8.3f} s')
+
+    formulas = [(c, c.variables) for c in sheet._formulas.values()]
+    values = sheet._values
+    t0 = time.perf_counter()
+    for compiled, deps in formulas:
+        compiled(**{d: values[d] for d in deps})
+    t_full = time.perf_counter() - t0
+    print(f'  evaluate every formula    : {t_full * 1e3:8.1f} ms')
+
+    t0 = time.perf_counter()
+    sheet['in5050'] = 1.0
+    t_one = time.perf_counter() - t0
+    print(f'  one input changed         : {t_one * 1e3:8.3f} ms ({t_full / t_one:,.0f}x faster)')
+
+    t0 = time.perf_counter()
+    with sheet.batch():
+        for i in range(0, count // 4, 50):
+            sheet[f'in{i}'] = -1.0
+    t_batch = time.perf_counter() - t0
+    print(f'  batch of {count // 200} inputs        : {t_batch * 1e3:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""CLI startup cost: wall-clock per invocation and -X importtime breakdown.
+
+Times a bare interpreter, importing the package, a one-shot `kalc -e` and a
+tiny `kalc --batch`, then lists what the one-shot path imports beyond a bare
+interpreter, slowest first. --json writes the numbers for tracking across
+releases.
+
+    python benchmarks/bench_startup.py [-n RUNS] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+COMMANDS = {
+    'python': ['-c', 'pass'],
+    'import': ['-c', 'import kalc_engine.__main__'],
+    'kalc -e': ['-m', 'kalc_engine', '-e', '2 ^ 8', '-m', 'scientific'],
+    'kalc --batch': ['-m', 'kalc_engine', '--batch'],
+}
+
+
+def env() -> dict:
+    # measure what an installed kalc sees: bytecode cached, not recompiled on every run
+    e = dict(os.environ, PYTHONPATH=SRC)
+    e.pop('PYTHONDONTWRITEBYTECODE', None)
+    return e
+
+
+def wall(args, runs: int) -> dict:
+    times = []
+    for _ in range(runs + 1):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env(), input=b'1 + 1\n2 * 3\n',
+                       stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t0)
+    del times[0]  # warm-up: writes .pyc files and fills the OS cache
+    return {'min_ms': min(times) * 1e3, 'median_ms': statistics.median(times) * 1e3}
+
+
+def importtime(args) -> dict:
+    """module -> (self µs, cumulative µs), from the last -X importtime report line for it."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env(), input=b'',
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    out = {}
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        out[name.strip()] = (int(self_us), int(cum_us))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--top', type=int, default=12, help='modules to list (default: 12)')
+    parser.add_argument('--json', metavar='PATH', help='write results here')
+    args = parser.parse_args()
+
+    results = {name: wall(cmd, args.runs) for name, cmd in COMMANDS.items()}
+    base = results['python']['min_ms']
+    print(f"{'command':<14} {'min ms':>8} {'median ms':>10} {'over python':>12}")
+    print('-' * 48)
+    for name, rec in results.items():
+        print(f"{name:<14} {rec['min_ms']:>8.1f} {rec['median_ms']:>10.1f} {rec['min_ms'] - base:>12.1f}")
+
+    bare = importtime(COMMANDS['python'])
+    one_shot = importtime(COMMANDS['kalc -e'])
+    extra = {name: t for name, t in one_shot.items() if name not in bare}
+    print()
+    print(f"modules imported by `kalc -e` beyond a bare interpreter: {len(extra)}, "
+          f"{sum(t[0] for t in extra.values()) / 1e3:.1f} ms self time")
+    print(f"{'module':<36} {'self µs':>9}")
+    for name, (self_us, _) in sorted(extra.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f'{name:<36} {self_us:>9}')
+
+    if args.json:
+        doc = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'wall': results,
+            'imports': {name: t[0] for name, t in extra.items()},
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(doc, f, indent=1)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Tabulating f(x) over a range: sweep() vs calling evaluate() per point.
+
+Times sin(x) * exp(-x / 10) over COUNT points three ways: evaluate() with the
+value substituted into the text (what callers did before sweep existed),
+sweep() point by point (no NumPy) and sweep() vectorized (NumPy, if
+installed). The last run writes the whole table to a binary file and reports
+peak memory, which stays flat however large COUNT is.
+
+    python benchmarks/bench_sweep.py [COUNT]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine import vector
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.sweep import sweep_chunks, write_binary
+
+EXPR = 'sin(x) * exp(-x / 10)'
+TEMPLATE = 'sin({x}) * exp(-{x} / 10)'
+
+
+def rate(count: int, seconds: float) -> str:
+    return f'{seconds:8.3f} s  {count / seconds / 1e6:8.2f} M points/s'
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    step = 0.01
+    stop = (count - 1) * step
+    print(f'{EXPR} over {count:,} points')
+
+    # the slower ways are timed on a slice and scaled up
+    n = min(count, 100_000)
+    ev = Evaluator()
+    t0 = time.perf_counter()
+    for i in range(n):
+        ev.evaluate(TEMPLATE.format(x=f'({i * step!r})'), mode='scientific')
+    print(f'  evaluate() per point   : {rate(count, (time.perf_counter() - t0) * count / n)}')
+
+    n = min(count, 1_000_000)
+    np, vector.np = vector.np, None
+    t0 = time.perf_counter()
+    for _ in sweep_chunks(EXPR, 'x', 0, (n - 1) * step, step, mode='scientific', ev=Evaluator()):
+        pass
+    print(f'  sweep, pure Python     : {rate(count, (time.perf_counter() - t0) * count / n)}')
+    vector.np = np
+
+    if np is None:
+        print('  sweep, NumPy           : (NumPy not installed)')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'table.bin')
+        t0 = time.perf_counter()
+        with open(path, 'wb') as f:
+            write_binary(sweep_chunks(EXPR, 'x', 0, stop, step, mode='scientific', ev=Evaluator()), f)
+        elapsed = time.perf_counter() - t0
+        size = os.path.getsize(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'  sweep, NumPy to binary : {rate(count, elapsed)} ({size / 2**20:,.0f} MB written, '
+          f'peak RSS {peak:,.0f} MB)')
+
+
+if __name__ == '__main__':
+    main()
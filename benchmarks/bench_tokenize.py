@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Tokenizer scaling benchmark: input sizes from 10 B to 1 MB.
+
+The scanner is a single regex matched in place, so time per byte should stay
+flat as the input grows.
+
+    python benchmarks/bench_tokenize.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+UNIT = 'sin(3.14159 / 2) * 0xFF + 2 ^ 8 - 1.5e3 % 7 '
+
+
+def make_expr(size: int) -> str:
+    """Repeat a representative chunk until the expression is `size` bytes long."""
+    reps = size // len(UNIT) + 1
+    return (UNIT * reps)[:size]
+
+
+def bench(ev: Evaluator, expr: str) -> float:
+    """Best-of-N wall time of one tokenize() call, in seconds."""
+    runs = max(3, min(1000, 200_000 // max(len(expr), 1)))
+    best = float('inf')
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        ev.tokenize(expr)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ev = Evaluator(limits=None)  # the 1 MB input is far past the default max_tokens
+    print(f"{'bytes':>10} {'tokens':>10} {'time (ms)':>12} {'ns/byte':>10}")
+    print('-' * 46)
+    for size in SIZES:
+        expr = make_expr(size)
+        # the cut may leave a partial identifier/number; that still scans fine
+        ntok = len(ev.tokenize(expr))
+        t = bench(ev, expr)
+        print(f'{size:>10} {ntok:>10} {t * 1e3:>12.3f} {t * 1e9 / size:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Bit twiddling in a 32-bit word mode vs unbounded programmer mode.
+
+Times a hash-style mix of shifts, xors and multiplies over COUNT values:
+per value through the interpreter and through native code, in
+'programmer' (masking by hand with & 0xFFFFFFFF, as callers had to) and in
+'programmer:u32' (wrapping built in), then batched over a uint32 array
+(NumPy, if installed).
+
+    python benchmarks/bench_word.py [COUNT]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine import vector
+from kalc_engine.evaluator import Evaluator
+
+# in programmer mode ^ binds tighter than * and >>, hence the parentheses
+WORD = ('((x ^ (x >> 16)) * 0x45D9F3B) ^ (((x ^ (x >> 16)) * 0x45D9F3B) >> 16)', 'programmer:u32')
+MASKED = ('((x ^ (x >> 16)) * 0x45D9F3B & 0xFFFFFFFF) ^ (((x ^ (x >> 16)) * 0x45D9F3B & 0xFFFFFFFF) >> 16)',
+          'programmer')
+
+
+def rate(count: int, seconds: float) -> str:
+    return f'{seconds:8.3f} s  {count / seconds / 1e6:8.2f} M values/s'
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    xs = [(i * 2654435761) & 0xFFFFFFFF for i in range(count)]
+    print(f'{WORD[0]} over {count:,} values')
+    for label, (expr, mode) in (('programmer, masked', MASKED), ('programmer:u32', WORD)):
+        for how, jit in (('interpreted', 1 << 62), ('native', 0)):
+            compiled = Evaluator(jit_threshold=jit).compile(expr, mode)
+            t0 = time.perf_counter()
+            for x in xs:
+                compiled(x=x)
+            print(f'  {label:<19} {how:<12}: {rate(count, time.perf_counter() - t0)}')
+    np = vector.np
+    if np is None:
+        print('  programmer:u32      batched     : (NumPy not installed)')
+        return
+    ev = Evaluator()
+    column = np.array(xs, dtype=np.uint32)
+    t0 = time.perf_counter()
+    out = ev.evaluate_batch(*WORD, x=column)
+    print(f'  programmer:u32      batched     : {rate(count, time.perf_counter() - t0)} ({out.dtype})')
+
+
+if __name__ == '__main__':
+    main()
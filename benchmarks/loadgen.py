@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""Load generator for `kalc serve`: throughput and p50/p99 latency.
+
+Starts a server on a free port (or uses --connect HOST:PORT / --unix PATH),
+opens --connections clients that each keep --depth requests in flight, and
+reports per-request latency measured from send to response.
+
+    python benchmarks/loadgen.py [-c 8] [-d 16] [-t 5] [--bulk 0] [--jobs 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+EXPRESSIONS = ['2 + 3 * 4', '(1 + 2) * (3 + 4) / 5', 'sqrt(16) + 2 ^ 10', 'sin(3.14159 / 2) * 100',
+               'log(1000) - ln(2.718281828)', '1 / 0', 'floor(7.5) % 4']
+
+
+def make_request(rng: random.Random, i: int, bulk: int) -> bytes:
+    if bulk:
+        req = {'id': i, 'exprs': [f'{rng.randint(1, 100)} * {rng.random():.6f}' for _ in range(bulk)]}
+    elif i % 4 == 0:
+        # a unique expression now and then, so compiles show up in the tail
+        req = {'id': i, 'expr': f'{rng.randint(1, 10**6)} * 3 + {i}', 'mode': 'scientific'}
+    else:
+        req = {'id': i, 'expr': rng.choice(EXPRESSIONS), 'mode': 'scientific'}
+    return json.dumps(req).encode() + b'\n'
+
+
+async def client(open_conn, depth: int, deadline: float, bulk: int, seed: int, latencies: list) -> None:
+    reader, writer = await open_conn()
+    rng = random.Random(seed)
+    sent = []
+    i = 0
+
+    async def send_one():
+        nonlocal i
+        writer.write(make_request(rng, i, bulk))
+        sent.append(time.perf_counter())
+        i += 1
+
+    for _ in range(depth):
+        await send_one()
+    done = 0
+    while done < i:
+        line = await reader.readline()
+        if not line:
+            break
+        latencies.append(time.perf_counter() - sent[done])
+        done += 1
+        if time.perf_counter() < deadline:
+            await send_one()
+    writer.close()
+
+
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    cmd = [sys.executable, '-m', 'kalc_engine', 'serve', '--port', '0', '--jobs', str(args.jobs)]
+    proc = subprocess.Popen(cmd, env=env, stderr=subprocess.PIPE, text=True)
+    line = proc.stderr.readline()
+    if 'listening on' not in line:
+        proc.kill()
+        raise SystemExit(f'server did not start: {line.strip()}')
+    args.connect = line.rsplit(' ', 1)[1].strip()
+    return proc
+
+
+async def run(args) -> None:
+    if args.unix:
+        open_conn = lambda: asyncio.open_unix_connection(args.unix)
+    else:
+        host, port = args.connect.rsplit(':', 1)
+        open_conn = lambda: asyncio.open_connection(host, int(port))
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + args.time
+    await asyncio.gather(*(client(open_conn, args.depth, deadline, args.bulk, n, latencies)
+                           for n in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    n = len(latencies)
+    per = max(args.bulk, 1)
+
+    def pct(p: float) -> float:
+        return latencies[min(n - 1, int(p * n))] * 1000
+
+    print(f'{args.connections} connections x depth {args.depth}, bulk {args.bulk}, {elapsed:.1f}s')
+    print(f'  requests    : {n} ({n / elapsed:,.0f}/s, {n * per / elapsed:,.0f} expr/s)')
+    print(f'  latency ms  : p50 {pct(0.5):.3f}  p90 {pct(0.9):.3f}  p99 {pct(0.99):.3f}  max {latencies[-1] * 1000:.3f}')
+    reader, writer = await open_conn()
+    writer.write(b'{"op": "stats"}\n')
+    stats = json.loads(await reader.readline())['stats']
+    writer.close()
+    print(f"  server side : p50 {stats['latency_ms']['p50']:.3f}  p99 {stats['latency_ms']['p99']:.3f}  "
+          f"offloaded {stats['offloaded']}  cache hits {stats['cache']['hits']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connect', metavar='HOST:PORT', help='use a running server')
+    parser.add_argument('--unix', metavar='PATH', help='use a running server on a Unix socket')
+    parser.add_argument('-c', '--connections', type=int, default=8)
+    parser.add_argument('-d', '--depth', type=int, default=16, help='requests in flight per connection')
+    parser.add_argument('-t', '--time', type=float, default=5.0, help='seconds to run')
+    parser.add_argument('--bulk', type=int, default=0, help="send 'exprs' requests of this size")
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='worker processes for a spawned server')
+    args = parser.parse_args()
+    proc = None if (args.connect or args.unix) else start_server(args)
+    try:
+        asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
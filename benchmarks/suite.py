@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+"""Per-stage benchmark suite with baseline comparison.
+
+Times tokenize, to_rpn, eval_rpn and end-to-end evaluate (warm cache and
+cold, i.e. no cache) separately, over inputs that vary in length, nesting
+depth, operator mix and mode, plus generated worst cases. Results are
+written as JSON together with machine info; given a baseline, every
+stage that got slower than --threshold is reported and the exit status is 1.
+A stage that looks slower is timed again (up to RECHECKS more rounds, keeping
+the best) before it counts, and a slowdown under --min-diff µs never does:
+a sub-microsecond stage can move 30% on scheduler noise alone.
+
+    python benchmarks/suite.py --save baseline.json          # record
+    python benchmarks/suite.py --baseline baseline.json      # compare
+    python benchmarks/suite.py --quick -k programmer         # subset, shorter runs
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from kalc_engine.evaluator import Evaluator
+
+STAGES = ('tokenize', 'to_rpn', 'eval_rpn', 'evaluate', 'evaluate_cold')
+
+# a stage counts as regressed when it is this much slower than the baseline,
+# and by at least this many microseconds
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_DIFF = 0.5
+
+# extra timing rounds for a stage that looks slower, before it is reported
+RECHECKS = 3
+
+# (name, mode, expression)
+Case = Tuple[str, str, str]
+
+MIXES = {
+    'basic': {
+        'arith': ['+', '-', '*', '/'],
+        'mod': ['%', '+', '*'],
+    },
+    'scientific': {
+        'arith': ['+', '-', '*', '/'],
+        'pow': ['^', '*', '+', '**'],
+    },
+    'programmer': {
+        'arith': ['+', '-', '*', '%'],
+        'bitwise': ['&', '|', '<<', '>>'],
+    },
+}
+
+FUNCS = ['sin', 'cos', 'sqrt', 'abs', 'log', 'exp', 'floor', 'atan']
+
+
+def operand(mode: str, i: int) -> str:
+    v = i % 61 + 1
+    if mode == 'programmer':
+        return (hex(v), bin(v), str(v))[i % 3]
+    return (str(v), f'{v}.25', f'{v}e-1')[i % 3]
+
+
+def chain(mode: str, ops: List[str], n: int) -> str:
+    """n operands joined by the operators of a mix, cycling through them."""
+    parts = [operand(mode, 0)]
+    for i in range(1, n):
+        op = ops[i % len(ops)]
+        # keep shifts and powers small so every case evaluates
+        rhs = '1' if op in ('<<', '>>', '^', '**') else operand(mode, i)
+        parts += [op, rhs]
+    return ' '.join(parts)
+
+
+def nested(mode: str, depth: int) -> str:
+    expr = operand(mode, 1)
+    for i in range(depth):
+        expr = f'({expr} + {operand(mode, i + 2)})' if i % 2 else f'({operand(mode, i + 2)} * {expr})'
+    return expr
+
+
+def make_cases(quick: bool = False) -> List[Case]:
+    lengths = (4, 64) if quick else (4, 64, 1024)
+    depths = (8,) if quick else (8, 64, 256)
+    cases = []
+    for mode, mixes in MIXES.items():
+        for mix, ops in mixes.items():
+            for n in lengths:
+                cases.append((f'{mode}/{mix}/len{n}', mode, chain(mode, ops, n)))
+        for d in depths:
+            cases.append((f'{mode}/nest/depth{d}', mode, nested(mode, d)))
+    # functions only exist outside programmer mode
+    calls = ' + '.join(f'{FUNCS[i % len(FUNCS)]}({i % 9 + 1}.5)' for i in range(64))
+    cases.append(('scientific/funcs/len64', 'scientific', calls))
+    # generated worst cases
+    big = 16 if quick else 200
+    cases += [
+        ('worst/nested_calls', 'scientific', 'abs(' * big + '1.5' + ')' * big),
+        ('worst/unary_chain', 'basic', '- ' * big + '1'),
+        ('worst/right_assoc_pow', 'scientific', ' ^ '.join(['1'] * big)),
+        ('worst/long_literals', 'basic', ' + '.join(['1234567890.0987654321e-5'] * (big // 4))),
+        ('worst/whitespace', 'basic', (' ' * 64).join(['1', '+'] * (big // 2) + ['1'])),
+        ('worst/wide_ints', 'programmer', ' | '.join('0x' + 'F' * (i % 64 + 1) for i in range(big // 4))),
+    ]
+    return cases
+
+
+def best_per_call(fn: Callable[[], object], min_time: float, repeat: int = 5) -> Tuple[float, int]:
+    """Best-of-repeat seconds per call, with enough calls per repeat to last min_time."""
+    # like timeit: a collection landing in one run but not another is just noise
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _best_per_call(fn, min_time, repeat)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _best_per_call(fn: Callable[[], object], min_time: float, repeat: int) -> Tuple[float, int]:
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 4 >= min_time else 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best, number
+
+
+def stage_funcs(ev: Evaluator, cold: Evaluator, mode: str, expr: str) -> Dict[str, Callable[[], object]]:
+    tokens = ev.tokenize(expr)
+    rpn = ev.to_rpn(tokens, mode)
+    ev.evaluate(expr, mode)
+    return {
+        'tokenize': lambda: ev.tokenize(expr),
+        'to_rpn': lambda: ev.to_rpn(tokens, mode),
+        'eval_rpn': lambda: ev.eval_rpn(rpn, mode),
+        'evaluate': lambda: ev.evaluate(expr, mode),
+        'evaluate_cold': lambda: cold.evaluate(expr, mode),
+    }
+
+
+def machine_info() -> Dict[str, object]:
+    info = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return info
+
+
+def run(cases: List[Case], stages: Tuple[str, ...], min_time: float) -> Dict[str, Dict[str, float]]:
+    ev = Evaluator()
+    cold = Evaluator(cache_size=0)
+    results = {}
+    print(f"{'case':<34} {'stage':<14} {'µs/call':>12}")
+    print('-' * 62)
+    for name, mode, expr in cases:
+        funcs = stage_funcs(ev, cold, mode, expr)
+        for stage in stages:
+            seconds, number = best_per_call(funcs[stage], min_time)
+            key = f'{name}:{stage}'
+            results[key] = {'us': round(seconds * 1e6, 4), 'number': number, 'chars': len(expr)}
+            print(f'{name:<34} {stage:<14} {seconds * 1e6:>12.2f}')
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: dict, threshold: float, min_diff: float = DEFAULT_MIN_DIFF,
+            retime: Optional[Callable[[str], float]] = None) -> List[str]:
+    """Print the ratio against the baseline per key; return the keys that regressed.
+
+    retime(key) times one stage again (µs per call); it is used to recheck a
+    stage before calling it slower, and the best time seen is kept.
+    """
+    old = baseline['results']
+
+    def slower(us: float, base: float) -> bool:
+        return us > base * (1 + threshold) and us - base > min_diff
+
+    if baseline.get('machine', {}).get('platform') != platform.platform():
+        print(f"note: baseline was recorded on {baseline.get('machine', {}).get('platform')}")
+    regressed = []
+    print()
+    print(f"{'case:stage':<50} {'base µs':>10} {'now µs':>10} {'ratio':>7}")
+    print('-' * 80)
+    for key, rec in results.items():
+        if key not in old:
+            continue
+        base = old[key]['us']
+        if retime is not None:
+            for _ in range(RECHECKS):
+                if not slower(rec['us'], base):
+                    break
+                rec['us'] = min(rec['us'], round(retime(key), 4))
+        ratio = rec['us'] / base if base else 1.0
+        flag = ''
+        if slower(rec['us'], base):
+            flag = '  SLOWER'
+            regressed.append(key)
+        elif ratio < 1 - threshold and base - rec['us'] > min_diff:
+            flag = '  faster'
+        print(f"{key:<50} {old[key]['us']:>10.2f} {rec['us']:>10.2f} {ratio:>7.2f}{flag}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', metavar='JSON', help='write results here')
+    parser.add_argument('--save', metavar='JSON', help='write results here as a new baseline')
+    parser.add_argument('-b', '--baseline', metavar='JSON', help='compare against this baseline')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'allowed slowdown as a fraction (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--min-diff', type=float, default=DEFAULT_MIN_DIFF, metavar='US',
+                        help=f'ignore slowdowns smaller than this many µs per call (default: {DEFAULT_MIN_DIFF})')
+    parser.add_argument('-k', metavar='REGEX', help='only run cases whose name matches')
+    parser.add_argument('-s', '--stage', action='append', choices=STAGES, help='only time these stages')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs and shorter timing runs')
+    args = parser.parse_args()
+
+    cases = make_cases(args.quick)
+    if args.k:
+        cases = [c for c in cases if re.search(args.k, c[0])]
+    stages = tuple(args.stage) if args.stage else STAGES
+    min_time = 0.01 if args.quick else 0.05
+    results = run(cases, stages, min_time)
+    doc = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(doc, f, indent=1)
+            f.write('\n')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        by_name = {name: (mode, expr) for name, mode, expr in cases}
+
+        def retime(key: str) -> float:
+            name, stage = key.rsplit(':', 1)
+            funcs = stage_funcs(Evaluator(), Evaluator(cache_size=0), *by_name[name])
+            return best_per_call(funcs[stage], min_time)[0] * 1e6
+
+        regressed = compare(results, baseline, args.threshold, args.min_diff, retime)
+        if regressed:
+            print(f'\n{len(regressed)} stage(s) more than {args.threshold:.0%} slower than the baseline')
+            return 1
+        print('\nno regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,244 @@
+from __future__ import annotations  # argparse is only imported when it is needed
+
 import sys
 import os
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    import argparse
 
 # Support both module import and direct execution
 if __package__:
-    from .evaluator import Evaluator, EvalError
+    from .evaluator import MODES, Evaluator, EvalError, parse_mode
 else:
     # Direct execution: add src directory to path
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-    from kalc_engine.evaluator import Evaluator, EvalError
+    from kalc_engine.evaluator import MODES, Evaluator, EvalError, parse_mode
+
+
+def build_parser() -> argparse.ArgumentParser:
+    import argparse
+    parser = argparse.ArgumentParser(prog='kalc', description='KalcEngine — Multi-Mode Calculator')
+    parser.add_argument('-e', '--eval', metavar='EXPR', help='evaluate EXPR, print the result and exit')
+    parser.add_argument('--batch', action='store_true',
+                        help='evaluate FILE (or stdin) one expression per line, without prompts')
+    parser.add_argument('-m', '--mode', choices=MODES, default='basic', metavar='MODE',
+                        help='starting mode: basic, scientific, programmer or a word mode such as '
+                             'programmer:u32 (default: basic)')
+    parser.add_argument('--json', action='store_true', help='batch: write results as JSON Lines')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help='batch: evaluate in N worker processes (default: 1)')
+    parser.add_argument('--profile', action='store_true',
+                        help='batch: print per-stage timings and counters to stderr at the end')
+    parser.add_argument('--db', nargs='?', const='', metavar='PATH',
+                        help='log evaluations to a SQLite history, and reuse results from it '
+                             '(default PATH: ~/.kalc_history.sqlite3)')
+    parser.add_argument('file', nargs='?', default='-', help="batch: input file, '-' for stdin (default)")
+    return parser
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    import argparse
+    parser = argparse.ArgumentParser(prog='kalc serve',
+                                     description='Serve evaluations as newline-delimited JSON')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=7333, help='TCP port, 0 for any free port (default: 7333)')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('-m', '--mode', choices=MODES, default='basic', metavar='MODE',
+                        help='default mode (default: basic)')
+    parser.add_argument('-j', '--jobs', type=int, default=0, metavar='N',
+                        help='offload bulk and overflow work to N worker processes (default: 0)')
+    return parser
+
 
 ## it was a main update lmao
-def main() -> None:
-    """Interactive REPL for calculator."""
-    ev = Evaluator()
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point: interactive REPL, batch mode with --batch, or `kalc serve`."""
+    if argv is None:
+        argv = sys.argv[1:]
+    fast = one_shot_args(argv)
+    if fast is not None:
+        return one_shot(*fast)
+    if argv[:1] == ['serve']:
+        return serve(build_serve_parser().parse_args(argv[1:]))
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.eval is not None:
+        if args.batch or args.file != '-':
+            parser.error('-e cannot be combined with --batch or FILE')
+        if args.json or args.jobs != 1 or args.profile:
+            parser.error('-e cannot be combined with --json, --jobs or --profile')
+        return one_shot(args.eval, args.mode, args.db)
+    if args.batch:
+        return batch(args, parser)
+    if args.file != '-':
+        parser.error('FILE is only used with --batch')
+    store = open_store(args.db)
+    try:
+        repl(args.mode, store)
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+
+def open_store(path: Optional[str]):
+    """The db.Store for --db, or None when it wasn't given."""
+    if path is None:
+        return None
+    from kalc_engine.db import DEFAULT_PATH, Store
+    return Store(path or DEFAULT_PATH)
+
+
+def one_shot_args(argv: List[str]) -> Optional[tuple]:
+    """(expr, mode) if argv is exactly `-e EXPR [-m MODE]`, else None.
+
+    Recognised by hand so the one-shot path never imports argparse; anything
+    else, including mistakes, goes through the full parser and its messages.
+    """
+    expr = None
     mode = 'basic'
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in ('-e', '--eval', '-m', '--mode'):
+            if i + 1 == len(argv):
+                return None
+            value = argv[i + 1]
+            i += 2
+        elif arg.startswith(('--eval=', '--mode=')):
+            arg, value = arg.split('=', 1)
+            i += 1
+        elif arg[:2] in ('-e', '-m') and len(arg) > 2:
+            arg, value = arg[:2], arg[2:]
+            i += 1
+        else:
+            return None
+        if arg in ('-e', '--eval'):
+            expr = value
+        else:
+            mode = value
+    if expr is None or mode not in MODES:
+        return None
+    return expr, mode
+
+
+def one_shot(expr: str, mode: str, db: Optional[str] = None) -> int:
+    """Print the value of one expression; exit status 1 (message on stderr) if it fails."""
+    store = open_store(db)
+    try:
+        print(Evaluator(cache_size=0, store=store).evaluate(expr, mode=mode))
+    except EvalError as ee:
+        print('Error:', ee, file=sys.stderr)
+        return 1
+    except Exception as e:
+        print('Error:', str(e) or type(e).__name__, file=sys.stderr)
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+
+def batch(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    """Stream expressions from a file or stdin; exit status 1 if any line failed."""
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.profile and args.jobs > 1:
+        parser.error('--profile only works with --jobs 1')
+    if args.db is not None and (args.jobs > 1 or args.profile):
+        parser.error('--db cannot be combined with --jobs or --profile')
+    store = open_store(args.db)
+    ev = Evaluator(cache_size=65536, profile=args.profile, store=store)
+    try:
+        status = run_batch_file(args, parser, ev)
+    finally:
+        if store is not None:
+            store.close()
+    if args.profile:
+        from kalc_engine.profiler import format_snapshot
+        sys.stdout.flush()
+        sys.stderr.write(format_snapshot(ev.stats()))
+    return status
+
+
+def run_batch_file(args: argparse.Namespace, parser: argparse.ArgumentParser, ev: Evaluator) -> int:
+    from kalc_engine.batch import run_batch
+
+    if args.file == '-':
+        return 1 if run_batch(sys.stdin, sys.stdout, args.mode, args.json, ev, jobs=args.jobs) else 0
+    if os.path.isfile(args.file):
+        # regular files are memory-mapped rather than read line by line
+        from kalc_engine.ingest import evaluate_file
+        return 1 if evaluate_file(args.file, sys.stdout, args.mode, args.json, args.jobs, ev) else 0
+    try:
+        f = open(args.file, encoding='utf-8')
+    except OSError as e:
+        parser.error(f"can't open '{args.file}': {e.strerror}")
+    with f:
+        return 1 if run_batch(f, sys.stdout, args.mode, args.json, ev, jobs=args.jobs) else 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    """Run the JSON evaluation server until interrupted."""
+    import asyncio
+    from kalc_engine.server import serve as run_server
+
+    def ready(address: str) -> None:
+        print(f'kalc: listening on {address}', file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(run_server(args.host, args.port, args.unix, args.mode, max(args.jobs, 0), ready))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f'kalc: cannot listen: {e.strerror or e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+def table(ev: Evaluator, text: str, mode: str) -> None:
+    """The .table command: `EXPR VAR START STOP STEP [> FILE]`, printed or written as CSV (.bin: binary)."""
+    import re
+    from kalc_engine.sweep import sweep, sweep_chunks, write_binary, write_csv
+
+    m = re.fullmatch(r'(.*\S)\s+>\s*(\S+)', text)
+    path = None
+    if m is not None:
+        text, path = m.groups()
+    parts = text.rsplit(None, 4)
+    if len(parts) != 5:
+        print('Usage: .table EXPR VAR START STOP STEP [> FILE]')
+        return
+    expr, var = parts[:2]
+    try:
+        # bounds may be expressions too, e.g. 1e6 or 0x100
+        start, stop, step = (ev.compile(bound, mode)() for bound in parts[2:])
+        if path is None:
+            points = sweep(expr, var, start, stop, step, mode, ev)
+            print(f'{var:>24}  {expr}')
+            for x, y in points:
+                print(f'{x!r:>24}  {y!r}')
+            return
+        chunks = sweep_chunks(expr, var, start, stop, step, mode, ev)
+        if path.endswith('.bin'):
+            with open(path, 'wb') as f:
+                print(f'{write_binary(chunks, f)} rows written to {path}')
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                print(f'{write_csv(chunks, f, header=(var, expr))} rows written to {path}')
+    except KeyboardInterrupt:
+        print()
+    except OSError as e:
+        print(f"Error: can't write '{path}': {e.strerror}")
+    except Exception as e:
+        print('Error:', str(e) or type(e).__name__)
+
+
+def repl(mode: str = 'basic', store=None) -> None:
+    """Interactive REPL for calculator; store (a db.Store) keeps a history across sessions."""
+    # timing a prompt costs nothing noticeable, so .stats always has data
+    ev = Evaluator(profile=True, store=store)
     print('KalcEngine — Multi-Mode Calculator')
     print('Type expressions to evaluate. Commands start with a dot: .help')
     print()
@@ -40,6 +265,11 @@ def main() -> None:
                 print('│ COMMAND             │ DESCRIPTION                                          │')
                 print('├─────────────────────┼──────────────────────────────────────────────────────┤')
                 print('│ .mode <mode>        │ Set mode: basic, scientific, or programmer           │')
+                print('│ .mode programmer N  │ N-bit word (8, 16, 32, 64), wrapping; add "unsigned" │')
+                print('│ .stats [reset]      │ Show (or zero) timings, counters and cache hit rate  │')
+                print('│ .history [N]        │ Show the last N evaluations (needs --db)             │')
+                print('│ .table E V A B S    │ Tabulate E for V = A, A+S, ... B                     │')
+                print('│   [> FILE]          │ print, or write FILE as CSV (.bin: float64 pairs)    │')
                 print('│ .help               │ Display this help message                            │')
                 print('│ .exit / .quit       │ Exit the calculator                                  │')
                 print('└─────────────────────┴──────────────────────────────────────────────────────┘')
@@ -55,6 +285,7 @@ def main() -> None:
                 print('├───────────────────────────────────────────────────────────────────────────┤')
                 print('│ Programmer          │ 0xFF & 0b1010  (hex & binary)                       │')
                 print('│                     │ 15 << 2  (bitwise shift)                            │')
+                print('│ Programmer 32       │ ~0  -> -1, or 4294967295 when unsigned              │')
                 print('└───────────────────────────────────────────────────────────────────────────┘')
                 print()
                 print('┌───────────────────────────────────────────────────────────────────────────┐')
@@ -67,12 +298,37 @@ def main() -> None:
                 print('└───────────────────────────────────────────────────────────────────────────┘')
                 print()
                 continue
+            if cmd == 'history':
+                if store is None:
+                    print('History is off (start kalc with --db)')
+                elif len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+                    print('Usage: .history [N]')
+                else:
+                    for entry in reversed(store.history(int(parts[1]) if len(parts) == 2 else 20)):
+                        outcome = entry.result if entry.error is None else f'Error: {entry.error}'
+                        print(f'[{entry.mode}] {entry.expression} = {outcome}')
+                continue
+            if cmd == 'table':
+                table(ev, line[len('.table'):].strip(), mode)
+                continue
+            if cmd == 'stats':
+                from kalc_engine.profiler import format_snapshot
+                if len(parts) >= 2 and parts[1].lower() == 'reset':
+                    ev.stats_reset()
+                    print('stats reset')
+                elif len(parts) == 1:
+                    print(format_snapshot(ev.stats()), end='')
+                else:
+                    print('Usage: .stats [reset]')
+                continue
             if cmd == 'mode':
-                if len(parts) >= 2 and parts[1] in ('basic', 'scientific', 'programmer'):
-                    mode = parts[1]
+                from kalc_engine.batch import MODE_USAGE
+                new_mode = parse_mode(parts[1:])
+                if new_mode is not None:
+                    mode = new_mode
                     print(f'mode -> {mode}')
                 else:
-                    print('Usage: .mode <basic|scientific|programmer>')
+                    print(f'Usage: {MODE_USAGE}')
                 continue
             print(f'Unknown command: {line} (type .help)')
             continue
@@ -87,4 +343,4 @@ def main() -> None:
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Non-interactive batch evaluation: one expression per line in, one result per line out.
+
+Lines are read lazily, so input of any size streams through. Blank lines and
+lines starting with '#' are skipped, '.mode <mode>' switches the mode for the
+lines that follow and '.exit' / '.quit' stop the run. A failing line is
+reported in place and the run continues.
+"""
+import json
+import math
+from functools import partial
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from .evaluator import EvalError, Evaluator, parse_mode
+
+# lines are evaluated and written in blocks of this many (also the unit sent to workers)
+FLUSH_EVERY = 1024
+
+MODE_USAGE = '.mode <basic|scientific|programmer [8|16|32|64 [unsigned]]>'
+
+
+class Line:
+    """One input line after command handling."""
+
+    __slots__ = ('lineno', 'mode', 'expr', 'error')
+
+    def __init__(self, lineno: int, mode: str, expr, error: Optional[str] = None):
+        self.lineno = lineno
+        self.mode = mode
+        self.expr = expr  # str, or a memoryview when read by ingest
+        self.error = error  # set for bad commands; such lines are not evaluated
+
+
+def command(text: str, mode: str) -> Tuple[str, Optional[str], bool]:
+    """Apply one '.'-command line; return (mode, error message or None, stop)."""
+    parts = text[1:].split()
+    cmd = parts[0].lower() if parts else ''
+    if cmd in ('exit', 'quit'):
+        return mode, None, True
+    if cmd == 'mode':
+        new_mode = parse_mode(parts[1:])
+        if new_mode is None:
+            return mode, f'Usage: {MODE_USAGE}', False
+        return new_mode, None, False
+    return mode, f'Unknown command: {text}', False
+
+
+def read_lines(lines: Iterable[str], mode: str = 'basic') -> Iterator[Line]:
+    """Yield the expressions in lines, honouring '.mode' commands along the way."""
+    for lineno, raw in enumerate(lines, 1):
+        text = raw.strip()
+        if not text or text.startswith('#'):
+            continue
+        if text.startswith('.'):
+            mode, error, stop = command(text, mode)
+            if stop:
+                return
+            if error is not None:
+                yield Line(lineno, mode, text, error)
+            continue
+        yield Line(lineno, mode, text)
+
+
+def evaluate_line(ev: Evaluator, line: Line) -> Tuple[object, Optional[str]]:
+    """Return (result, None) or (None, error message) for one line."""
+    if line.error is not None:
+        return None, line.error
+    try:
+        return ev.evaluate(line.expr, line.mode), None
+    except EvalError as ee:
+        return None, str(ee)
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def _json_value(res):
+    # JSON has no inf/nan/complex: send those as strings
+    if isinstance(res, float) and not math.isfinite(res):
+        return str(res)
+    if isinstance(res, (int, float)):
+        return res
+    return str(res)
+
+
+def format_result(line: Line, res, error: Optional[str], json_lines: bool) -> str:
+    if json_lines:
+        expr = line.expr if isinstance(line.expr, str) else str(line.expr, 'ascii', 'replace').strip()
+        rec = {'line': line.lineno, 'expr': expr}
+        if error is None:
+            rec['result'] = _json_value(res)
+        else:
+            rec['error'] = error
+        return json.dumps(rec) + '\n'
+    if error is None:
+        return f'{res}\n'
+    return f'Error: {error}\n'
+
+
+def format_lines(ev: Evaluator, lines: Iterable[Line], json_lines: bool) -> Tuple[str, int]:
+    """Evaluate a block of lines; return (output text, number of failed lines)."""
+    failed = 0
+    buf = []
+    for line in lines:
+        res, error = evaluate_line(ev, line)
+        try:
+            text = format_result(line, res, error, json_lines)
+        except Exception as e:
+            # a value that can't be written out (e.g. an int too wide for str()) fails its line only
+            error = str(e) or type(e).__name__
+            text = format_result(line, None, error, json_lines)
+        if error is not None:
+            failed += 1
+        buf.append(text)
+    return ''.join(buf), failed
+
+
+def _format_chunk(json_lines: bool, lines: List[Line]) -> Tuple[str, int]:
+    # runs in a worker process, on that worker's warm Evaluator
+    from .parallel import worker_evaluator
+    return format_lines(worker_evaluator(), lines, json_lines)
+
+
+def run_batch(lines: Iterable[str], out: IO[str], mode: str = 'basic', json_lines: bool = False,
+              ev: Optional[Evaluator] = None, jobs: int = 1) -> int:
+    """Evaluate every expression in lines and write results to out.
+
+    With jobs > 1 blocks of lines are evaluated in that many worker processes;
+    output stays in input order. Returns the number of lines that failed.
+    """
+    from .parallel import chunked
+
+    blocks = chunked(read_lines(lines, mode), FLUSH_EVERY)
+    if jobs > 1:
+        from .parallel import imap_ordered
+        results = imap_ordered(partial(_format_chunk, json_lines), blocks, jobs)
+    else:
+        if ev is None:
+            ev = Evaluator(cache_size=65536)
+        results = (format_lines(ev, block, json_lines) for block in blocks)
+    failed = 0
+    for text, n in results:
+        out.write(text)
+        failed += n
+    out.flush()
+    return failed
@@ -0,0 +1,219 @@
+"""Compile RPN into a native Python function.
+
+The Program (packed RPN, see program) goes through the optimizer (see
+optimizer.build_dag) and the resulting DAG is turned into a Python AST once,
+compiled to a code object and wrapped as ``fn(env)``, where ``env`` maps
+variable names to values. Literals are numbers by then and every operator
+becomes the plain Python operator (or a small helper for the bitwise ops),
+so calling the result costs about as much as a hand-written lambda.
+
+With Limits, integer-capable *, ** and << call program.checked() instead,
+and the function takes the deadline as an optional second argument,
+``fn(env, deadline)``. Operands the optimizer knows to be floats skip it.
+
+In a word mode (see word) variables and function results are converted to
+the word as they are read, + - * and unary minus are masked inline, & | ^
+need nothing, and / % ** << >> call the word's operators. No limits apply
+there, since no value can outgrow the word.
+
+The semantics follow ``Evaluator.eval_rpn`` exactly.
+"""
+import ast
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .evaluator import Limits, Token
+from .optimizer import BITWISE, CHECKED, Node, build_dag
+from .program import Program, checked, fits, prog_int, strict_int
+from .word import WORDS
+
+# deeper subtrees are spilled into local temporaries so that huge generated
+# formulas never hit the recursion limit of Python's own compiler
+MAX_DEPTH = 64
+
+BINOPS = {
+    '+': ast.Add,
+    '-': ast.Sub,
+    '*': ast.Mult,
+    '/': ast.Div,
+    '%': ast.Mod,
+    '**': ast.Pow,
+    '&': ast.BitAnd,
+    '|': ast.BitOr,
+    '^': ast.BitXor,
+    '<<': ast.LShift,
+    '>>': ast.RShift,
+}
+UNARYOPS = {
+    'u-': ast.USub,
+    'u+': ast.UAdd,
+    '~': ast.Invert,
+}
+# word-mode operators that are calls rather than a masked BinOp
+WORD_HELPERS = {'/': '_div', '%': '_mod', '**': '_pow', '<<': '_lshift', '>>': '_rshift'}
+
+
+class _Builder:
+    """Turns DAG nodes into Python expressions, spilling shared or deep ones to temporaries."""
+
+    def __init__(self, mode: str, functions: Dict[str, Callable], limits: Optional[Limits] = None):
+        self.mode = mode
+        self.functions = functions
+        self.limits = limits
+        self.word = WORDS.get(mode)
+        self.namespace = {
+            '_float': float,
+            '_int': prog_int if mode == 'programmer' else strict_int,
+            '_checked': checked,
+            '_fits': fits,
+            '_limits': limits,
+        }
+        if self.word is not None:
+            self.namespace['_value'] = self.word.value
+            for op, helper in WORD_HELPERS.items():
+                self.namespace[helper] = self.word.ops[op]
+        self.body: List[ast.stmt] = []
+        self.temps = 0
+        # id(node) -> ('temp', name) | ('const', value) | ('expr', ast, depth)
+        self.refs: Dict[int, tuple] = {}
+
+    def name(self, ident: str) -> ast.Name:
+        return ast.Name(id=ident, ctx=ast.Load())
+
+    def call(self, global_name: str, *args: ast.expr) -> ast.Call:
+        return ast.Call(func=self.name(global_name), args=list(args), keywords=[])
+
+    def ref(self, node: Node) -> Tuple[ast.expr, int]:
+        # shared nodes are temporaries or constants, so a fresh AST is made per use
+        kind, *rest = self.refs[id(node)]
+        if kind == 'temp':
+            return self.name(rest[0]), 1
+        if kind == 'const':
+            return ast.Constant(rest[0]), 1
+        return rest[0], rest[1]
+
+    def as_int(self, node: Node) -> Tuple[ast.expr, int]:
+        # operands statically known to be int need no runtime check
+        expr, depth = self.ref(node)
+        if node.type == 'int':
+            return expr, depth
+        if (self.mode == 'programmer' and node.kind == 'const'
+                and isinstance(node.value, float) and node.value.is_integer()):
+            return ast.Constant(int(node.value)), 1
+        return self.call('_int', expr), depth + 1
+
+    def function(self, name: str) -> str:
+        global_name = f'_fn_{name}'
+        self.namespace[global_name] = self.functions[name]
+        return global_name
+
+    def emit(self, node: Node) -> None:
+        if node.kind == 'const':
+            self.refs[id(node)] = ('const', node.value)
+            return
+        if node.kind == 'var':
+            key = ast.Constant(node.value) if sys.version_info >= (3, 9) else ast.Index(ast.Constant(node.value))
+            expr, depth = ast.Subscript(value=self.name('env'), slice=key, ctx=ast.Load()), 1
+            if self.word is not None:
+                expr, depth = self.call('_value', expr), 2
+        elif node.kind == 'call':
+            arg, depth = self.ref(node.args[0])
+            if self.word is not None:
+                expr, depth = self.call('_value', self.call(self.function(node.op), arg)), depth + 2
+            else:
+                if node.args[0].type != 'float':
+                    arg = self.call('_float', arg)
+                expr, depth = self.call(self.function(node.op), arg), depth + 1
+        elif self.word is not None:
+            expr, depth = self.word_op(node)
+        elif node.op in UNARYOPS:
+            a, depth = self.as_int(node.args[0]) if node.op == '~' else self.ref(node.args[0])
+            expr, depth = ast.UnaryOp(op=UNARYOPS[node.op](), operand=a), depth + 1
+        else:
+            if node.op in BITWISE:
+                (a, da), (b, db) = self.as_int(node.args[0]), self.as_int(node.args[1])
+            else:
+                (a, da), (b, db) = self.ref(node.args[0]), self.ref(node.args[1])
+            # float * and ** can't grow; << always has int operands by now
+            if self.limits is not None and node.op in CHECKED and (
+                    node.op == '<<' or 'float' not in (node.args[0].type, node.args[1].type)):
+                expr = self.checked(node.op, a, b, node.args[1])
+            else:
+                expr = ast.BinOp(left=a, op=BINOPS[node.op](), right=b)
+            depth = max(da, db) + 1
+        if node.uses > 1 or depth > MAX_DEPTH:
+            target = f'_t{self.temps}'
+            self.temps += 1
+            self.body.append(ast.Assign(targets=[ast.Name(id=target, ctx=ast.Store())], value=expr))
+            self.refs[id(node)] = ('temp', target)
+        else:
+            self.refs[id(node)] = ('expr', expr, depth)
+
+    def word_op(self, node: Node) -> Tuple[ast.expr, int]:
+        word = self.word
+        refs = [self.ref(arg) for arg in node.args]
+        depth = max(d for _, d in refs) + 1
+        if len(refs) == 1:
+            (a, _), = refs
+            if node.op == 'u+':
+                return a, depth - 1
+            if node.op == '~' and not word.signed:
+                return ast.BinOp(left=a, op=ast.BitXor(), right=ast.Constant(word.mask)), depth
+            expr = ast.UnaryOp(op=UNARYOPS[node.op](), operand=a)
+            if node.op == '~':
+                return expr, depth  # ~ of a signed word stays in range
+        else:
+            right = node.args[1]
+            # a shift by a constant below the width needs no helper, just the mask (for <<)
+            small_shift = node.op in ('<<', '>>') and right.kind == 'const' and 0 <= right.value < word.bits
+            if node.op in WORD_HELPERS and not small_shift:
+                return self.call(WORD_HELPERS[node.op], refs[0][0], refs[1][0]), depth
+            expr = ast.BinOp(left=refs[0][0], op=BINOPS[node.op](), right=refs[1][0])
+            if node.op in ('&', '|', '^', '>>'):
+                return expr, depth  # in-range operands give an in-range result
+        # wrap: x & mask, or ((x + half) & mask) - half for a signed word
+        if word.signed:
+            expr = ast.BinOp(left=expr, op=ast.Add(), right=ast.Constant(word.half))
+        expr = ast.BinOp(left=expr, op=ast.BitAnd(), right=ast.Constant(word.mask))
+        if word.signed:
+            expr = ast.BinOp(left=expr, op=ast.Sub(), right=ast.Constant(word.half))
+        return expr, depth + 1
+
+    def checked(self, op: str, a: ast.expr, b: ast.expr, right: Node) -> ast.expr:
+        limits = self.limits
+        max_bits = limits.max_int_bits
+        small_shift = op == '<<' and right.kind == 'const' and (
+            limits.max_shift is None or right.value <= limits.max_shift)
+        if limits.time_budget is None and (op == '*' or small_shift):
+            # a product, or a shift by an allowed constant, is never much wider than its
+            # operands, so checking the result is enough
+            expr = ast.BinOp(left=a, op=BINOPS[op](), right=b)
+            return expr if max_bits is None else self.call('_fits', expr, ast.Constant(max_bits))
+        return self.call('_checked', ast.Constant(CHECKED[op]), a, b, self.name('_limits'), self.name('_deadline'))
+
+    def build(self, root: Node, nodes: List[Node]) -> ast.Module:
+        for node in nodes:
+            self.emit(node)
+        self.body.append(ast.Return(value=self.ref(root)[0]))
+        # parse the signature rather than building FunctionDef by hand: its fields differ across versions
+        module = ast.parse('def _kalc(env, _deadline=None):\n    pass\n')
+        module.body[0].body = self.body
+        return ast.fix_missing_locations(module)
+
+
+def compile_program(program: Program, mode: str, functions: Dict[str, Callable],
+                    optimize: bool = True, limits: Optional[Limits] = None) -> Callable[[dict], object]:
+    """Return a native function ``fn(env)`` computing the same value as program.run(mode, functions, env, limits)."""
+    root, nodes = build_dag(program, mode, functions, optimize, limits)
+    builder = _Builder(mode, functions, limits)
+    module = builder.build(root, nodes)
+    code = compile(module, '<kalc>', 'exec')
+    namespace = builder.namespace
+    exec(code, namespace)  # runs only the generated 'def', never user text
+    return namespace.pop('_kalc')
+
+
+def compile_rpn(rpn: List[Token], mode: str, functions: Dict[str, Callable],
+                optimize: bool = True, limits: Optional[Limits] = None) -> Callable[[dict], object]:
+    """Return a native function ``fn(env)`` computing the same value as eval_rpn(rpn, mode, env)."""
+    return compile_program(Program.from_rpn(rpn, mode), mode, functions, optimize, limits)
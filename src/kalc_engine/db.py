@@ -0,0 +1,331 @@
+"""Evaluation history and a persistent result cache in SQLite.
+
+A Store keeps two tables in one database file (WAL mode, so readers never
+wait for the writer):
+
+- ``history``: one row per evaluation (expression, mode, result or error,
+  time), newest kept, oldest pruned beyond max_history rows;
+- ``results``: the value of every *pure* expression seen (no variables, only
+  built-in functions), keyed by (expression, mode, limits), so a later
+  session gets the answer without parsing. Limits are part of the key
+  because they decide whether an expression fails at all. Entries are pruned
+  least recently used first beyond max_results.
+
+Writes never happen on the caller's thread. They are queued and a
+background thread inserts them in batches, one transaction per batch, so
+logging a large batch run costs a queue put per line, not a commit.
+
+    store = Store('kalc.sqlite3')
+    ev = Evaluator(store=store)
+    ev.evaluate('2 ^ 10', mode='scientific')
+    store.history(limit=10)
+    store.close()
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple, Union
+
+from .evaluator import FUNCTIONS, CompiledExpression, EvalError, Evaluator, Limits
+from .optimizer import PURE_FUNCTIONS
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.kalc_history.sqlite3')
+
+# writer: rows per transaction, and how long a partial batch may wait
+FLUSH_EVERY = 1024
+FLUSH_INTERVAL = 0.5
+
+# prune only once a table is this far over its limit, so deletes come in batches too
+PRUNE_SLACK = 0.1
+
+HistoryEntry = namedtuple('HistoryEntry', ['id', 'expression', 'mode', 'result', 'error', 'time'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    expression TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_expression_mode ON history (expression, mode);
+CREATE TABLE IF NOT EXISTS results (
+    expression TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    limits TEXT NOT NULL,
+    value TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (expression, mode, limits)
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+# queued writes
+_HISTORY, _RESULT, _TOUCH, _FLUSH, _STOP = range(5)
+
+
+def encode(value: Union[int, float]) -> str:
+    # ints stay exact at any width; repr round-trips floats, inf and nan included
+    try:
+        return repr(value)
+    except ValueError:
+        return hex(value)  # an int past the interpreter's decimal digit limit
+
+
+def decode(text: str) -> Union[int, float, str]:
+    try:
+        return int(text, 16) if text.startswith(('0x', '-0x')) else int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text  # history of a result that isn't a plain number
+
+
+def limits_key(limits: Optional[Limits]) -> str:
+    # the full policy: a result computed under one set of limits may be refused under another
+    return repr(tuple(limits)) if limits is not None else 'None'
+
+
+def is_pure(ev: Evaluator, compiled: CompiledExpression) -> bool:
+    """True if the result depends on nothing but the text and mode (no variables, built-in functions only)."""
+    program = compiled.program
+    if program.names:
+        return False
+    for name in program.functions:
+        name = name.lower()
+        if name not in PURE_FUNCTIONS or ev.functions.get(name) is not FUNCTIONS.get(name):
+            return False
+    return True
+
+
+class Store:
+    """History log and cross-session result cache backed by one SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_PATH, max_results: int = 100_000, max_history: int = 1_000_000,
+                 flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.max_results = max_results
+        self.max_history = max_history
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        # the reader is shared by caller threads; the writer thread opens its own connection
+        self._reader = conn
+        self._read_lock = threading.Lock()
+        self._limits_keys: Dict[Optional[Limits], str] = {}
+        self._queue: 'queue.Queue[tuple]' = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._writer = threading.Thread(target=self._write_loop, name='kalc-db-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL is crash-safe at NORMAL; only the last batches can be lost on power failure
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # -- evaluation ------------------------------------------------------
+
+    def evaluate(self, ev: Evaluator, expr, mode: str, variables: dict) -> Union[int, float]:
+        """Evaluator.evaluate through the store: served from the result cache when possible, always logged."""
+        if isinstance(expr, memoryview) and not expr.readonly:
+            expr = bytes(expr)
+        text = expr if isinstance(expr, str) else bytes(expr).decode('ascii', 'replace')
+        prof = ev.profile
+        limits = self._limits_keys.get(ev.limits)
+        if limits is None:
+            limits = self._limits_keys[ev.limits] = limits_key(ev.limits)
+        # results already compiled in this process are cheaper to recompute than to look up
+        fresh = not variables and (expr, mode) not in ev._cache
+        try:
+            # with the built-in function table, a cached result can be served without parsing
+            if fresh and ev.functions is FUNCTIONS:
+                value = self._lookup(text, mode, limits)
+                if value is not None:
+                    self.record(text, mode, value)
+                    return value
+            compiled = prof.compile(ev, expr, mode) if prof is not None else ev.compile(expr, mode)
+            # with a table of its own, only if the expression calls none of the functions it changed
+            if fresh and ev.functions is not FUNCTIONS and is_pure(ev, compiled):
+                value = self._lookup(text, mode, limits)
+                if value is not None:
+                    self.record(text, mode, value)
+                    return value
+            value = prof.execute(compiled, variables) if prof is not None else compiled(**variables)
+        except Exception as e:
+            self.record(text, mode, error=str(e) or type(e).__name__)
+            raise
+        # not e.g. the complex result of (-8) ** 0.5
+        if fresh and isinstance(value, (int, float)) and is_pure(ev, compiled):
+            self._put(_RESULT, (text, mode, limits, encode(value), time.time()))
+        self.record(text, mode, value)
+        return value
+
+    def lookup(self, expression: str, mode: str, limits: Optional[Limits] = Limits()) -> Optional[Union[int, float]]:
+        """The cached value of a pure expression evaluated under limits, or None."""
+        return self._lookup(expression, mode, limits_key(limits))
+
+    def _lookup(self, expression: str, mode: str, limits: str) -> Optional[Union[int, float]]:
+        with self._read_lock:
+            row = self._reader.execute('SELECT value FROM results WHERE expression = ? AND mode = ? AND limits = ?',
+                                       (expression, mode, limits)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._put(_TOUCH, (time.time(), expression, mode, limits))
+        return decode(row[0])
+
+    def record(self, expression: str, mode: str, result: Union[int, float, None] = None,
+               error: Optional[str] = None) -> None:
+        """Queue one history row; it is written with the next batch."""
+        self._put(_HISTORY, (expression, mode, None if error is not None else encode(result), error, time.time()))
+
+    def _put(self, kind: int, row: tuple) -> None:
+        if self._error is None:  # after a write failure, stop queueing what can't be written
+            self._queue.put((kind, row))
+
+    # -- queries ---------------------------------------------------------
+
+    def history(self, limit: int = 20, mode: Optional[str] = None,
+                expression: Optional[str] = None) -> List[HistoryEntry]:
+        """The most recent evaluations, newest first (flushes queued writes first)."""
+        self.flush()
+        sql = 'SELECT id, expression, mode, result, error, time FROM history'
+        where, args = [], []
+        if expression is not None:
+            where.append('expression = ?')
+            args.append(expression)
+        if mode is not None:
+            where.append('mode = ?')
+            args.append(mode)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        args.append(limit)
+        with self._read_lock:
+            rows = self._reader.execute(sql, args).fetchall()
+        return [HistoryEntry(i, e, m, None if r is None else decode(r), err, t) for i, e, m, r, err, t in rows]
+
+    def counts(self) -> Tuple[int, int]:
+        """(history rows, cached results), after pending writes."""
+        self.flush()
+        with self._read_lock:
+            return (self._reader.execute('SELECT count(*) FROM history').fetchone()[0],
+                    self._reader.execute('SELECT count(*) FROM results').fetchone()[0])
+
+    def clear(self) -> None:
+        self.flush()
+        with self._read_lock:
+            self._reader.execute('DELETE FROM history')
+            self._reader.execute('DELETE FROM results')
+            self._reader.commit()
+
+    # -- writer ----------------------------------------------------------
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed."""
+        if self._error is not None:
+            raise EvalError(f'History store failed: {self._error}')
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self) -> None:
+        """Write what is queued and close the database."""
+        if self._writer.is_alive():
+            self._queue.put((_STOP, None))
+            self._writer.join()
+        self._reader.close()
+
+    def __enter__(self) -> 'Store':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        try:
+            rows = {'history': self._count(conn, 'history'), 'results': self._count(conn, 'results')}
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.flush_every and batch[-1][0] not in (_FLUSH, _STOP):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                stop = self._write(conn, batch, rows)
+        except BaseException as e:
+            self._error = e
+            # release anyone waiting in flush()
+            while True:
+                try:
+                    kind, arg = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == _FLUSH:
+                    arg.set()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, table: str) -> int:
+        return conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+
+    def _write(self, conn: sqlite3.Connection, batch: list, rows: dict) -> bool:
+        history, results, touched, waiting = [], [], [], []
+        stop = False
+        for kind, arg in batch:
+            if kind == _HISTORY:
+                history.append(arg)
+            elif kind == _RESULT:
+                results.append(arg)
+            elif kind == _TOUCH:
+                touched.append(arg)
+            elif kind == _FLUSH:
+                waiting.append(arg)
+            else:
+                stop = True
+        with conn:  # one transaction for the whole batch
+            if history:
+                conn.executemany('INSERT INTO history (expression, mode, result, error, time) '
+                                 'VALUES (?, ?, ?, ?, ?)', history)
+                rows['history'] += len(history)
+            if results:
+                before = conn.total_changes
+                conn.executemany('INSERT OR IGNORE INTO results (expression, mode, limits, value, used) '
+                                 'VALUES (?, ?, ?, ?, ?)', results)
+                rows['results'] += conn.total_changes - before
+            if touched:
+                conn.executemany('UPDATE results SET used = ? WHERE expression = ? AND mode = ? AND limits = ?',
+                                 touched)
+            if rows['history'] > self.max_history * (1 + PRUNE_SLACK):
+                conn.execute('DELETE FROM history WHERE id <= (SELECT id FROM history ORDER BY id DESC '
+                             'LIMIT 1 OFFSET ?)', (self.max_history,))
+                rows['history'] = self._count(conn, 'history')
+            if rows['results'] > self.max_results * (1 + PRUNE_SLACK):
+                conn.execute('DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY used '
+                             'LIMIT ?)', (rows['results'] - self.max_results,))
+                rows['results'] = self._count(conn, 'results')
+        for done in waiting:
+            done.set()
+        return stop
@@ -1,86 +1,259 @@
 import math
 import re
-from typing import List, Tuple, Union
+import time
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple, Union
 
 Token = Tuple[str, str]  # (type, value)
+# fixed-width programmer modes, 'programmer:i8' .. 'programmer:u64' (see word)
+WORD_MODES = tuple(f'programmer:{sign}{bits}' for sign in 'iu' for bits in (8, 16, 32, 64))
+MODES = ('basic', 'scientific', 'programmer') + WORD_MODES
+# modes where ^ is xor and decimal literals without a point are ints
+PROGRAMMER_MODES = frozenset(('programmer',) + WORD_MODES)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+# Resource limits for one evaluation; None switches a single limit off.
+# max_tokens and max_depth (parenthesis nesting) are checked while parsing;
+# max_exponent and max_shift bound the right operand of integer ** and <<,
+# and max_int_bits the width of any integer literal or result (by default
+# small enough that str() of the result stays under CPython's 4300-digit
+# limit, so every result that passes can be printed). Those are
+# checked before the operation runs, so 2 ** 2 ** 30 fails at once instead
+# of building a 128 MB int. time_budget (seconds) is checked before every
+# step that can be slow, i.e. integer *, ** and <<.
+Limits = namedtuple('Limits', ['max_tokens', 'max_depth', 'max_exponent', 'max_shift', 'max_int_bits',
+                               'time_budget'],
+                    defaults=[100_000, 1_000, 65_536, 65_536, 14_000, None])
+
+# supported functions and operators, built once per process and shared by every Evaluator
+FUNCTIONS = MappingProxyType({
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+    'log': math.log10,
+    'ln': math.log,
+    'exp': math.exp,
+    'sqrt': math.sqrt,
+    'abs': abs,
+    'floor': math.floor,
+    'ceil': math.ceil,
+})
+
+OPS = MappingProxyType({
+    '+': (2, 'left'),
+    '-': (2, 'left'),
+    '*': (3, 'left'),
+    '/': (3, 'left'),
+    '%': (3, 'left'),
+    '**': (5, 'right'),
+    '^': (4, 'right'),  # interpreted per-mode: either pow or xor
+    '&': (1, 'left'),
+    '|': (1, 'left'),
+    '~': (6, 'right'),
+    'u+': (5, 'right'),  # binds tighter than * and xor, looser than a following **
+    'u-': (5, 'right'),
+    '<<': (1, 'left'),
+    '>>': (1, 'left'),
+})
+
+
 class EvalError(Exception):
     pass
+
+
+class TokenError(EvalError):
+    """Raised by the scanner; ``column`` is the 1-based position of the bad input."""
+
+    def __init__(self, message: str, column: int):
+        super().__init__(message)
+        self.column = column
+
+    def __reduce__(self):
+        # keep column when sent between processes
+        return type(self), (str(self), self.column)
+
+
+class LimitError(EvalError):
+    """An expression went over one of the evaluator's Limits; ``limit`` is the field name."""
+
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self):
+        return type(self), (str(self), self.limit)
+
+
+def parse_mode(words: List[str]) -> Optional[str]:
+    """The mode named by the arguments of a '.mode' command, or None if they name none.
+
+    'programmer 32' is 'programmer:i32' and 'programmer 32 unsigned' is
+    'programmer:u32'; a single word is taken as a mode name as it is.
+    """
+    if len(words) == 1:
+        return words[0] if words[0] in MODES else None
+    if 2 <= len(words) <= 3 and words[0] == 'programmer' and words[2:] in ([], ['signed'], ['unsigned']):
+        mode = f"programmer:{'u' if words[2:] == ['unsigned'] else 'i'}{words[1]}"
+        return mode if mode in WORD_MODES else None
+    return None
+
+
+class CompiledExpression:
+    """An expression parsed once for a given mode, ready to be evaluated many times.
+
+    It holds the packed Program (see program) and runs it on the interpreter
+    until it gets hot, then switches to native code. Pickling sends only
+    (expr, mode, program); the copy is bound to the receiving process'
+    default_evaluator().
+    """
+
+    __slots__ = ('expr', 'mode', 'program', '_evaluator', '_fn', '_calls')
+
+    def __init__(self, evaluator: 'Evaluator', expr: str, mode: str, program):
+        self._evaluator = evaluator
+        self.expr = expr
+        self.mode = mode
+        self.program = program
+        self._fn = None  # native function, built by codegen once the expression is hot
+        self._calls = 0
+        if evaluator.jit_threshold == 0:
+            self.native()
+
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        """Names of the free variables, in order of first appearance."""
+        return self.program.names
+
+    @property
+    def rpn(self) -> List[Token]:
+        return self.program.to_rpn()
+
+    def native(self):
+        """Compile to a native Python function now (normally done after jit_threshold calls)."""
+        if self._fn is None:
+            from .codegen import compile_program
+            ev = self._evaluator
+            t0 = time.perf_counter()
+            self._fn = compile_program(self.program, self.mode, ev.functions, ev.optimize, ev.limits)
+            if ev.profile is not None:
+                ev.profile.add('codegen', time.perf_counter() - t0)
+        return self._fn
+
+    def __call__(self, /, **variables) -> Union[int, float]:
+        fn = self._fn
+        ev = self._evaluator
+        deadline = None if ev._time_budget is None else time.perf_counter() + ev._time_budget
+        if fn is None:
+            # building native code costs about ten interpreted runs, so only hot expressions get it
+            self._calls += 1
+            if self._calls < ev.jit_threshold:
+                res = self.program.run(self.mode, ev.functions, variables, ev.limits, deadline)
+                if self.mode == 'programmer' and isinstance(res, float) and res.is_integer():
+                    return int(res)
+                return res
+            fn = self.native()
+        try:
+            res = fn(variables) if deadline is None else fn(variables, deadline)
+        except KeyError as e:
+            name = e.args[0] if e.args else None
+            if name in self.program.names and name not in variables:
+                raise EvalError(f'Unknown variable: {name}') from None
+            raise
+        # normalize programmer integer-like floats to int
+        if self.mode == 'programmer' and isinstance(res, float) and res.is_integer():
+            return int(res)
+        return res
+
+    evaluate = __call__
+
+    def __reduce__(self):
+        return _load_compiled, (self.expr, self.mode, self.program)
+
+    def __repr__(self) -> str:
+        return f'CompiledExpression({self.expr!r}, mode={self.mode!r})'
+
+
+def _load_compiled(expr, mode: str, program) -> CompiledExpression:
+    return CompiledExpression(default_evaluator(), expr, mode, program)
+
+
 ## nothing
 class Evaluator:
     # instead of parsing and executing every single time, we parse and execute only 1 time to avoid wasting time and memory
-    NUMBER_RE = re.compile(r"^0[bB][01]+|^0[oO][0-7]+|^0[xX][0-9a-fA-F]+|^\d*\.?\d+(?:[eE][+-]?\d+)?")
-    IDENT_RE = re.compile(r"^[A-Za-z_]\w*")
-
-    def __init__(self):
-        # Define supported functions and operators
-        self.functions = {
-            'sin': math.sin,
-            'cos': math.cos,
-            'tan': math.tan,
-            'asin': math.asin,
-            'acos': math.acos,
-            'atan': math.atan,
-            'log': lambda x: math.log10(x),
-            'ln': math.log,
-            'exp': math.exp,
-            'sqrt': math.sqrt,
-            'abs': abs,
-            'floor': math.floor,
-            'ceil': math.ceil,
-        }
-
-        self.ops = {
-            '+': (2, 'left'),
-            '-': (2, 'left'),
-            '*': (3, 'left'),
-            '/': (3, 'left'),
-            '%': (3, 'left'),
-            '**': (5, 'right'),
-            '^': (4, 'right'),  # interpreted per-mode: either pow or xor
-            '&': (1, 'left'),
-            '|': (1, 'left'),
-            '~': (6, 'right'),  
-            '<<': (1, 'left'),
-            '>>': (1, 'left'),
-        }
-
-    def tokenize(self, expr: str) -> List[Token]:
-        # i had 2 options:-
-        # 1st one to check if the char is "a space "or not "absultely headache for me tbh"
-        # 2nd one to just remove all spaces at once "easier"
-        s = expr.replace(' ', '')
-        i = 0
+    # compiled expressions are kept in an LRU cache keyed on (expr, mode)
+
+    # one combined pattern, matched in place with match(s, pos): linear in len(expr)
+    TOKEN_RE = re.compile(r"""
+        (?P<WS>\s+)
+      | (?P<OP>\*\*|<<|>>|[()+\-*/%^~,&|<>])
+      | (?P<NUMBER>0[bB][01]+|0[oO][0-7]+|0[xX][0-9a-fA-F]+|\d*\.?\d+(?:[eE][+-]?\d+)?)
+      | (?P<IDENT>[A-Za-z_]\w*)
+    """, re.VERBOSE)
+    # same grammar for bytes-like input (ASCII only), e.g. memoryview slices of an mmap'd file;
+    # compiled on first use, which most runs (and the one-shot CLI) never reach
+    TOKEN_RE_BYTES = None
+
+    # shared read-only tables; add_function() gives one evaluator its own copy
+    functions = FUNCTIONS
+    ops = OPS
+
+    def __init__(self, cache_size: int = 1024, optimize: bool = True, jit_threshold: int = 8,
+                 profile: bool = False, store=None, limits: Optional[Limits] = Limits()):
+        if cache_size < 0:
+            raise ValueError('cache_size must be >= 0')
+        self.cache_size = cache_size
+        self.optimize = optimize  # constant folding, CSE and identities (see optimizer)
+        # calls a CompiledExpression runs interpreted before it is compiled natively; 0 = at once
+        self.jit_threshold = jit_threshold
+        self._cache: 'OrderedDict[Tuple[str, str], CompiledExpression]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self.profile = None  # a profiler.Profile while profiling, see stats()
+        if profile:
+            from .profiler import Profile
+            self.profile = Profile()
+        # optional db.Store: history log and cross-session cache of pure results
+        self.store = store
+        # resource limits (None: unchecked); change them with set_limits()
+        self.limits = limits
+        self._time_budget = limits.time_budget if limits is not None else None
+
+    def tokenize(self, expr: Union[str, bytes, memoryview]) -> List[Token]:
+        # whitespace separates tokens (so '1 2' is two numbers, not 12) and is dropped;
+        # bytes-like input is scanned in place and only the tokens are decoded
+        text = isinstance(expr, str)
+        if text:
+            match = self.TOKEN_RE.match
+        else:
+            if Evaluator.TOKEN_RE_BYTES is None:
+                Evaluator.TOKEN_RE_BYTES = re.compile(self.TOKEN_RE.pattern.encode('ascii'), re.VERBOSE)
+            match = self.TOKEN_RE_BYTES.match
         tokens: List[Token] = []
-        while i < len(s):
-            ch = s[i]
-            # size>1 operators
-            if s.startswith ('**', i) or s.startswith('<<', i) or s.startswith('>>', i):
-                tokens.append(('OP', s[i:i+2]))
-                i += 2
-                continue
-            # size=1 operators
-            if ch in '()+-*/%^~,&|<>':
-                tokens.append(('OP', ch))
-                i += 1
-                continue
-            # numbers
-            m = self.NUMBER_RE.match(s[i:])
-            if m:
-                val = m.group(0)
-                tokens.append(('NUMBER', val))
-                i += len(val)
-                continue
-            # functions
-            m = self.IDENT_RE.match(s[i:])
-            if m:
-                val = m.group(0)
-                tokens.append(('IDENT', val))
-                i += len(val)
-                continue
-            raise EvalError(f"Unknown token starting at: '{s[i:]}'")
+        append = tokens.append
+        pos = 0
+        end = len(expr)
+        max_tokens = self.limits.max_tokens if self.limits is not None else None
+        while pos < end:
+            m = match(expr, pos)
+            if m is None:
+                rest = expr[pos:pos + 20] if text else bytes(expr[pos:pos + 20]).decode('ascii', 'replace')
+                raise TokenError(f"Unknown token at column {pos + 1}: '{rest}'", pos + 1)
+            kind = m.lastgroup
+            if kind != 'WS':
+                if max_tokens is not None and len(tokens) >= max_tokens:
+                    raise LimitError(f'Too many tokens (limit {max_tokens})', 'max_tokens')
+                append((kind, m.group() if text else m.group().decode('ascii')))
+            pos = m.end()
         return tokens
 
-    def _to_number(self, token: str, programmer: bool) -> Union[int, float]:
+    @staticmethod
+    def _to_number(token: str, programmer: bool) -> Union[int, float]:
         # support prefixes for programmer/integer parsing
         if token.startswith(('0b', '0B')):
             return int(token, 2)
@@ -103,13 +276,21 @@ class Evaluator:
         def assoc(op: str) -> str:
             return self.ops.get(op, (0, 'left'))[1]
 
+        xor = mode in PROGRAMMER_MODES  # ^ is xor, otherwise power
+        max_depth = self.limits.max_depth if self.limits is not None else None
+        depth = 0  # open parentheses
         prev: Union[None, Token] = None
-        for tok in tokens:
+        last = len(tokens) - 1
+        for i, tok in enumerate(tokens):
             ttype, val = tok
             if ttype == 'NUMBER':
                 out.append(tok)
             elif ttype == 'IDENT':
-                stack.append(tok)  # function or variable (only functions for now)
+                # a call if followed by '(' (or a known function used without parens), else a variable
+                if (i < last and tokens[i + 1] == ('OP', '(')) or val.lower() in self.functions:
+                    stack.append(tok)
+                else:
+                    out.append(('VAR', val))
             elif ttype == 'OP':
                 if val == ',':
                     # function arg separator (not used now)
@@ -118,6 +299,9 @@ class Evaluator:
                     if not stack:
                         raise EvalError('Mismatched parentheses or misplaced comma')
                 elif val == '(':
+                    depth += 1
+                    if max_depth is not None and depth > max_depth:
+                        raise LimitError(f'Nesting too deep (limit {max_depth})', 'max_depth')
                     stack.append(tok)
                 elif val == ')':
                     while stack and stack[-1][1] != '(':
@@ -125,6 +309,7 @@ class Evaluator:
                     if not stack:
                         raise EvalError('Mismatched parentheses')
                     stack.pop()  # pop '('
+                    depth -= 1
                     if stack and stack[-1][0] == 'IDENT':
                         out.append(stack.pop())  # function
                 else:
@@ -144,7 +329,7 @@ class Evaluator:
 
                     # map '^' meaning depending on mode
                     if val == '^':
-                        if mode == 'programmer':
+                        if xor:
                             op = '^'  # xor
                         else:
                             op = '**'  # treat caret as power in non-programmer
@@ -156,13 +341,15 @@ class Evaluator:
                         # allow other ops even if not in ops (they may be functions)
                         pass
 
+                    # prefix unary ops have no left operand, so they never pop anything
+                    prefix = op in ('u+', 'u-', '~')
                     # while there's an operator at top of stack with greater precedence
-                    while stack and stack[-1][0] == 'OP':
+                    while not prefix and stack and stack[-1][0] == 'OP':
                         top = stack[-1][1]
                         top_op = top
                         # handle ^ mapping for precedence comparison
                         if top_op == '^':
-                            top_op = '**' if mode != 'programmer' else '^'
+                            top_op = '^' if xor else '**'
                         if top_op not in self.ops:
                             break
                         if (assoc(op) == 'left' and op_prec(top_op) >= op_prec(op)) or (
@@ -180,8 +367,15 @@ class Evaluator:
             out.append(t)
         return out
 
-    def eval_rpn(self, rpn: List[Token], mode: str) -> Union[int, float]:
+    def eval_rpn(self, rpn: List[Token], mode: str,
+                 variables: Optional[Dict[str, Union[int, float]]] = None) -> Union[int, float]:
+        from .program import LSHIFT, MUL, POW, Program, checked
+
+        if mode in WORD_MODES:
+            # no unbounded-int semantics to mirror: the Program interpreter is the reference
+            return Program.from_rpn(rpn, mode).run(mode, self.functions, variables)
         st: List[Union[int, float]] = []
+        limits = self.limits
 
         def to_int_if_needed(x):
             # in programmer mode, many ops should operate on ints
@@ -190,90 +384,231 @@ class Evaluator:
                     return int(x)
             return x
 
-        for tok in rpn:
-            ttype, val = tok
-            if ttype == 'NUMBER':
-                num = self._to_number(val, programmer=(mode == 'programmer'))
-                st.append(num)
-            elif ttype == 'IDENT':
-                # function application
-                if not st:
-                    raise EvalError('Function missing argument')
-                arg = st.pop()
-                fn = self.functions.get(val.lower())
-                if fn is None:
-                    raise EvalError(f'Unknown function: {val}')
-                res = fn(float(arg))
-                st.append(res)
-            elif ttype == 'OP':
-                if val == 'u-':
-                    a = st.pop()
-                    st.append(-a)
-                elif val == 'u+':
-                    a = st.pop()
-                    st.append(+a)
-                elif val == '~':
-                    a = st.pop()
-                    a = to_int_if_needed(a)
-                    if not isinstance(a, int):
-                        raise EvalError('Bitwise operations require integer operands')
-                    st.append(~a)
-                elif val in ('+', '-', '*', '/', '%', '**'):
-                    b = st.pop()
-                    a = st.pop()
-                    if val == '+':
-                        st.append(a + b)
-                    elif val == '-':
-                        st.append(a - b)
-                    elif val == '*':
-                        st.append(a * b)
-                    elif val == '/':
-                        st.append(a / b)
-                    elif val == '%':
-                        st.append(a % b)
-                    elif val == '**':
-                        st.append(a ** b)
-                elif val in ('&', '|', '^', '<<', '>>'):
-                    b = st.pop()
-                    a = st.pop()
-                    a = to_int_if_needed(a)
-                    b = to_int_if_needed(b)
-                    if not isinstance(a, int) or not isinstance(b, int):
-                        raise EvalError('Bitwise operations require integer operands')
-                    if val == '&':
-                        st.append(a & b)
-                    elif val == '|':
-                        st.append(a | b)
-                    elif val == '^':
-                        st.append(a ^ b)
-                    elif val == '<<':
-                        st.append(a << b)
-                    elif val == '>>':
-                        st.append(a >> b)
+        try:
+            for tok in rpn:
+                ttype, val = tok
+                if ttype == 'NUMBER':
+                    num = self._to_number(val, programmer=(mode == 'programmer'))
+                    st.append(num)
+                elif ttype == 'VAR':
+                    if not variables or val not in variables:
+                        raise EvalError(f'Unknown variable: {val}')
+                    st.append(variables[val])
+                elif ttype == 'IDENT':
+                    # function application
+                    if not st:
+                        raise EvalError('Function missing argument')
+                    arg = st.pop()
+                    fn = self.functions.get(val.lower())
+                    if fn is None:
+                        raise EvalError(f'Unknown function: {val}')
+                    res = fn(float(arg))
+                    st.append(res)
+                elif ttype == 'OP':
+                    if val == 'u-':
+                        a = st.pop()
+                        st.append(-a)
+                    elif val == 'u+':
+                        a = st.pop()
+                        st.append(+a)
+                    elif val == '~':
+                        a = st.pop()
+                        a = to_int_if_needed(a)
+                        if not isinstance(a, int):
+                            raise EvalError('Bitwise operations require integer operands')
+                        st.append(~a)
+                    elif val in ('+', '-', '*', '/', '%', '**'):
+                        b = st.pop()
+                        a = st.pop()
+                        if val == '+':
+                            st.append(a + b)
+                        elif val == '-':
+                            st.append(a - b)
+                        elif val == '*':
+                            st.append(a * b if limits is None else checked(MUL, a, b, limits))
+                        elif val == '/':
+                            st.append(a / b)
+                        elif val == '%':
+                            st.append(a % b)
+                        elif val == '**':
+                            st.append(a ** b if limits is None else checked(POW, a, b, limits))
+                    elif val in ('&', '|', '^', '<<', '>>'):
+                        b = st.pop()
+                        a = st.pop()
+                        a = to_int_if_needed(a)
+                        b = to_int_if_needed(b)
+                        if not isinstance(a, int) or not isinstance(b, int):
+                            raise EvalError('Bitwise operations require integer operands')
+                        if val == '&':
+                            st.append(a & b)
+                        elif val == '|':
+                            st.append(a | b)
+                        elif val == '^':
+                            st.append(a ^ b)
+                        elif val == '<<':
+                            st.append(a << b if limits is None else checked(LSHIFT, a, b, limits))
+                        elif val == '>>':
+                            st.append(a >> b)
+                    else:
+                        raise EvalError(f'Unsupported operator: {val}')
                 else:
-                    raise EvalError(f'Unsupported operator: {val}')
-            else:
-                raise EvalError(f'Unexpected token in RPN: {tok}')
+                    raise EvalError(f'Unexpected token in RPN: {tok}')
+        except IndexError:
+            # an operator or function popped from an empty stack
+            raise EvalError('Malformed expression') from None
         if len(st) != 1:
             raise EvalError('Malformed expression')
         return st[0]
 
-    def evaluate(self, expr: str, mode: str = 'basic') -> Union[int, float]:
-        """Evaluate expression string under given mode.
+    def compile(self, expr: Union[str, bytes, memoryview], mode: str = 'basic') -> CompiledExpression:
+        """Parse expression once and return a reusable CompiledExpression.
+
+        Once an expression has been called jit_threshold times its RPN is
+        compiled to a native Python function (see codegen), so re-evaluating
+        costs about as much as a lambda. Results are cached per (expr, mode), so
+        repeated formulas skip tokenizing and shunting-yard entirely.
 
-        mode: 'basic' | 'scientific' | 'programmer'
-        Returns number (int for integer-like results in programmer mode when applicable, otherwise float).
+        expr may also be ASCII bytes or a read-only memoryview (e.g. a line of
+        an mmap'd file); a cache hit on a view costs no copy.
         """
-        if mode not in ('basic', 'scientific', 'programmer'):
+        if not isinstance(expr, (str, bytes)) and not (isinstance(expr, memoryview) and expr.readonly):
+            expr = bytes(expr)  # only read-only views hash like the bytes they show
+        key = (expr, mode)
+        cache = self._cache
+        compiled = cache.get(key)
+        if compiled is not None:
+            self._hits += 1
+            if self.profile is not None:
+                self.profile.hits += 1
+            cache.move_to_end(key)
+            return compiled
+        self._misses += 1
+        if mode not in MODES:
             raise ValueError('Unknown mode')
-        tokens = self.tokenize(expr)
-        rpn = self.to_rpn(tokens, mode)
-        res = self.eval_rpn(rpn, mode)
-        # normalize programmer integer-like floats to int
-        if mode == 'programmer' and isinstance(res, float) and res.is_integer():
-            return int(res)
-        return res
+        if self.profile is not None:
+            self.profile.misses += 1
+            program = self.profile.parse(self, expr, mode)
+        else:
+            from .program import Program
+            program = Program.from_rpn(self.to_rpn(self.tokenize(expr), mode), mode)
+        if self.limits is not None and self.limits.max_int_bits is not None:
+            for num in program.consts:
+                if isinstance(num, int) and num.bit_length() > self.limits.max_int_bits:
+                    raise LimitError(f'Integer literal too large (limit {self.limits.max_int_bits} bits)',
+                                     'max_int_bits')
+        if isinstance(expr, memoryview):
+            # a view pins the underlying buffer (e.g. an mmap), so keep a copy instead
+            expr = bytes(expr)
+            key = (expr, mode)
+        compiled = CompiledExpression(self, expr, mode, program)
+        if self.cache_size:
+            cache[key] = compiled
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+                self._evictions += 1
+        return compiled
+
+    def evaluate(self, expr: str, mode: str = 'basic', **variables) -> Union[int, float]:
+        """Evaluate expression string under given mode.
+
+        mode: 'basic' | 'scientific' | 'programmer', or a fixed-width word mode
+            such as 'programmer:u32' (see word and parse_mode)
+        variables: values for the names used in expr, e.g. evaluate('x * 2', x=3)
+        Returns number (int for integer-like results in programmer mode when applicable, otherwise float;
+        always an int of the word's range in a word mode).
+        """
+        if self.store is not None:
+            return self.store.evaluate(self, expr, mode, variables)
+        if self.profile is not None:
+            return self.profile.evaluate(self, expr, mode, variables)
+        return self.compile(expr, mode)(**variables)
+
+    def evaluate_batch(self, expr: str, mode: str = 'basic', **columns):
+        """Evaluate expr once over whole columns of variable values.
+
+        Each column is a sequence (or NumPy array) of values for one variable;
+        scalars are broadcast. With NumPy installed the RPN runs once over the
+        arrays using ufuncs and an ndarray is returned (division by zero then
+        gives inf/nan instead of raising); otherwise the compiled expression is
+        applied row by row and a list is returned.
+        """
+        from .vector import evaluate_columns
+        return evaluate_columns(self.compile(expr, mode), self.functions, columns, self.limits)
+
+    def evaluate_many(self, expressions, mode: str = 'basic', workers: int = 1, chunk_size: int = 512,
+                      return_exceptions: bool = False):
+        """Evaluate an iterable of expressions, yielding results in input order.
+
+        workers > 1 spreads the work over a process pool; see parallel.evaluate_many.
+        """
+        from .parallel import evaluate_many
+        return evaluate_many(expressions, mode, workers, chunk_size, return_exceptions, ev=self)
+
+    def sweep(self, expr: str, var: str, start, stop, step, mode: str = 'basic', **variables):
+        """Yield (x, value) for x = start, start + step, ... through stop; see sweep.sweep.
+
+        expr is compiled once and evaluated in chunks (vectorized with NumPy),
+        so memory stays bounded however many points there are.
+        """
+        from .sweep import sweep
+        return sweep(expr, var, start, stop, step, mode, ev=self, **variables)
+
+    def add_function(self, name: str, fn) -> None:
+        """Make fn callable as name(x) in this evaluator's expressions.
+
+        The evaluator switches to its own copy of the function table, so
+        other evaluators are unaffected; cached compilations are dropped.
+        """
+        self.functions = {**self.functions, name.lower(): fn}
+        self.cache_clear()
+
+    def cache_info(self) -> CacheInfo:
+        """Return hit/miss/eviction counters of the compile cache."""
+        return CacheInfo(self._hits, self._misses, self._evictions, self.cache_size, len(self._cache))
+
+    def cache_clear(self) -> None:
+        """Drop all cached compiled expressions and reset the counters."""
+        self._cache.clear()
+        self._hits = self._misses = self._evictions = 0
+
+    def set_limits(self, limits: Optional[Limits]) -> None:
+        """Replace the resource limits (None turns checking off); cached compilations are dropped."""
+        self.limits = limits
+        self._time_budget = limits.time_budget if limits is not None else None
+        self.cache_clear()
+
+    def stats(self) -> Optional[Dict[str, object]]:
+        """Snapshot of the profiling counters as a dict, or None when profiling is off.
+
+        Turn profiling on with Evaluator(profile=True) or set_profiling(True).
+        """
+        if self.profile is None:
+            return None
+        return self.profile.snapshot(self)
+
+    def stats_reset(self) -> None:
+        """Zero the profiling counters (the compile cache itself is kept)."""
+        if self.profile is not None:
+            self.profile.reset()
+
+    def set_profiling(self, enabled: bool = True) -> None:
+        """Start (with fresh counters) or stop collecting stats()."""
+        if not enabled:
+            self.profile = None
+        elif self.profile is None:
+            from .profiler import Profile
+            self.profile = Profile()
+
+
+_default: Optional[Evaluator] = None
+
 
+def default_evaluator() -> Evaluator:
+    """A process-wide shared Evaluator (each worker process gets its own)."""
+    global _default
+    if _default is None:
+        _default = Evaluator()
+    return _default
 
 if __name__ == '__main__':
     ev = Evaluator()
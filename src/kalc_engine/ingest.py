@@ -0,0 +1,137 @@
+"""Zero-copy ingestion of large expression files.
+
+The file is memory-mapped instead of read: line boundaries are found on the
+raw bytes with mmap.find, and each line goes to the tokenizer as a
+memoryview slice, so no line is decoded into a str (the compile cache is
+looked up with the view itself). The file is cut into byte ranges that end on
+a newline; a worker gets only (start, end), maps the file itself and drops
+the pages it is done with, so peak RSS does not grow with the input size.
+
+Command lines ('.mode' changing the mode between ranges, '.exit' / '.quit')
+are found by the parent with one regex scan per range and parsed by
+batch.command, as in the streaming path.
+"""
+import mmap
+import os
+import re
+from functools import partial
+from typing import IO, Iterator, Optional, Tuple
+
+from .batch import Line, command, format_lines
+from .evaluator import Evaluator
+
+# bytes per range: the unit of work sent to a worker
+RANGE_SIZE = 4 << 20
+
+# a line whose first non-blank byte is '.'; batch.command decides what it means
+CMD_RE = re.compile(rb'^[ \t\r\f\v]*\.', re.MULTILINE)
+NEWLINE_RE = re.compile(rb'\n')
+SPACE_RE = re.compile(rb'[ \t\r\f\v]*')
+
+Range = Tuple[int, int, str, int]  # (start, end, mode at start, number of the first line)
+
+
+def _release(mm: mmap.mmap, start: int, end: int) -> None:
+    # drop pages we are done with from this process' RSS (they stay in the page cache)
+    if hasattr(mmap, 'MADV_DONTNEED') and end > start:
+        start -= start % mmap.PAGESIZE
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def plan_ranges(mm: mmap.mmap, mode: str = 'basic', size: int = RANGE_SIZE,
+                count_lines: bool = True) -> Iterator[Range]:
+    """Cut the mapped file into newline-aligned ranges, tracking the mode across them."""
+    n = len(mm)
+    start = 0
+    lineno = 1
+    while start < n:
+        nl = mm.find(b'\n', min(start + size, n))
+        end = n if nl < 0 else nl + 1
+        range_mode = mode
+        for m in CMD_RE.finditer(mm, start, end):
+            line_start = m.start()
+            line_end = mm.find(b'\n', m.end(), end)
+            text = mm[line_start:end if line_end < 0 else line_end].decode('ascii', 'replace').strip()
+            mode, _, stop = command(text, mode)
+            if stop:
+                yield start, line_start, range_mode, lineno
+                return
+        yield start, end, range_mode, lineno
+        if count_lines:
+            lineno += sum(1 for _ in NEWLINE_RE.finditer(mm, start, end))
+        _release(mm, start, end)
+        start = end
+
+
+def iter_range(mm: mmap.mmap, view: memoryview, rng: Range) -> Iterator[Line]:
+    """Yield the lines of one range; expressions are memoryview slices into the map."""
+    start, end, mode, lineno = rng
+    find = mm.find
+    skip = SPACE_RE.match
+    pos = start
+    while pos < end:
+        eol = find(b'\n', pos, end)
+        if eol < 0:
+            eol = end
+        first = skip(mm, pos, eol).end()
+        if first < eol:
+            lead = mm[first]
+            if lead == 0x2e:  # '.'
+                text = mm[first:eol].decode('ascii', 'replace').strip()
+                mode, error, stop = command(text, mode)
+                if stop:
+                    return
+                if error is not None:
+                    yield Line(lineno, mode, text, error)
+            elif lead != 0x23:  # '#'
+                expr = view[first:eol]
+                try:
+                    yield Line(lineno, mode, expr)
+                finally:
+                    expr.release()  # the map can only be closed once no slice of it is left
+        lineno += 1
+        pos = eol + 1
+
+
+def run_range(ev: Evaluator, path: str, json_lines: bool, rng: Range) -> Tuple[str, int]:
+    """Map path, evaluate the lines of one range and return (output text, failed count)."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        lines = iter_range(mm, view, rng)
+        try:
+            result = format_lines(ev, lines, json_lines)
+        finally:
+            lines.close()  # releases the current line's slice, even when format_lines raised
+            view.release()
+        _release(mm, rng[0], rng[1])
+    return result
+
+
+def _run_range_in_worker(path: str, json_lines: bool, rng: Range) -> Tuple[str, int]:
+    from .parallel import worker_evaluator
+    return run_range(worker_evaluator(), path, json_lines, rng)
+
+
+def evaluate_file(path: str, out: IO[str], mode: str = 'basic', json_lines: bool = False,
+                  jobs: int = 1, ev: Optional[Evaluator] = None, range_size: int = RANGE_SIZE) -> int:
+    """Evaluate every expression in the file at path, writing results to out.
+
+    Same output as batch.run_batch; returns the number of lines that failed.
+    """
+    if os.path.getsize(path) == 0:
+        return 0
+    failed = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = plan_ranges(mm, mode, range_size, count_lines=json_lines)
+        if jobs > 1:
+            from .parallel import imap_ordered
+            results = imap_ordered(partial(_run_range_in_worker, path, json_lines), ranges, jobs)
+        else:
+            if ev is None:
+                ev = Evaluator(cache_size=65536)
+            results = (run_range(ev, path, json_lines, rng) for rng in ranges)
+        for text, n in results:
+            out.write(text)
+            failed += n
+    out.flush()
+    return failed
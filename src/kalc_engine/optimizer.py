@@ -0,0 +1,262 @@
+"""Expression DAG and the optimizer pass between to_rpn() and code generation.
+
+build_dag() turns a Program into a DAG of Nodes. Equal subexpressions are built
+only once (hash-consing), which gives common-subexpression elimination; with
+optimize on, constant subtrees are folded and algebraic identities such as
+x*1 and x+0 are dropped where they are exact for the operand types known at
+compile time. In a word mode every node is an int of the word (see word), and
+folding uses the word's wrapping operators.
+"""
+import math
+import operator
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .evaluator import FUNCTIONS, EvalError, Limits
+from .program import CALL, CONST, LSHIFT, MUL, OPNAMES, POW, VAR, Program, checked, prog_int, strict_int
+from .word import WORDS
+
+# functions from the built-in table that are safe to fold and to share
+PURE_FUNCTIONS = frozenset(['sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'log', 'ln', 'exp',
+                            'sqrt', 'abs', 'floor', 'ceil'])
+INT_FUNCTIONS = frozenset(['floor', 'ceil'])
+
+UNARY = ('u-', 'u+', '~')
+BITWISE = ('&', '|', '^', '<<', '>>')
+ARITH = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+    '**': operator.pow,
+    '&': operator.and_,
+    '|': operator.or_,
+    '^': operator.xor,
+    '<<': operator.lshift,
+    '>>': operator.rshift,
+}
+
+# never fold int ** int or << whose result would exceed this many bits;
+# evaluation time is where such work (and its cost) belongs
+FOLD_MAX_BITS = 4096
+
+# int results of these can grow without bound: folded (and run) through program.checked(),
+# so a fold never produces what evaluation would refuse
+CHECKED = {'*': MUL, '**': POW, '<<': LSHIFT}
+
+
+class Node:
+    """One DAG vertex.
+
+    kind is 'const' (value is the number), 'var' (value is the name), 'call'
+    (op is the function name) or 'op' (op is the operator). type is the static
+    result type, 'int', 'float' or None when unknown.
+    """
+
+    __slots__ = ('kind', 'op', 'value', 'args', 'type', 'uses')
+
+    def __init__(self, kind: str, op: Optional[str], value, args: Tuple['Node', ...], type_: Optional[str]):
+        self.kind = kind
+        self.op = op
+        self.value = value
+        self.args = args
+        self.type = type_
+        self.uses = 0
+
+    def is_const(self, value, type_: Optional[str] = None) -> bool:
+        return (self.kind == 'const' and type(self.value) in (int, float) and self.value == value
+                and (type_ is None or self.type == type_))
+
+    def __repr__(self) -> str:
+        if self.kind in ('const', 'var'):
+            return f'Node({self.kind}, {self.value!r})'
+        return f'Node({self.op}, {list(self.args)!r})'
+
+
+def _type_of(value) -> Optional[str]:
+    if type(value) is int:
+        return 'int'
+    if type(value) is float:
+        return 'float'
+    return None
+
+
+def _result_type(op: str, args: Tuple[Node, ...]) -> Optional[str]:
+    if op in BITWISE or op == '~':
+        return 'int'
+    if op in ('u-', 'u+'):
+        return args[0].type
+    a, b = args[0].type, args[1].type
+    if a is None or b is None:
+        return None
+    if op in ('+', '-', '*', '%'):
+        return 'int' if a == b == 'int' else 'float'
+    if op == '/':
+        return 'float'
+    # '**': int ** int may be int or float, float ** float may be complex
+    return 'float' if a == 'float' and b == 'int' else None
+
+
+class Graph:
+    """Builds the DAG for one expression in one mode."""
+
+    def __init__(self, mode: str, functions: Dict[str, Callable], optimize: bool = True,
+                 limits: Optional[Limits] = None):
+        self.mode = mode
+        self.functions = functions
+        self.optimize = optimize
+        self.limits = limits
+        self.to_int = prog_int if mode == 'programmer' else strict_int
+        self.word = WORDS.get(mode)
+        self.nodes: List[Node] = []  # creation order is a topological order
+        self._table: Dict[tuple, Node] = {}
+
+    def _intern(self, key: Optional[tuple], kind: str, op, value, args, type_) -> Node:
+        if key is not None and self.optimize:
+            node = self._table.get(key)
+            if node is not None:
+                return node
+        node = Node(kind, op, value, args, type_)
+        self.nodes.append(node)
+        if key is not None:
+            self._table[key] = node
+        return node
+
+    def const(self, value) -> Node:
+        if self.word is not None:
+            value = self.word.wrap(value)
+        # repr keeps 0.0 and -0.0 (and 1 and 1.0) apart; ints need no repr (see Program.from_rpn)
+        key = value if type(value) is int else repr(value)
+        return self._intern(('const', type(value), key), 'const', None, value, (), _type_of(value))
+
+    def var(self, name: str) -> Node:
+        # a word-mode variable is converted to the word as it is read
+        return self._intern(('var', name), 'var', None, name, (), 'int' if self.word is not None else None)
+
+    def call(self, name: str, arg: Node) -> Node:
+        fname = name.lower()
+        fn = self.functions.get(fname)
+        if fn is None:
+            raise EvalError(f'Unknown function: {name}')
+        # a built-in name rebound with add_function() is just another user function
+        pure = fname in PURE_FUNCTIONS and fn is FUNCTIONS.get(fname)
+        word = self.word
+        if pure and self.optimize and arg.kind == 'const':
+            folded = self._fold(lambda: fn(float(arg.value)) if word is None else word.value(fn(arg.value)))
+            if folded is not None:
+                return folded
+        if pure:
+            type_ = 'int' if fname in INT_FUNCTIONS or word is not None else 'float'
+            return self._intern(('call', fname, id(arg)), 'call', fname, None, (arg,), type_)
+        # impure (user-supplied) calls are never shared or folded
+        return self._intern(None, 'call', fname, None, (arg,), 'int' if word is not None else None)
+
+    def apply(self, op: str, args: Tuple[Node, ...]) -> Node:
+        if self.optimize:
+            if all(a.kind == 'const' for a in args):
+                folded = self._fold_op(op, [a.value for a in args])
+                if folded is not None:
+                    return folded
+            same = self._identity(op, args)
+            if same is not None:
+                return same
+        type_ = 'int' if self.word is not None else _result_type(op, args)
+        return self._intern(('op', op) + tuple(id(a) for a in args), 'op', op, None, args, type_)
+
+    def _fold(self, compute: Callable[[], object]) -> Optional[Node]:
+        try:
+            value = compute()
+        except Exception:
+            # leave it in place: the error (e.g. 1/0) must still surface at evaluation time
+            return None
+        return self.const(value)
+
+    def _fold_op(self, op: str, values: list) -> Optional[Node]:
+        if self.word is not None:
+            return self._fold(lambda: self.word.ops[op](*values))
+        if op in ('u-', 'u+'):
+            return self._fold(lambda: -values[0] if op == 'u-' else +values[0])
+        if op == '~':
+            return self._fold(lambda: ~self.to_int(values[0]))
+        a, b = values
+        if op == '**' and type(a) is int and type(b) is int and abs(b) * max(a.bit_length(), 1) > FOLD_MAX_BITS:
+            return None
+        if op == '<<' and isinstance(b, (int, float)) and b > FOLD_MAX_BITS:
+            return None
+        if op in BITWISE:
+            if op == '<<' and self.limits is not None:
+                return self._fold(lambda: checked(LSHIFT, self.to_int(a), self.to_int(b), self.limits))
+            return self._fold(lambda: ARITH[op](self.to_int(a), self.to_int(b)))
+        if op in CHECKED and self.limits is not None:
+            return self._fold(lambda: checked(CHECKED[op], a, b, self.limits))
+        return self._fold(lambda: ARITH[op](a, b))
+
+    def _identity(self, op: str, args: Tuple[Node, ...]) -> Optional[Node]:
+        """Return the operand an identity reduces to, or None.
+
+        Rules only fire when they are exact for the static type: x*1 keeps a
+        float x unchanged, but int x * 1.0 would turn into a float, and
+        -0.0 + 0.0 is 0.0, so x+0 is only dropped for ints.
+        """
+        if op in UNARY:
+            (x,) = args
+            if op == 'u+' and x.type is not None:
+                return x
+            if x.kind == 'op' and x.op == op and op in ('u-', '~'):
+                inner = x.args[0]
+                if inner.type == 'int' or (op == 'u-' and inner.type is not None):
+                    return inner  # -(-x), ~~x (only an int passes through ~ unchanged)
+            return None
+        a, b = args
+        for x, c, x_left in ((a, b, True), (b, a, False)):
+            if x.type == 'float':
+                if op == '*' and c.is_const(1):
+                    return x
+                if x_left and op in ('/', '**') and c.is_const(1):
+                    return x
+                if x_left and op == '-' and c.is_const(0) and math.copysign(1.0, c.value) > 0:
+                    return x  # x - 0.0 is exact, x - (-0.0) turns -0.0 into 0.0
+            elif x.type == 'int':
+                if op in ('+', '|', '^') and c.is_const(0, 'int'):
+                    return x
+                if op == '*' and c.is_const(1, 'int'):
+                    return x
+                if op == '&' and c.is_const(-1, 'int'):
+                    return x
+                if x_left and op in ('-', '<<', '>>') and c.is_const(0, 'int'):
+                    return x
+        return None
+
+
+def build_dag(program: Program, mode: str, functions: Dict[str, Callable],
+              optimize: bool = True, limits: Optional[Limits] = None) -> Tuple[Node, List[Node]]:
+    """Return (root, live nodes in topological order) with Node.uses filled in."""
+    graph = Graph(mode, functions, optimize, limits)
+    st: List[Node] = []
+    try:
+        for op, arg in program.instructions():
+            if op == CONST:
+                st.append(graph.const(program.consts[arg]))
+            elif op == VAR:
+                st.append(graph.var(program.names[arg]))
+            elif op == CALL:
+                st.append(graph.call(program.functions[arg], st.pop()))
+            elif OPNAMES[op] in UNARY:
+                st.append(graph.apply(OPNAMES[op], (st.pop(),)))
+            else:
+                b = st.pop()
+                a = st.pop()
+                st.append(graph.apply(OPNAMES[op], (a, b)))
+    except IndexError:
+        raise EvalError('Malformed expression') from None
+    if len(st) != 1:
+        raise EvalError('Malformed expression')
+    root = st[0]
+    # parents come after their children, so one backwards sweep finds everything reachable
+    live = {id(root)}
+    for node in reversed(graph.nodes):
+        if id(node) in live:
+            for arg in node.args:
+                arg.uses += 1
+                live.add(id(arg))
+    return root, [n for n in graph.nodes if id(n) in live]
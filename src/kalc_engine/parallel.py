@@ -0,0 +1,103 @@
+"""Multi-core evaluation over a process pool.
+
+Input is cut into chunks that are sent to worker processes. Each worker
+keeps one warm Evaluator (and so its own compile cache) for its whole life.
+Results come back in input order as soon as the chunk at the head of the
+queue is done, and only a few chunks per worker are in flight at any time,
+so input and output of any size stream through in bounded memory.
+
+Workers build a fresh Evaluator, so functions added to a parent
+Evaluator's table at runtime are not available to them.
+"""
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import evaluator
+from .evaluator import Evaluator, Limits
+
+DEFAULT_CHUNK_SIZE = 512
+
+# chunks queued per worker: enough to keep every core busy, small enough to bound memory
+PREFETCH = 2
+
+
+def _init_worker(cache_size: int, optimize: bool, limits: Optional[Limits] = Limits()) -> None:
+    evaluator._default = Evaluator(cache_size=cache_size, optimize=optimize, limits=limits)
+
+
+def worker_evaluator() -> Evaluator:
+    """The Evaluator of the current worker process (created on first use outside a pool)."""
+    return evaluator.default_evaluator()
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def imap_ordered(fn: Callable[[list], object], chunks: Iterable[list], workers: int,
+                 cache_size: int = 65536, optimize: bool = True, limits: Optional[Limits] = Limits()) -> Iterator:
+    """Apply fn to every chunk in a pool of workers, yielding results in input order."""
+    # imported here: concurrent.futures pulls in multiprocessing, which single-job runs never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_size, optimize, limits)) as pool:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(fn, chunk))
+                if len(pending) >= workers * PREFETCH:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # consumer stopped early (or a chunk failed): don't run what is still queued
+            for future in pending:
+                future.cancel()
+
+
+def _evaluate_chunk(items: Sequence[Tuple[str, str]]) -> List[Tuple[bool, object]]:
+    ev = worker_evaluator()
+    out = []
+    for expr, mode in items:
+        try:
+            out.append((True, ev.evaluate(expr, mode)))
+        except Exception as e:
+            out.append((False, e))
+    return out
+
+
+def evaluate_many(expressions: Iterable[str], mode: str = 'basic', workers: int = 1,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, return_exceptions: bool = False,
+                  ev: Optional[Evaluator] = None) -> Iterator:
+    """Evaluate every expression, yielding results in input order.
+
+    With workers > 1 the work is spread over that many processes. A failing
+    expression raises its exception, or with return_exceptions=True the
+    exception instance is yielded in its place.
+    """
+    if workers <= 1:
+        ev = ev or Evaluator()
+        for expr in expressions:
+            try:
+                yield ev.evaluate(expr, mode)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                yield e
+        return
+    if ev is None:
+        cache_size, optimize, limits = 65536, True, Limits()
+    else:
+        cache_size, optimize, limits = ev.cache_size, ev.optimize, ev.limits
+    chunks = chunked(((expr, mode) for expr in expressions), chunk_size)
+    for results in imap_ordered(_evaluate_chunk, chunks, workers, cache_size, optimize, limits):
+        for ok, value in results:
+            if not ok and not return_exceptions:
+                raise value
+            yield value
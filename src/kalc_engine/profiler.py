@@ -0,0 +1,139 @@
+"""Opt-in instrumentation for an Evaluator.
+
+With ``Evaluator(profile=True)`` (or ``ev.profile = Profile()``) every
+evaluate() records:
+
+- time and call count per stage: compile (cache lookup plus, on a miss,
+  tokenize, to_rpn and assemble into a Program) and execute (which includes
+  codegen when an expression turns hot);
+- how many times each operator and each function ran. These come from the
+  Program, so they count the operators as written, before the optimizer
+  folds anything away;
+- compile cache hits and misses, and errors by stage and exception type.
+
+When profiling is off (the default) the only cost is one ``is None`` check
+in evaluate() and one in compile().
+"""
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .program import Program
+
+# display order; nested stages are part of the one above them
+STAGES = ('compile', 'tokenize', 'to_rpn', 'assemble', 'execute', 'codegen')
+NESTED = ('tokenize', 'to_rpn', 'assemble', 'codegen')
+
+COUNTS_CACHE = 4096
+
+
+class Profile:
+    """Counters and stage timers collected by one Evaluator."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.seconds: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.calls: Dict[str, int] = dict.fromkeys(STAGES, 0)
+        self.ops: Counter = Counter()
+        self.functions: Counter = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.errors: Counter = Counter()
+        self.evaluations = 0
+        # id(Program) -> (Program, ops, functions), so counting costs one update per evaluation
+        self._counts: Dict[int, tuple] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def error(self, stage: str, exc: BaseException) -> None:
+        self.errors[f'{stage}: {type(exc).__name__}'] += 1
+
+    def parse(self, ev, expr, mode: str):
+        """Tokenize, shunting-yard and assemble one expression, timing each step."""
+        t0 = time.perf_counter()
+        tokens = ev.tokenize(expr)
+        t1 = time.perf_counter()
+        rpn = ev.to_rpn(tokens, mode)
+        t2 = time.perf_counter()
+        program = Program.from_rpn(rpn, mode)
+        t3 = time.perf_counter()
+        self.add('tokenize', t1 - t0)
+        self.add('to_rpn', t2 - t1)
+        self.add('assemble', t3 - t2)
+        return program
+
+    def evaluate(self, ev, expr, mode: str, variables: dict):
+        """Evaluator.evaluate with timers and counters around each stage."""
+        return self.execute(self.compile(ev, expr, mode), variables)
+
+    def compile(self, ev, expr, mode: str):
+        """ev.compile(), timed and counted as one evaluation."""
+        self.evaluations += 1
+        t0 = time.perf_counter()
+        try:
+            compiled = ev.compile(expr, mode)
+        except Exception as e:
+            self.error('compile', e)
+            raise
+        self.add('compile', time.perf_counter() - t0)
+        return compiled
+
+    def execute(self, compiled, variables: dict):
+        """Run a compiled expression, counting its operators and functions."""
+        program = compiled.program
+        counts = self._counts.get(id(program))
+        if counts is None or counts[0] is not program:
+            if len(self._counts) >= COUNTS_CACHE:
+                self._counts.clear()
+            counts = self._counts[id(program)] = (program,) + program.counts()
+        self.ops.update(counts[1])
+        self.functions.update(counts[2])
+        t0 = time.perf_counter()
+        try:
+            return compiled(**variables)
+        except Exception as e:
+            self.error('execute', e)
+            raise
+        finally:
+            self.add('execute', time.perf_counter() - t0)
+
+    def snapshot(self, ev=None) -> Dict[str, object]:
+        """Plain-dict copy of everything collected so far."""
+        lookups = self.hits + self.misses
+        snap = {
+            'evaluations': self.evaluations,
+            'stages': {name: {'calls': self.calls[name], 'seconds': self.seconds[name]} for name in STAGES},
+            'ops': dict(self.ops.most_common()),
+            'functions': dict(self.functions.most_common()),
+            'cache': {'hits': self.hits, 'misses': self.misses,
+                      'hit_rate': self.hits / lookups if lookups else 0.0},
+            'errors': dict(self.errors.most_common()),
+        }
+        if ev is not None:
+            snap['cache']['size'] = len(ev._cache)
+            snap['cache']['maxsize'] = ev.cache_size
+        return snap
+
+
+def format_snapshot(snap: Optional[Dict[str, object]]) -> str:
+    """Render a snapshot as a short plain-text report."""
+    if snap is None:
+        return 'Profiling is off.\n'
+    lines: List[str] = [f"evaluations: {snap['evaluations']}", '',
+                        f"{'stage':<12} {'calls':>9} {'total ms':>11} {'mean µs':>10}"]
+    for name, rec in snap['stages'].items():
+        if not rec['calls']:
+            continue
+        label = ('  ' + name) if name in NESTED else name
+        mean = rec['seconds'] / rec['calls'] * 1e6
+        lines.append(f"{label:<12} {rec['calls']:>9} {rec['seconds'] * 1e3:>11.3f} {mean:>10.2f}")
+    cache = snap['cache']
+    lines += ['', f"cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%} hit rate)"]
+    for title, key in (('operators', 'ops'), ('functions', 'functions'), ('errors', 'errors')):
+        if snap[key]:
+            lines.append(f'{title}: ' + ', '.join(f'{name} {n}' for name, n in snap[key].items()))
+    return '\n'.join(lines) + '\n'
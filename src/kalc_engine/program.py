@@ -0,0 +1,303 @@
+"""Packed form of compiled RPN.
+
+A Program stores the RPN of one expression as a wordcode ``bytes`` stream of
+(opcode, argument) byte pairs, with EXTENDED_ARG prefixes for arguments over
+255 as in CPython. Numbers live in a constant pool already parsed, and
+variables and functions are indexes into name tables. That is a few bytes
+per token instead of a tuple of two strings, it needs no string compares or
+literal parsing when it runs, and it pickles as four flat objects.
+"""
+import operator
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .evaluator import PROGRAMMER_MODES, WORD_MODES, EvalError, Evaluator, LimitError, Limits, Token
+from .word import WORDS, Word
+
+EXTENDED_ARG = 0
+CONST = 1
+VAR = 2
+CALL = 3
+NEG = 4
+POS = 5
+INVERT = 6
+# binary arithmetic, ADD..POW
+ADD = 7
+SUB = 8
+MUL = 9
+DIV = 10
+MOD = 11
+POW = 12
+# binary bitwise, AND..RSHIFT
+AND = 13
+OR = 14
+XOR = 15
+LSHIFT = 16
+RSHIFT = 17
+
+OPCODES = {
+    'u-': NEG, 'u+': POS, '~': INVERT,
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD, '**': POW,
+    '&': AND, '|': OR, '^': XOR, '<<': LSHIFT, '>>': RSHIFT,
+}
+OPNAMES = {code: name for name, code in OPCODES.items()}
+
+BINARY = {
+    ADD: operator.add, SUB: operator.sub, MUL: operator.mul, DIV: operator.truediv,
+    MOD: operator.mod, POW: operator.pow,
+    AND: operator.and_, OR: operator.or_, XOR: operator.xor, LSHIFT: operator.lshift,
+    RSHIFT: operator.rshift,
+}
+
+# word mode -> its wrapping operators indexed by opcode (see word)
+WORD_OPS = {mode: tuple(word.ops.get(OPNAMES.get(code)) for code in range(RSHIFT + 1))
+            for mode, word in WORDS.items()}
+
+
+def prog_int(x):
+    # programmer mode: integer-like floats are promoted (see eval_rpn's to_int_if_needed)
+    if isinstance(x, float) and x.is_integer():
+        return int(x)
+    if not isinstance(x, int):
+        raise EvalError('Bitwise operations require integer operands')
+    return x
+
+
+def strict_int(x):
+    if not isinstance(x, int):
+        raise EvalError('Bitwise operations require integer operands')
+    return x
+
+
+def checked(op: int, a, b, limits: Limits, deadline: Optional[float] = None):
+    """BINARY[op](a, b) for MUL, POW or LSHIFT, refusing work that would go over limits.
+
+    Only int operands can grow without bound (floats overflow to inf or raise
+    OverflowError), so anything else is computed at once, unchecked and untimed.
+    """
+    if not (isinstance(a, int) and isinstance(b, int)):
+        return BINARY[op](a, b)
+    if deadline is not None and perf_counter() > deadline:
+        raise LimitError(f'Time budget of {limits.time_budget} s exceeded', 'time_budget')
+    max_bits = limits.max_int_bits
+    if op == LSHIFT:
+        if a and b > 0:
+            if limits.max_shift is not None and b > limits.max_shift:
+                raise LimitError(f'Shift too large: {b} (limit {limits.max_shift})', 'max_shift')
+            # exact: a << b has bits(a) + b bits
+            if max_bits is not None and a.bit_length() + b > max_bits:
+                raise LimitError(f'Integer result too large (limit {max_bits} bits)', 'max_int_bits')
+        return a << b
+    if op == POW and b > 0 and (a > 1 or a < -1):
+        if limits.max_exponent is not None and b > limits.max_exponent:
+            raise LimitError(f'Exponent too large: {b} (limit {limits.max_exponent})', 'max_exponent')
+        # |a| ** b has at least (bits(a) - 1) * b + 1 bits
+        if max_bits is not None and (a.bit_length() - 1) * b >= max_bits:
+            raise LimitError(f'Integer result too large (limit {max_bits} bits)', 'max_int_bits')
+    res = BINARY[op](a, b)
+    # operands were within the limit, so computing this one was cheap
+    return res if max_bits is None else fits(res, max_bits)
+
+
+def fits(res, max_bits: int):
+    """res, unless it is an int wider than max_bits; the whole check for a product of in-limit operands."""
+    if res.__class__ is int and res.bit_length() > max_bits:
+        raise LimitError(f'Integer result too large (limit {max_bits} bits)', 'max_int_bits')
+    return res
+
+
+class Program:
+    """Wordcode, constant pool and name tables for one expression in one mode."""
+
+    __slots__ = ('code', 'consts', 'names', 'functions')
+
+    def __init__(self, code: bytes, consts: tuple, names: Tuple[str, ...], functions: Tuple[str, ...]):
+        self.code = code
+        self.consts = consts
+        self.names = names  # variable names
+        self.functions = functions  # function names as written
+
+    @classmethod
+    def from_rpn(cls, rpn: List[Token], mode: str) -> 'Program':
+        programmer = mode in PROGRAMMER_MODES
+        words = mode in WORD_MODES
+        code = bytearray()
+        pools: Tuple[Dict, Dict, Dict] = ({}, {}, {})  # consts, names, functions -> index
+
+        def emit(op: int, arg: int = 0) -> None:
+            if arg > 0xFF:
+                for shift in range((arg.bit_length() - 1) // 8 * 8, 0, -8):
+                    code.extend((EXTENDED_ARG, (arg >> shift) & 0xFF))
+            code.extend((op, arg & 0xFF))
+
+        def index(pool: dict, key, value) -> int:
+            if key not in pool:
+                pool[key] = (len(pool), value)
+            return pool[key][0]
+
+        for tok in rpn:
+            ttype, val = tok
+            if ttype == 'NUMBER':
+                num = Evaluator._to_number(val, programmer)
+                if words and type(num) is not int:
+                    raise EvalError(f'Word mode takes integer literals only: {val}')
+                # repr keeps 0.0 and -0.0 (and 1 and 1.0) apart; ints are keyed as they are,
+                # since repr of a wide one is slow (and refused past 4300 digits)
+                emit(CONST, index(pools[0], (type(num), num if type(num) is int else repr(num)), num))
+            elif ttype == 'VAR':
+                emit(VAR, index(pools[1], val, val))
+            elif ttype == 'IDENT':
+                emit(CALL, index(pools[2], val.lower(), val))
+            elif ttype == 'OP':
+                if val not in OPCODES:
+                    raise EvalError(f'Unsupported operator: {val}')
+                emit(OPCODES[val])
+            else:
+                raise EvalError(f'Unexpected token in RPN: {tok}')
+        consts, names, functions = (tuple(v for _, v in pool.values()) for pool in pools)
+        return cls(bytes(code), consts, names, functions)
+
+    def instructions(self) -> Iterator[Tuple[int, int]]:
+        """Yield (opcode, argument) with EXTENDED_ARG prefixes folded in."""
+        ext = 0
+        it = iter(self.code)
+        for op, arg in zip(it, it):
+            if op == EXTENDED_ARG:
+                ext = (ext | arg) << 8
+                continue
+            yield op, ext | arg
+            ext = 0
+
+    def counts(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """How often each operator and each function runs per evaluation."""
+        ops: Dict[str, int] = {}
+        funcs: Dict[str, int] = {}
+        for op, arg in self.instructions():
+            if op == CALL:
+                name = self.functions[arg].lower()
+                funcs[name] = funcs.get(name, 0) + 1
+            elif op in OPNAMES:
+                ops[OPNAMES[op]] = ops.get(OPNAMES[op], 0) + 1
+        return ops, funcs
+
+    def to_rpn(self) -> List[Token]:
+        """Rebuild the token list (literals are re-spelled, but parse to the same numbers)."""
+        out: List[Token] = []
+        for op, arg in self.instructions():
+            if op == CONST:
+                num = self.consts[arg]
+                # hex keeps an int an int in every mode; repr round-trips floats
+                out.append(('NUMBER', hex(num) if isinstance(num, int) else repr(num)))
+            elif op == VAR:
+                out.append(('VAR', self.names[arg]))
+            elif op == CALL:
+                out.append(('IDENT', self.functions[arg]))
+            else:
+                out.append(('OP', OPNAMES[op]))
+        return out
+
+    def run(self, mode: str, functions: Dict[str, Callable],
+            env: Optional[Dict[str, Union[int, float]]] = None, limits: Optional[Limits] = None,
+            deadline: Optional[float] = None) -> Union[int, float]:
+        """Interpret the program; same semantics as Evaluator.eval_rpn.
+
+        With limits, integer *, ** and << go through checked(); deadline is a
+        perf_counter() value past which they raise LimitError. Word modes need
+        neither, since no value outgrows the word.
+        """
+        if mode in WORD_OPS:
+            return self._run_word(WORDS[mode], WORD_OPS[mode], functions, env)
+        to_int = prog_int if mode == 'programmer' else strict_int
+        consts, names, fnames = self.consts, self.names, self.functions
+        st: list = []
+        push, pop = st.append, st.pop
+        try:
+            for op, arg in self.instructions():
+                if op == CONST:
+                    push(consts[arg])
+                elif op >= AND:
+                    b = to_int(pop())
+                    a = to_int(pop())
+                    if op == LSHIFT and limits is not None:
+                        push(checked(op, a, b, limits, deadline))
+                    else:
+                        push(BINARY[op](a, b))
+                elif op >= ADD:
+                    b = pop()
+                    if (op == MUL or op == POW) and limits is not None:
+                        push(checked(op, pop(), b, limits, deadline))
+                    else:
+                        push(BINARY[op](pop(), b))
+                elif op == VAR:
+                    name = names[arg]
+                    if not env or name not in env:
+                        raise EvalError(f'Unknown variable: {name}')
+                    push(env[name])
+                elif op == CALL:
+                    if not st:
+                        raise EvalError('Function missing argument')
+                    name = fnames[arg]
+                    fn = functions.get(name.lower())
+                    if fn is None:
+                        raise EvalError(f'Unknown function: {name}')
+                    push(fn(float(pop())))
+                elif op == NEG:
+                    push(-pop())
+                elif op == POS:
+                    push(+pop())
+                else:  # INVERT
+                    push(~to_int(pop()))
+        except IndexError:
+            raise EvalError('Malformed expression') from None
+        if len(st) != 1:
+            raise EvalError('Malformed expression')
+        return st[0]
+
+    def _run_word(self, word: Word, ops: tuple, functions: Dict[str, Callable],
+                  env: Optional[Dict[str, Union[int, float]]]) -> int:
+        # every stack entry is already an int in range, so operators need no type checks
+        wrap, value = word.wrap, word.value
+        consts = [wrap(num) for num in self.consts]  # e.g. 0xFFFFFFFF is -1 in i32
+        names, fnames = self.names, self.functions
+        st: list = []
+        push, pop = st.append, st.pop
+        try:
+            for op, arg in self.instructions():
+                if op == CONST:
+                    push(consts[arg])
+                elif op >= ADD:
+                    b = pop()
+                    push(ops[op](pop(), b))
+                elif op == VAR:
+                    name = names[arg]
+                    if not env or name not in env:
+                        raise EvalError(f'Unknown variable: {name}')
+                    push(value(env[name]))
+                elif op == CALL:
+                    if not st:
+                        raise EvalError('Function missing argument')
+                    name = fnames[arg]
+                    fn = functions.get(name.lower())
+                    if fn is None:
+                        raise EvalError(f'Unknown function: {name}')
+                    push(value(fn(pop())))  # the int itself goes in; only an integral result comes back
+                else:  # NEG, POS, INVERT
+                    push(ops[op](pop()))
+        except IndexError:
+            raise EvalError('Malformed expression') from None
+        if len(st) != 1:
+            raise EvalError('Malformed expression')
+        return st[0]
+
+    def __reduce__(self):
+        return Program, (self.code, self.consts, self.names, self.functions)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Program):
+            return NotImplemented
+        return self.__reduce__() == other.__reduce__()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'Program({len(self.code) // 2} instructions, {len(self.consts)} consts)'
@@ -0,0 +1,402 @@
+"""Newline-delimited JSON evaluation server (``kalc serve``).
+
+Every request is one JSON object on one line, and every request gets exactly
+one response line, in request order, so clients may pipeline freely:
+
+    {"id": 1, "expr": "2 ^ 8", "mode": "scientific"}
+    {"id": 1, "result": 256.0}
+
+    {"id": 2, "expr": "x * 2", "vars": {"x": 21}}
+    {"id": 2, "result": 42.0}
+
+    {"id": 3, "exprs": ["1 + 1", "1 $"]}
+    {"id": 3, "results": [{"result": 2.0}, {"error": "Unknown token at column 3: '$'"}]}
+
+    {"id": 4, "op": "stats"}
+    {"id": 4, "stats": {"requests": ..., "latency_ms": {"p50": ..., "p99": ...}, ...}}
+
+"id" is optional and echoed back as is; "mode" defaults to the server's mode.
+
+All connections share one warm Evaluator and so one compile cache. Whatever
+a connection has pipelined is evaluated in one pass per read and written
+back with one write. With workers > 0, large "exprs" requests, and any work
+arriving while the event loop is already mostly busy evaluating, are sent to
+a process pool so the loop stays responsive.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Optional, Set, Tuple, Union
+
+from .batch import _json_value
+from .evaluator import MODES, EvalError, Evaluator
+from .parallel import DEFAULT_CHUNK_SIZE, _evaluate_chunk, _init_worker
+
+DEFAULT_PORT = 7333
+MAX_LINE = 1 << 20
+
+# "exprs" requests at least this long go to the pool when there is one
+OFFLOAD_MIN = 256
+
+# fraction of wall time spent evaluating on the loop above which it counts as saturated
+SATURATED = 0.75
+LOAD_WINDOW = 1.0
+
+# stop reading from a connection while it has this many offloaded requests outstanding
+MAX_PENDING = 64
+
+LATENCY_WINDOW = 10000
+
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, EvalError):
+        return str(e)
+    return str(e) or type(e).__name__
+
+
+def _failures(resp: dict) -> int:
+    if 'results' in resp:
+        return sum('error' in r for r in resp['results'])
+    return 'error' in resp
+
+
+def _outcome(ok: bool, value) -> dict:
+    return {'result': _json_value(value)} if ok else {'error': _error_text(value)}
+
+
+def _encodable(outcome: dict) -> dict:
+    try:
+        json.dumps(outcome)
+    except ValueError as e:  # e.g. an int past the 4300-digit str() limit
+        return {'error': _error_text(e)}
+    return outcome
+
+
+def _dumps(resp: dict) -> bytes:
+    """resp as one JSON line; a result JSON can't hold is replaced (in resp too) by an error."""
+    try:
+        return json.dumps(resp).encode() + b'\n'
+    except ValueError:
+        pass
+    if 'results' in resp:
+        resp['results'] = [_encodable(r) for r in resp['results']]
+    elif 'result' in resp:
+        resp.update(_encodable({'result': resp.pop('result')}))
+    return json.dumps(resp).encode() + b'\n'
+
+
+class LatencyStats:
+    """Request counters plus latency percentiles over the most recent requests."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.expressions = 0
+        self.errors = 0
+        self.offloaded = 0
+
+    def add(self, seconds: float, expressions: int = 1, errors: int = 0) -> None:
+        self.samples.append(seconds)
+        self.requests += 1
+        self.expressions += expressions
+        self.errors += errors
+
+    def snapshot(self) -> Dict[str, object]:
+        samples = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return {
+            'requests': self.requests,
+            'expressions': self.expressions,
+            'errors': self.errors,
+            'offloaded': self.offloaded,
+            'latency_ms': {
+                'p50': pct(0.50), 'p90': pct(0.90), 'p99': pct(0.99),
+                'max': round(samples[-1] * 1000, 3) if samples else 0.0,
+                'mean': round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+            },
+        }
+
+    def reset(self) -> None:
+        self.__init__(self.samples.maxlen)
+
+
+class Server:
+    """Shared state of one ``kalc serve`` instance: evaluator, worker pool and stats."""
+
+    def __init__(self, mode: str = 'basic', workers: int = 0, ev: Optional[Evaluator] = None):
+        if mode not in MODES:
+            raise ValueError(f'Unknown mode: {mode}')
+        self.mode = mode
+        self.ev = ev or Evaluator(cache_size=65536)
+        self.stats = LatencyStats()
+        self.connections = 0
+        self.pool = None
+        self._pending: Set[Future] = set()  # pool tasks not yet answered, cancelled on close
+        if workers > 0:
+            self.pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                            initargs=(self.ev.cache_size, self.ev.optimize, self.ev.limits))
+        self._busy = 0.0
+        self._window_start = time.perf_counter()
+        self._server = None
+
+    # -- load tracking ---------------------------------------------------
+
+    def _charge(self, seconds: float) -> None:
+        now = time.perf_counter()
+        if now - self._window_start > LOAD_WINDOW:
+            # decay instead of resetting so one quiet instant doesn't hide a busy second
+            self._busy = self._busy / 2
+            self._window_start = now - LOAD_WINDOW / 2
+        self._busy += seconds
+
+    def saturated(self) -> bool:
+        elapsed = max(time.perf_counter() - self._window_start, 1e-3)
+        return self._busy / elapsed > SATURATED
+
+    # -- requests --------------------------------------------------------
+
+    def parse(self, line: bytes) -> Tuple[Optional[dict], Optional[dict]]:
+        """Return (request, None), or (None, error response) for a malformed line."""
+        try:
+            req = json.loads(line)
+        except ValueError:
+            return None, {'error': 'Invalid JSON'}
+        if not isinstance(req, dict):
+            return None, {'error': 'Request must be a JSON object'}
+        resp = {'id': req['id']} if 'id' in req else {}
+        mode = req.setdefault('mode', self.mode)
+        if mode not in MODES:
+            resp['error'] = f'Unknown mode: {mode}'
+        elif 'op' in req:
+            if req['op'] not in ('stats', 'ping'):
+                resp['error'] = f"Unknown op: {req['op']}"
+        elif 'exprs' in req:
+            exprs = req['exprs']
+            if not isinstance(exprs, list) or not all(isinstance(e, str) for e in exprs):
+                resp['error'] = "'exprs' must be a list of strings"
+        elif isinstance(req.get('expr'), str):
+            variables = req.get('vars', {})
+            if not isinstance(variables, dict) or not all(
+                    isinstance(v, (int, float)) and not isinstance(v, bool) for v in variables.values()):
+                resp['error'] = "'vars' must map names to numbers"
+        else:
+            resp['error'] = "Request needs 'expr', 'exprs' or 'op'"
+        if 'error' in resp:
+            return None, resp
+        return req, None
+
+    def size(self, req: dict) -> int:
+        return len(req['exprs']) if 'exprs' in req else 1
+
+    def should_offload(self, req: dict) -> bool:
+        # workers only see expression text, so requests with variables stay here
+        if self.pool is None or 'op' in req or req.get('vars'):
+            return False
+        return self.size(req) >= OFFLOAD_MIN or self.saturated()
+
+    def evaluate(self, req: dict) -> dict:
+        """Answer one parsed request on the shared evaluator."""
+        resp = {'id': req['id']} if 'id' in req else {}
+        op = req.get('op')
+        if op == 'stats':
+            resp['stats'] = self.snapshot()
+            return resp
+        if op == 'ping':
+            resp['ok'] = True
+            return resp
+        ev, mode = self.ev, req['mode']
+        t0 = time.perf_counter()
+        if 'exprs' in req:
+            results = []
+            for expr in req['exprs']:
+                try:
+                    results.append({'result': _json_value(ev.evaluate(expr, mode))})
+                except Exception as e:
+                    results.append({'error': _error_text(e)})
+            resp['results'] = results
+        else:
+            try:
+                resp['result'] = _json_value(ev.compile(req['expr'], mode)(**req.get('vars', {})))
+            except Exception as e:
+                resp['error'] = _error_text(e)
+        self._charge(time.perf_counter() - t0)
+        return resp
+
+    async def offload(self, req: dict) -> dict:
+        """Answer one parsed request in the worker pool, one chunk per worker task."""
+        resp = {'id': req['id']} if 'id' in req else {}
+        mode = req['mode']
+        exprs = req['exprs'] if 'exprs' in req else [req['expr']]
+        items = [(expr, mode) for expr in exprs]
+        futures = [self.pool.submit(_evaluate_chunk, items[i:i + DEFAULT_CHUNK_SIZE])
+                   for i in range(0, len(items), DEFAULT_CHUNK_SIZE)]
+        self._pending.update(futures)
+        try:
+            chunks = await asyncio.gather(*map(asyncio.wrap_future, futures))
+        finally:
+            self._pending.difference_update(futures)
+        results = [_outcome(ok, value) for chunk in chunks for ok, value in chunk]
+        self.stats.offloaded += 1
+        if 'exprs' in req:
+            resp['results'] = results
+        else:
+            resp.update(results[0])
+        return resp
+
+    def snapshot(self) -> Dict[str, object]:
+        snap = self.stats.snapshot()
+        snap['connections'] = self.connections
+        snap['workers'] = self.pool._max_workers if self.pool is not None else 0
+        snap['cache'] = self.ev.cache_info()._asdict()
+        return snap
+
+    # -- lifecycle -------------------------------------------------------
+
+    async def start(self, host: Optional[str] = '127.0.0.1', port: int = DEFAULT_PORT,
+                    path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Listen on a Unix socket if path is given, else on host:port."""
+        loop = asyncio.get_running_loop()
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._server = await loop.create_unix_server(lambda: _Connection(self), path)
+        else:
+            self._server = await loop.create_server(lambda: _Connection(self), host, port)
+        return self._server
+
+    def address(self) -> str:
+        sock = self._server.sockets[0]
+        name = sock.getsockname()
+        if isinstance(name, str):
+            return name
+        return f'{name[0]}:{name[1]}'
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.pool is not None:
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future in list(self._pending):
+                future.cancel()
+            self.pool.shutdown()
+
+
+class _Connection(asyncio.Protocol):
+    """One client. Responses queue in request order; offloaded ones hold back later ones."""
+
+    def __init__(self, server: Server):
+        self.server = server
+        self.transport = None
+        self.buffer = bytearray()
+        self.pending: Deque[Union[bytes, asyncio.Task]] = deque()
+        self.waiting = 0
+        self.write_paused = False
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.server.connections += 1
+
+    def connection_lost(self, exc) -> None:
+        self.server.connections -= 1
+        for item in self.pending:
+            if isinstance(item, asyncio.Task):
+                item.cancel()
+        self.pending.clear()
+
+    def pause_writing(self) -> None:
+        self.write_paused = True
+        self.transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self.write_paused = False
+        self._maybe_resume()
+
+    def _maybe_resume(self) -> None:
+        if not self.write_paused and self.waiting < MAX_PENDING and not self.transport.is_closing():
+            self.transport.resume_reading()
+
+    def data_received(self, data: bytes) -> None:
+        buf = self.buffer
+        buf += data
+        end = buf.rfind(b'\n')
+        if end < 0:
+            if len(buf) > MAX_LINE:
+                self.transport.write(b'{"error": "Request too large"}\n')
+                self.transport.close()
+            return
+        lines = bytes(buf[:end]).split(b'\n')
+        del buf[:end + 1]
+        received = time.perf_counter()
+        server = self.server
+        for line in lines:
+            if not line.strip():
+                continue
+            req, resp = server.parse(line)
+            if req is None:
+                server.stats.add(time.perf_counter() - received, 0, 1)
+                self.pending.append(_dumps(resp))
+            elif server.should_offload(req):
+                task = asyncio.ensure_future(self._offloaded(req, received))
+                task.add_done_callback(self._done)
+                self.pending.append(task)
+                self.waiting += 1
+            else:
+                resp = server.evaluate(req)
+                line = _dumps(resp)  # before counting: a result that can't be sent is a failure
+                if 'op' not in req:
+                    server.stats.add(time.perf_counter() - received, server.size(req), _failures(resp))
+                self.pending.append(line)
+        if self.waiting >= MAX_PENDING:
+            self.transport.pause_reading()
+        self._flush()
+
+    async def _offloaded(self, req: dict, received: float) -> bytes:
+        resp = await self.server.offload(req)
+        line = _dumps(resp)
+        self.server.stats.add(time.perf_counter() - received, self.server.size(req), _failures(resp))
+        return line
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.waiting -= 1
+        if not task.cancelled() and self.transport is not None and not self.transport.is_closing():
+            self._flush()
+            self._maybe_resume()
+
+    def _flush(self) -> None:
+        out = []
+        pending = self.pending
+        while pending:
+            head = pending[0]
+            if isinstance(head, asyncio.Task):
+                if not head.done():
+                    break
+                try:
+                    head = head.result()
+                except Exception as e:
+                    head = json.dumps({'error': _error_text(e)}).encode() + b'\n'
+            out.append(head)
+            pending.popleft()
+        if out:
+            self.transport.write(b''.join(out))
+
+
+async def serve(host: Optional[str] = '127.0.0.1', port: int = DEFAULT_PORT, path: Optional[str] = None,
+                mode: str = 'basic', workers: int = 0, ready=None) -> None:
+    """Run a server until cancelled; ready(address) is called once it is listening."""
+    server = Server(mode, workers)
+    await server.start(host, port, path)
+    if ready is not None:
+        ready(server.address())
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
@@ -0,0 +1,244 @@
+"""Named formulas with incremental recalculation.
+
+A Sheet holds cells: inputs (plain numbers) and formulas (expressions that
+refer to other cells by name). Each formula is compiled once, and the
+variables it uses become its edges in a dependency graph. Changing a cell
+recalculates only the cells downstream of it, in topological order, and
+stops early along any path where a recalculated value did not change:
+
+    sheet = Sheet()
+    sheet['a'] = 2
+    sheet['b'] = 3
+    sheet['total'] = 'a + b'
+    sheet['tax'] = 'total * 0.2'
+    sheet['tax']                      # 1.0
+    with sheet.batch():               # one recalculation for both changes
+        sheet['a'] = 10
+        sheet['b'] = 20
+
+A formula that would close a cycle is rejected with CycleError and the sheet
+is left unchanged. A formula that fails (an unknown name, division by zero,
+or a failing cell it depends on) holds its exception, and reading it raises.
+"""
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from .evaluator import MODES, CompiledExpression, EvalError, Evaluator
+
+Number = Union[int, float]
+
+NAME_RE = re.compile(r'[A-Za-z_]\w*\Z')
+
+
+class CycleError(EvalError):
+    """A formula would make a cell depend on itself; ``cycle`` lists the cells on the loop."""
+
+    def __init__(self, message: str, cycle: Tuple[str, ...]):
+        super().__init__(message)
+        self.cycle = cycle
+
+    def __reduce__(self):
+        return type(self), (str(self), self.cycle)
+
+
+class Sheet:
+    """Cells keyed by name, recalculated incrementally through their dependency graph."""
+
+    def __init__(self, mode: str = 'basic', ev: Optional[Evaluator] = None):
+        if mode not in MODES:
+            raise ValueError('Unknown mode')
+        self.mode = mode
+        self.ev = ev or Evaluator()
+        self._formulas: Dict[str, CompiledExpression] = {}
+        self._values: Dict[str, Union[Number, Exception]] = {}
+        self._deps: Dict[str, Tuple[str, ...]] = {}  # formula -> cells it reads
+        self._dependents: Dict[str, Set[str]] = {}  # cell (defined or not) -> formulas reading it
+        self._dirty: Set[str] = set()
+        self._batch = 0
+
+    # -- editing ---------------------------------------------------------
+
+    def __setitem__(self, name: str, value: Union[Number, str]) -> None:
+        self.set(name, value)
+
+    def set(self, name: str, value: Union[Number, str]) -> None:
+        """Make name an input (a number) or a formula (an expression string)."""
+        if not NAME_RE.match(name) or name.lower() in self.ev.functions:
+            raise ValueError(f'Invalid cell name: {name!r}')
+        if isinstance(value, str):
+            compiled = self.ev.compile(value, self.mode)
+            deps = compiled.variables
+            self._check_cycle(name, deps)
+            self._unlink(name)
+            self._formulas[name] = compiled
+            self._deps[name] = deps
+            for dep in deps:
+                self._dependents.setdefault(dep, set()).add(name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            self._unlink(name)
+            self._values[name] = value
+        else:
+            raise TypeError(f'Cell value must be a number or a formula string, not {type(value).__name__}')
+        self._touch(name)
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self._values and name not in self._formulas:
+            raise KeyError(name)
+        self._unlink(name)
+        self._values.pop(name, None)
+        self._touch(name)
+
+    def update(self, cells: Mapping[str, Union[Number, str]]) -> None:
+        """Set several cells with a single recalculation pass."""
+        with self.batch():
+            for name, value in cells.items():
+                self.set(name, value)
+
+    @contextmanager
+    def batch(self) -> Iterator['Sheet']:
+        """Defer recalculation until the outermost batch() block ends."""
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+            if not self._batch:
+                self.recalculate()
+
+    def _unlink(self, name: str) -> None:
+        if name in self._formulas:
+            del self._formulas[name]
+            for dep in self._deps.pop(name):
+                readers = self._dependents[dep]
+                readers.discard(name)
+                if not readers:
+                    del self._dependents[dep]
+
+    def _touch(self, name: str) -> None:
+        self._dirty.add(name)
+        if not self._batch:
+            self.recalculate()
+
+    def _check_cycle(self, name: str, deps: Tuple[str, ...]) -> None:
+        # a cycle exists if one of deps already reads name, directly or not; searching
+        # downstream from name is free for the usual case of a cell nothing reads yet
+        if name in deps:
+            raise CycleError(f'Circular reference: {name} -> {name}', (name, name))
+        wanted = set(deps)
+        parent: Dict[str, str] = {}
+        stack = [name]
+        while stack:
+            cell = stack.pop()
+            for reader in self._dependents.get(cell, ()):
+                if reader in parent:
+                    continue
+                parent[reader] = cell
+                if reader in wanted:
+                    # reader reads parent[reader] reads ... reads name
+                    path = [reader]
+                    while path[-1] != name:
+                        path.append(parent[path[-1]])
+                    cycle = (name,) + tuple(path)
+                    raise CycleError(f"Circular reference: {' -> '.join(cycle)}", cycle)
+                stack.append(reader)
+
+    # -- recalculation ---------------------------------------------------
+
+    def recalculate(self) -> Set[str]:
+        """Bring every cell downstream of a change up to date; return the names whose value changed."""
+        if not self._dirty:
+            return set()
+        dirty, self._dirty = self._dirty, set()
+        dependents = self._dependents
+        # everything reachable from a changed cell, then Kahn's algorithm within that set
+        affected = set(dirty)
+        stack = list(dirty)
+        while stack:
+            for reader in dependents.get(stack.pop(), ()):
+                if reader not in affected:
+                    affected.add(reader)
+                    stack.append(reader)
+        pending = {name: sum(dep in affected for dep in self._deps[name])
+                   for name in affected if name in self._formulas}
+        ready = [name for name in affected if not pending.get(name)]
+        changed: Set[str] = set()
+        values = self._values
+        while ready:
+            name = ready.pop()
+            compiled = self._formulas.get(name)
+            if compiled is not None and (name in dirty or any(dep in changed for dep in self._deps[name])):
+                old = values.get(name, _MISSING)
+                new = values[name] = self._compute(compiled, self._deps[name])
+                # an unchanged result ends the recalculation along this path
+                if isinstance(new, Exception) or type(new) is not type(old) or new != old:
+                    changed.add(name)
+            elif compiled is None and name in dirty:
+                changed.add(name)  # an input was set, or a cell deleted
+            for reader in dependents.get(name, ()):
+                if reader in pending:
+                    pending[reader] -= 1
+                    if not pending[reader]:
+                        ready.append(reader)
+        return changed
+
+    def _compute(self, compiled: CompiledExpression, deps: Tuple[str, ...]) -> Union[Number, Exception]:
+        env = {}
+        values = self._values
+        for dep in deps:
+            value = values.get(dep, _MISSING)
+            if value is _MISSING:
+                return EvalError(f'Unknown cell: {dep}')
+            if isinstance(value, Exception):
+                return value  # errors flow downstream unchanged
+            env[dep] = value
+        try:
+            return compiled(**env)
+        except Exception as e:
+            return e
+
+    # -- reading ---------------------------------------------------------
+
+    def __getitem__(self, name: str) -> Number:
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def get(self, name: str, default=None) -> Union[Number, Exception, None]:
+        """The value of a cell, its exception if it failed, or default if it doesn't exist."""
+        return self._values.get(name, default)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def formula(self, name: str) -> Optional[str]:
+        """The expression of a formula cell, or None for an input."""
+        compiled = self._formulas.get(name)
+        if compiled is None:
+            if name not in self._values:
+                raise KeyError(name)
+            return None
+        return compiled.expr
+
+    def dependencies(self, name: str) -> Tuple[str, ...]:
+        """Cells that the formula in name reads directly."""
+        return self._deps.get(name, ())
+
+    def dependents(self, name: str) -> List[str]:
+        """Formulas that read name directly."""
+        return sorted(self._dependents.get(name, ()))
+
+    def __repr__(self) -> str:
+        return f'Sheet({len(self._values)} cells, {len(self._formulas)} formulas, mode={self.mode!r})'
+
+
+_MISSING = object()
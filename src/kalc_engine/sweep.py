@@ -0,0 +1,123 @@
+"""Tabulate a single-variable expression over a range.
+
+The expression is compiled once and the range is walked in chunks of
+chunk_size points, so a sweep of any length runs in bounded memory. With
+NumPy each chunk is one vectorized evaluation (see vector); without it the
+compiled expression runs point by point, natively once it is hot. The i-th
+point is ``start + i * step`` (no accumulated rounding) and stop is included
+when the range lands on it:
+
+    for x, y in sweep('sin(x) * exp(-x / 10)', 'x', 0, 1e6, 0.01, mode='scientific'):
+        ...
+    with open('table.csv', 'w') as f:
+        write_csv(sweep_chunks('x ^ 2', 'x', 0, 10, 0.5), f, header=('x', 'x ^ 2'))
+
+A point where the expression fails gets NaN, like sqrt(-1) in the NumPy path
+(where 1/0 is inf rather than an error); an unknown variable or a LimitError
+stops the sweep.
+"""
+import csv
+import math
+from array import array
+from typing import IO, Iterator, List, Optional, Tuple, Union
+
+from . import vector
+from .evaluator import CompiledExpression, EvalError, Evaluator, default_evaluator
+
+Number = Union[int, float]
+
+# points per chunk: 512 KB per float64 column
+CHUNK_SIZE = 65536
+
+
+def count_points(start: Number, stop: Number, step: Number) -> int:
+    """Number of points start, start + step, ... up to and including stop."""
+    if step == 0:
+        raise ValueError('step must not be zero')
+    # rounding keeps 0 .. 1 step 0.1 at 11 points although 1 / 0.1 is not exactly 10
+    return max(0, math.floor(round((stop - start) / step, 9)) + 1)
+
+
+def sweep_chunks(expr: str, var: str, start: Number, stop: Number, step: Number, mode: str = 'basic',
+                 ev: Optional[Evaluator] = None, chunk_size: int = CHUNK_SIZE,
+                 **variables) -> Iterator[Tuple[object, object]]:
+    """Yield (xs, ys) per chunk: ndarrays with NumPy, lists without.
+
+    variables are fixed values for any other names in expr.
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be >= 1')
+    ev = ev or default_evaluator()
+    compiled = ev.compile(expr, mode)
+    unknown = set(compiled.variables) - {var} - set(variables)
+    if unknown:
+        raise EvalError(f'Unknown variable: {min(unknown)}')
+    # a separate generator, so that bad arguments raise here rather than on the first next()
+    return _chunks(ev, compiled, var, start, step, count_points(start, stop, step), chunk_size, variables)
+
+
+def _chunks(ev: Evaluator, compiled: CompiledExpression, var: str, start: Number, step: Number, n: int,
+            chunk_size: int, variables: dict) -> Iterator[Tuple[object, object]]:
+    np = vector.np
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        if np is not None:
+            xs = np.arange(lo, hi) * step + start
+            yield xs, vector.evaluate_columns(compiled, ev.functions, {**variables, var: xs}, ev.limits)
+            continue
+        xs = [start + i * step for i in range(lo, hi)]
+        ys = []
+        append = ys.append
+        env = dict(variables)
+        for x in xs:
+            env[var] = x
+            try:
+                append(compiled(**env))
+            except (ArithmeticError, ValueError):
+                append(math.nan)
+        yield xs, ys
+
+
+def sweep(expr: str, var: str, start: Number, stop: Number, step: Number, mode: str = 'basic',
+          ev: Optional[Evaluator] = None, chunk_size: int = CHUNK_SIZE,
+          **variables) -> Iterator[Tuple[Number, Number]]:
+    """Yield (x, f(x)) for every point of the range, as Python numbers; see sweep_chunks."""
+    chunks = sweep_chunks(expr, var, start, stop, step, mode, ev, chunk_size, **variables)
+    return (point for xs, ys in chunks for point in zip(_as_list(xs), _as_list(ys)))
+
+
+def _as_list(column) -> List[Number]:
+    # Python numbers: fast to format, and repr(np.float64) is not a plain number in NumPy 2
+    return column.tolist() if hasattr(column, 'tolist') else column
+
+
+def write_csv(chunks: Iterator[Tuple[object, object]], out: IO[str],
+              header: Optional[Tuple[str, str]] = None) -> int:
+    """Write chunks as 'x,y' lines (repr, so floats round-trip); return the number of rows."""
+    rows = 0
+    if header is not None:
+        csv.writer(out, lineterminator='\n').writerow(header)  # quotes an expression with commas
+    for xs, ys in chunks:
+        xs, ys = _as_list(xs), _as_list(ys)
+        out.write(''.join([f'{x!r},{y!r}\n' for x, y in zip(xs, ys)]))
+        rows += len(xs)
+    return rows
+
+
+def write_binary(chunks: Iterator[Tuple[object, object]], out: IO[bytes]) -> int:
+    """Write chunks as native-endian float64 (x, y) pairs; return the number of rows.
+
+    The file reads back with numpy.fromfile(path).reshape(-1, 2).
+    """
+    rows = 0
+    np = vector.np
+    for xs, ys in chunks:
+        if np is not None:
+            out.write(np.column_stack((xs, ys)).astype(np.float64).tobytes())
+        else:
+            pairs = array('d', bytes(16 * len(xs)))
+            pairs[0::2] = array('d', map(float, xs))
+            pairs[1::2] = array('d', map(float, ys))
+            out.write(pairs.tobytes())
+        rows += len(xs)
+    return rows
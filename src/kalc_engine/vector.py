@@ -0,0 +1,357 @@
+"""Vectorized evaluation: run one compiled expression over whole columns.
+
+NumPy is optional. When it is installed the Program is walked once with every
+stack entry being a whole array, and functions map to ufuncs; otherwise the
+compiled expression is applied row by row in plain Python.
+
+Integer columns are computed as int64 only while that is exact: before each
++ - * ** << the largest possible result is bounded from the operands, and if
+it might not fit, the operands become object arrays of Python ints, so the
+result is the same as evaluate() gives, however wide.
+
+In a word mode (see word) every column is cast to the word's dtype, e.g.
+uint32 for 'programmer:u32', and the program runs in that dtype: NumPy
+integer arithmetic wraps just like the word, so no Python int is ever built
+per row. Division by zero raises there, as in the interpreter, since an
+integer array has no inf to give.
+"""
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below
+    np = None
+
+from .evaluator import CompiledExpression, EvalError, Limits
+from .program import CALL, CONST, LSHIFT, MUL, OPNAMES, POW, VAR, Program, checked, prog_int
+from .word import WORDS, Word
+
+# self.functions name -> numpy ufunc name
+UFUNCS = {
+    'sin': 'sin',
+    'cos': 'cos',
+    'tan': 'tan',
+    'asin': 'arcsin',
+    'acos': 'arccos',
+    'atan': 'arctan',
+    'log': 'log10',
+    'ln': 'log',
+    'exp': 'exp',
+    'sqrt': 'sqrt',
+    'abs': 'abs',
+    'floor': 'floor',
+    'ceil': 'ceil',
+}
+
+INT64_MAX = 2 ** 63 - 1
+
+
+def _is_column(value) -> bool:
+    return hasattr(value, '__len__') and not isinstance(value, (str, bytes))
+
+
+def _split_columns(columns: Dict[str, object]) -> Tuple[int, List[str], List[str]]:
+    """Return (row count, column names, scalar names); columns must share one length."""
+    names = [k for k, v in columns.items() if _is_column(v)]
+    scalars = [k for k in columns if k not in names]
+    lengths = {len(columns[k]) for k in names}
+    if len(lengths) > 1:
+        raise ValueError(f'Columns have different lengths: {sorted(lengths)}')
+    return (lengths.pop() if lengths else 1), names, scalars
+
+
+def evaluate_columns(compiled: CompiledExpression, functions: dict, columns: Dict[str, object],
+                     limits: Optional[Limits] = None):
+    """Evaluate compiled over columns; see Evaluator.evaluate_batch."""
+    n, names, scalars = _split_columns(columns)
+    if np is None:
+        fixed = {k: columns[k] for k in scalars}
+        if not names:
+            return [compiled(**fixed)] * n
+        out = []
+        for row in zip(*(columns[k] for k in names)):
+            fixed.update(zip(names, row))
+            out.append(compiled(**fixed))
+        return out
+    word = WORDS.get(compiled.mode)
+    arrays = {k: np.asarray(v) if word is not None else _int64_or_objects(np.asarray(v))
+              for k, v in columns.items()}
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if word is not None:
+            res = _run_word_arrays(compiled.program, word, functions, arrays)
+        else:
+            res = _run_arrays(compiled.program, functions, arrays, limits)
+    return np.broadcast_to(res, (n,)).copy()
+
+
+def _int64_or_objects(x):
+    # bool and unsigned columns would not mix with int64 as Python ints do
+    if x.dtype.kind in 'bu':
+        if x.size and int(x.max()) > INT64_MAX:
+            return x.astype(object)
+        return x.astype(np.int64)
+    return x
+
+
+def _int_bound(x) -> Optional[int]:
+    """Largest absolute value of an int or int64 operand; None for anything else."""
+    if isinstance(x, (int, np.integer)):
+        return abs(int(x))
+    if isinstance(x, np.ndarray) and x.dtype.kind == 'i':
+        return max(-int(x.min()), int(x.max())) if x.size else 0
+    return None
+
+
+def _has_negative(x) -> bool:
+    return bool(np.any(np.asarray(x) < 0))
+
+
+def _objects(x):
+    """x with its ints as Python ints, which never overflow."""
+    if isinstance(x, np.ndarray):
+        return x.astype(object)
+    # 0-d, so that ufuncs such as np.mod don't convert a wide int back to int64
+    return np.array(int(x), dtype=object)
+
+
+def _exact(val: str, a, b=None) -> Tuple[object, object]:
+    """(a, b), as Python ints if int64 could overflow (or refuse) computing a val b."""
+    ba = _int_bound(a)
+    bb = 0 if b is None else _int_bound(b)
+    if ba is None or bb is None:
+        return a, b  # a float or object operand: NumPy already computes as Python would
+    if val == 'u-':
+        big = ba > INT64_MAX  # -(-2 ** 63)
+    elif val in ('+', '-'):
+        big = ba + bb > INT64_MAX
+    elif val == '*':
+        big = ba * bb > INT64_MAX
+    elif val == '**':
+        # int64 ** negative raises where Python gives a float
+        big = _has_negative(b) or (ba > 1 and ba.bit_length() * bb >= 63)
+    elif val == '/':
+        big = max(ba, bb) > 2 ** 53  # Python divides ints exactly; float64 would round each first
+    elif val == '<<':
+        big = _has_negative(b) or (ba and ba.bit_length() + bb >= 63)
+    elif val == '>>':
+        # Python raises for a negative count and gives 0 or -1 past the width
+        big = _has_negative(b) or bb >= 64 or ba > INT64_MAX
+    else:
+        big = ba > INT64_MAX or bb > INT64_MAX  # a literal too wide to mix with an int64 array
+    if not big:
+        return a, b
+    return _objects(a), (None if b is None else _objects(b))
+
+
+def _is_objects(x) -> bool:
+    return isinstance(x, np.ndarray) and x.dtype.kind == 'O'
+
+
+def _checked_objects(op: int, a, b, limits: Limits):
+    # element-wise program.checked(), for operands that are Python ints
+    return np.frompyfunc(lambda x, y: checked(op, x, y, limits), 2, 1)(a, b)
+
+
+def _to_int_array(x):
+    # array counterpart of Evaluator.eval_rpn's to_int_if_needed
+    if isinstance(x, float):
+        if not x.is_integer():
+            raise EvalError('Bitwise operations require integer operands')
+        return int(x)
+    if isinstance(x, int):
+        return x
+    x = np.asarray(x)
+    if x.dtype.kind == 'f':
+        if not np.all(np.floor(x) == x):
+            raise EvalError('Bitwise operations require integer operands')
+        if np.all(np.abs(x) <= INT64_MAX):
+            return x.astype(np.int64)
+        return np.frompyfunc(int, 1, 1)(x)  # exact, like int(x) on each
+    if x.dtype.kind == 'O':
+        try:
+            return np.frompyfunc(prog_int, 1, 1)(x)
+        except TypeError:
+            raise EvalError('Bitwise operations require integer operands') from None
+    if x.dtype.kind not in 'iub':
+        raise EvalError('Bitwise operations require integer operands')
+    return x
+
+
+def _run_arrays(program: Program, functions: dict, arrays: dict, limits: Optional[Limits] = None):
+    st = []
+    try:
+        for op, arg in program.instructions():
+            val = OPNAMES.get(op)
+            if op == CONST:
+                st.append(program.consts[arg])
+            elif op == VAR:
+                val = program.names[arg]
+                if val not in arrays:
+                    raise EvalError(f'Unknown variable: {val}')
+                st.append(arrays[val])
+            elif op == CALL:
+                val = program.functions[arg]
+                name = val.lower()
+                if name not in functions:
+                    raise EvalError(f'Unknown function: {val}')
+                arg = np.asarray(st.pop(), dtype=float)
+                ufunc = UFUNCS.get(name)
+                if ufunc is not None:
+                    st.append(getattr(np, ufunc)(arg))
+                else:
+                    # function without a ufunc equivalent: apply element-wise
+                    st.append(np.vectorize(functions[name], otypes=[float])(arg))
+            elif val in ('u-', 'u+', '~'):
+                a = st.pop()
+                if val == 'u-':
+                    st.append(-_exact('u-', a)[0])
+                elif val == 'u+':
+                    st.append(+a)
+                else:
+                    st.append(~_to_int_array(a))
+            elif val in ('+', '-', '*', '/', '%', '**'):
+                b = st.pop()
+                a, b = _exact(val, st.pop(), b)
+                # int64 arrays can't grow; plain ints (e.g. 0xFF ** 9999) and Python int arrays can
+                if limits is not None and val in ('*', '**') and type(a) is int and type(b) is int:
+                    st.append(checked(MUL if val == '*' else POW, a, b, limits))
+                elif limits is not None and val in ('*', '**') and (_is_objects(a) or _is_objects(b)):
+                    st.append(_checked_objects(MUL if val == '*' else POW, a, b, limits))
+                elif val == '+':
+                    st.append(a + b)
+                elif val == '-':
+                    st.append(a - b)
+                elif val == '*':
+                    st.append(a * b)
+                elif val == '/':
+                    st.append(np.true_divide(a, b))
+                elif val == '%':
+                    st.append(np.mod(a, b))
+                else:
+                    st.append(a ** b)
+            elif val in ('&', '|', '^', '<<', '>>'):
+                b = _to_int_array(st.pop())
+                a, b = _exact(val, _to_int_array(st.pop()), b)
+                if val == '&':
+                    st.append(a & b)
+                elif val == '|':
+                    st.append(a | b)
+                elif val == '^':
+                    st.append(a ^ b)
+                elif val == '<<':
+                    if limits is not None and type(a) is int and type(b) is int:
+                        st.append(checked(LSHIFT, a, b, limits))
+                    elif limits is not None and (_is_objects(a) or _is_objects(b)):
+                        st.append(_checked_objects(LSHIFT, a, b, limits))
+                    else:
+                        st.append(a << b)
+                else:
+                    st.append(a >> b)
+            else:
+                raise EvalError(f'Unsupported operator: {val}')
+    except IndexError:
+        raise EvalError('Malformed expression') from None
+    if len(st) != 1:
+        raise EvalError('Malformed expression')
+    return st[0]
+
+
+def _word_array(x, word: Word):
+    """x as an array (or scalar) of the word's dtype, wrapped; only integral values are accepted."""
+    dtype = np.dtype(word.dtype)
+    x = np.asarray(x)
+    if x.dtype.kind == 'f':
+        if not np.all(np.floor(x) == x):
+            raise EvalError('Word mode needs integer values')
+        if not np.all(np.abs(x) < 2.0 ** 63):
+            raise EvalError('Word mode needs integer values within 64 bits')
+        x = x.astype(np.int64)
+    elif x.dtype.kind == 'O':
+        # e.g. Python ints too wide for any dtype: wrap them one by one
+        return np.array([word.value(v) for v in x.ravel().tolist()], dtype=dtype).reshape(x.shape)
+    elif x.dtype.kind not in 'iub':
+        raise EvalError('Word mode needs integer values')
+    return x.astype(dtype, copy=False)  # integer casts wrap, as the word does
+
+
+def _run_word_arrays(program: Program, word: Word, functions: dict, arrays: dict):
+    # every stack entry has the word's dtype, so + - * ~ and unary - wrap by themselves
+    scalar = np.dtype(word.dtype).type
+    bits = word.bits
+    st = []
+    try:
+        for op, arg in program.instructions():
+            val = OPNAMES.get(op)
+            if op == CONST:
+                st.append(scalar(word.wrap(program.consts[arg])))
+            elif op == VAR:
+                val = program.names[arg]
+                if val not in arrays:
+                    raise EvalError(f'Unknown variable: {val}')
+                st.append(_word_array(arrays[val], word))
+            elif op == CALL:
+                val = program.functions[arg]
+                name = val.lower()
+                if name not in functions:
+                    raise EvalError(f'Unknown function: {val}')
+                a = st.pop()
+                ufunc = UFUNCS.get(name)
+                if ufunc is not None:
+                    st.append(_word_array(getattr(np, ufunc)(a), word))
+                else:
+                    fn = functions[name]
+                    st.append(np.vectorize(lambda v: word.value(fn(int(v))), otypes=[word.dtype])(a))
+            elif val in ('u-', 'u+', '~'):
+                a = st.pop()
+                if val == 'u-':
+                    st.append(-a)
+                elif val == 'u+':
+                    st.append(a)
+                else:
+                    st.append(~a)
+            else:
+                b = st.pop()
+                a = st.pop()
+                if val == '+':
+                    st.append(a + b)
+                elif val == '-':
+                    st.append(a - b)
+                elif val == '*':
+                    st.append(a * b)
+                elif val in ('/', '%'):
+                    if np.any(b == 0):
+                        raise ZeroDivisionError(f"integer {'division' if val == '/' else 'modulo'} by zero")
+                    if val == '%':
+                        st.append(np.fmod(a, b))  # sign of the dividend, as in C
+                    else:
+                        q = a // b
+                        # // floors; truncate toward zero instead
+                        st.append(q + ((q < 0) & (q * b != a)).astype(q.dtype) if word.signed else q)
+                elif val == '**':
+                    if word.signed and np.any(b < 0):
+                        raise EvalError('Negative exponent in word mode')
+                    st.append(a ** b)
+                elif val == '&':
+                    st.append(a & b)
+                elif val == '|':
+                    st.append(a | b)
+                elif val == '^':
+                    st.append(a ^ b)
+                elif val in ('<<', '>>'):
+                    if word.signed and np.any(b < 0):
+                        raise ValueError('negative shift count')
+                    # shifting by the width or more is undefined in C; the word gives 0 (or -1 for >>)
+                    n = np.minimum(b, bits - 1)
+                    if val == '<<':
+                        st.append(np.where(b < bits, a << n, scalar(0)))
+                    elif word.signed:
+                        st.append(a >> n)
+                    else:
+                        st.append(np.where(b < bits, a >> n, scalar(0)))
+                else:
+                    raise EvalError(f'Unsupported operator: {val}')
+    except IndexError:
+        raise EvalError('Malformed expression') from None
+    if len(st) != 1:
+        raise EvalError('Malformed expression')
+    return st[0]
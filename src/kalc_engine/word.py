@@ -0,0 +1,118 @@
+"""Fixed-width integer arithmetic for the programmer word modes.
+
+Mode 'programmer:i32' (signed) or 'programmer:u32' (unsigned), for 8, 16, 32
+and 64 bits, models a machine register: every value is an int of that width,
+and every result wraps around as two's complement, so ~0 is 0xFFFFFFFF in
+u32 and -1 in i32. Literals must be integers, and so must variables
+(integral floats are accepted). / and % truncate toward zero as in C. A
+shift by the word size or more gives 0 (or -1 for a negative value >>). No
+value ever grows past the word, and no operation goes through a float.
+
+Each Word holds the wrapped operators as plain functions keyed by operator
+name, so the interpreter never re-checks types.
+"""
+from typing import Callable, Dict
+
+from .evaluator import WORD_MODES, EvalError
+
+
+class Word:
+    """Width and signedness of one word mode, with its wrapping operators."""
+
+    __slots__ = ('bits', 'signed', 'mask', 'half', 'ops', 'value', '_wrap')
+
+    def __init__(self, bits: int, signed: bool):
+        self.bits = bits
+        self.signed = signed
+        self.mask = (1 << bits) - 1
+        self.half = 1 << (bits - 1)
+        self._wrap = self._wrapper()
+        self.value: Callable[[object], int] = self._valuer()
+        self.ops: Dict[str, Callable] = self._operators()
+
+    @property
+    def dtype(self) -> str:
+        """Name of the NumPy dtype with this width and signedness."""
+        return f"{'' if self.signed else 'u'}int{self.bits}"
+
+    def wrap(self, x: int) -> int:
+        return self._wrap(x)
+
+    def _wrapper(self) -> Callable[[int], int]:
+        mask, half = self.mask, self.half
+        if self.signed:
+            return lambda x: ((x + half) & mask) - half
+        return lambda x: x & mask
+
+    def _valuer(self) -> Callable[[object], int]:
+        wrap, mask, half, signed = self._wrap, self.mask, self.half, self.signed
+
+        def value(x) -> int:
+            """A variable or function result as a word; only integer values are accepted."""
+            if x.__class__ is int:  # by far the most common case, so wrapped inline
+                return ((x + half) & mask) - half if signed else x & mask
+            if isinstance(x, float):
+                if not x.is_integer():
+                    raise EvalError(f'Word mode needs integer values, not {x!r}')
+                return wrap(int(x))
+            try:
+                return wrap(x.__index__())  # bools and NumPy integers
+            except AttributeError:
+                raise EvalError(f'Word mode needs integer values, not {type(x).__name__}') from None
+        return value
+
+    def _operators(self) -> Dict[str, Callable]:
+        bits, mask, half, wrap = self.bits, self.mask, self.half, self._wrap
+
+        def div(a: int, b: int) -> int:
+            if not b:
+                raise ZeroDivisionError('integer division by zero')
+            q = abs(a) // abs(b)
+            return wrap(-q if (a < 0) != (b < 0) else q)  # i32: -2**31 / -1 wraps, as in hardware
+
+        def mod(a: int, b: int) -> int:
+            if not b:
+                raise ZeroDivisionError('integer modulo by zero')
+            r = abs(a) % abs(b)
+            return -r if a < 0 else r
+
+        def pow_(a: int, b: int) -> int:
+            if b < 0:
+                raise EvalError('Negative exponent in word mode')
+            return wrap(pow(a, b, mask + 1))
+
+        def lshift(a: int, b: int) -> int:
+            if b < 0:
+                raise ValueError('negative shift count')
+            return wrap(a << b) if b < bits else 0
+
+        def rshift(a: int, b: int) -> int:
+            if b < 0:
+                raise ValueError('negative shift count')
+            return a >> min(b, bits)  # arithmetic for signed words; unsigned ones are never negative
+
+        signed = self.signed
+        return {
+            # wrap inlined: these run on every + - * in the interpreter
+            '+': (lambda a, b: ((a + b + half) & mask) - half) if signed else (lambda a, b: (a + b) & mask),
+            '-': (lambda a, b: ((a - b + half) & mask) - half) if signed else (lambda a, b: (a - b) & mask),
+            '*': (lambda a, b: ((a * b + half) & mask) - half) if signed else (lambda a, b: (a * b) & mask),
+            '/': div,
+            '%': mod,
+            '**': pow_,
+            # in-range operands give in-range results
+            '&': lambda a, b: a & b,
+            '|': lambda a, b: a | b,
+            '^': lambda a, b: a ^ b,
+            '<<': lshift,
+            '>>': rshift,
+            'u-': lambda a: wrap(-a),
+            'u+': lambda a: a,
+            '~': (lambda a: ~a) if signed else (lambda a: a ^ mask),
+        }
+
+    def __repr__(self) -> str:
+        return f"Word({self.bits}, {'signed' if self.signed else 'unsigned'})"
+
+
+WORDS: Dict[str, Word] = {mode: Word(int(mode[12:]), mode[11] == 'i') for mode in WORD_MODES}
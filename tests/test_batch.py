@@ -0,0 +1,73 @@
+import io
+import json
+import os
+
+import pytest
+from kalc_engine.__main__ import main
+from kalc_engine.batch import run_batch
+from kalc_engine.db import Store
+from kalc_engine.evaluator import Evaluator
+
+INPUT = os.path.join(os.path.dirname(__file__), 'test_input.txt')
+
+
+def test_batch_plain_honours_mode_lines():
+    out = io.StringIO()
+    with open(INPUT) as f:
+        failed = run_batch(f, out)
+    assert failed == 0
+    assert out.getvalue() == '4.0\n0.0\n15\n'
+
+
+def test_batch_errors_do_not_abort():
+    out = io.StringIO()
+    failed = run_batch(['1/0', '', '# comment', '2 ^ 3', '.mode nope', '1 +'], out, mode='scientific',
+                       json_lines=True)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert failed == 3
+    assert [r['line'] for r in records] == [1, 4, 5, 6]
+    assert records[1]['result'] == 8.0
+    assert 'error' in records[0] and 'error' in records[2] and 'error' in records[3]
+
+
+def test_batch_unprintable_result_fails_its_line():
+    out = io.StringIO()
+    # no limits: an int too wide for str() still evaluates
+    failed = run_batch(['.mode programmer', '2**20000', '1+1'], out, ev=Evaluator(limits=None))
+    assert failed == 1
+    first, second = out.getvalue().splitlines()
+    assert first.startswith('Error: ') and second == '2'
+
+
+def test_cli_batch(capsys):
+    assert main(['--batch', INPUT]) == 0
+    assert capsys.readouterr().out == '4.0\n0.0\n15\n'
+
+
+def test_cli_one_shot(capsys):
+    assert main(['-e', '2 ^ 8', '-m', 'scientific']) == 0
+    assert main(['--mode=programmer', '-e0xF0 | 0x0F']) == 0
+    assert main(['-e', '-1 + 2']) == 0
+    assert capsys.readouterr().out == '256.0\n255\n1.0\n'
+    assert main(['-e', '1 / 0']) == 1
+    assert capsys.readouterr().err == 'Error: float division by zero\n'
+
+
+def test_cli_one_shot_flags(tmp_path, capsys):
+    db = str(tmp_path / 'h.sqlite3')
+    assert main(['-e', '1 + 1', '--db', db]) == 0
+    assert capsys.readouterr().out == '2.0\n'
+    with Store(db) as store:
+        assert [e.expression for e in store.history()] == ['1 + 1']
+    for flag in (['--json'], ['--jobs', '4'], ['--profile']):
+        with pytest.raises(SystemExit):
+            main(['-e', '1 + 1'] + flag)
+
+
+def test_one_shot_skips_argparse():
+    from kalc_engine.__main__ import one_shot_args
+    assert one_shot_args(['-e', '1+1']) == ('1+1', 'basic')
+    assert one_shot_args(['--eval=x', '-m', 'programmer']) == ('x', 'programmer')
+    # anything else is left to the full parser
+    for argv in (['-e'], ['-m', 'basic'], ['-e', '1', '--json'], ['-e', '1', '-m', 'hex'], ['--batch']):
+        assert one_shot_args(argv) is None
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), '..', 'benchmarks')
+
+# every script, on inputs small enough for the test run; bench_tokenize always
+# goes up to 1 MB, past the default limits, which is what broke it once
+RUNS = [
+    ['bench_codegen.py'],
+    ['bench_db.py', '200'],
+    ['bench_ingest.py', '1'],
+    ['bench_parallel.py', '200', '2'],
+    ['bench_program.py', '200'],
+    ['bench_sheet.py', '50'],
+    ['bench_startup.py', '-n', '1'],
+    ['bench_sweep.py', '200'],
+    ['bench_tokenize.py'],
+    ['bench_word.py', '200'],
+    ['loadgen.py', '-t', '0.2', '-c', '2'],
+    ['suite.py', '--quick', '-k', 'basic'],
+]
+
+
+def test_every_benchmark_is_covered():
+    scripts = {name for name in os.listdir(BENCHMARKS) if name.endswith('.py')}
+    assert scripts == {argv[0] for argv in RUNS}
+
+
+@pytest.mark.parametrize('argv', RUNS, ids=lambda argv: argv[0])
+def test_benchmark_runs_to_the_end(argv):
+    proc = subprocess.run([sys.executable, os.path.join(BENCHMARKS, argv[0])] + argv[1:],
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
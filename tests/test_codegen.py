@@ -0,0 +1,73 @@
+import math
+
+import pytest
+from kalc_engine.evaluator import MODES, Evaluator, EvalError
+
+EXPRS = [
+    '2+3',
+    '-3 + 5',
+    '2 ^ 3',
+    '2 ** 3 ** 2',
+    '10 * 2 / 4 - 7 % 3',
+    'sin(3.1415926535/2)',
+    'sqrt(25) + abs(-2) * floor(3.7) - ceil(1.2)',
+    '0b1010 & 0b1100',
+    '5 ^ 2',
+    '0xFF & 0x0F | 0o7',
+    '15 << 1 >> 2',
+    '~5 + 1',
+    '2 * -3',
+    '4 / 2 & 3',
+    '1.5 | 1',
+    '1 / 0',
+    '2 + * 3',
+    'foo(2)',
+    'sin(3.14159/2) * 2 + sin(3.14159/2) * 3',
+    '(2 + 0) * 1 - 0 | 0',
+    '--4 + ~~5',
+    '0 - 0 + sqrt(-1)',
+]
+
+
+def outcome(fn):
+    try:
+        res = fn()
+    except Exception as e:  # compare error type and message too
+        return type(e), str(e)
+    return type(res), res
+
+
+@pytest.mark.parametrize('backend', [
+    {'jit_threshold': 0, 'optimize': True},
+    {'jit_threshold': 0, 'optimize': False},
+    {'jit_threshold': 1000},  # stays on the Program interpreter
+])
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('expr', EXPRS)
+def test_native_matches_interpreter(expr, mode, backend):
+    ev = Evaluator(**backend)
+
+    def interpreted():
+        res = ev.eval_rpn(ev.to_rpn(ev.tokenize(expr), mode), mode)
+        if mode == 'programmer' and isinstance(res, float) and res.is_integer():
+            return int(res)
+        return res
+
+    assert outcome(lambda: ev.evaluate(expr, mode=mode)) == outcome(interpreted)
+
+
+def test_native_variables_and_deep_expressions():
+    ev = Evaluator(jit_threshold=0)
+    f = ev.compile('x * y + x', mode='basic')
+    assert f(x=2, y=5) == 12
+    with pytest.raises(EvalError):
+        f(x=2)
+    assert ev.evaluate('+'.join(['x'] * 5000), mode='basic', x=1.0) == 5000
+    assert math.isclose(ev.evaluate('sin(' * 300 + '1' + ')' * 300, mode='scientific'), 0.0995, abs_tol=1e-3)
+
+
+def test_native_after_jit_threshold():
+    ev = Evaluator(jit_threshold=3)
+    f = ev.compile('x * 2', mode='basic')
+    assert [f(x=i) for i in range(5)] == [0, 2, 4, 6, 8]
+    assert f._fn is not None
@@ -0,0 +1,141 @@
+import math
+import sqlite3
+
+import pytest
+from kalc_engine.db import Store
+from kalc_engine.evaluator import Evaluator, LimitError, Limits
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'kalc.sqlite3')
+
+
+def test_history_is_logged(path):
+    with Store(path) as store:
+        ev = Evaluator(store=store)
+        ev.evaluate('1 + 1')
+        ev.evaluate('x * 2', x=4)
+        with pytest.raises(ZeroDivisionError):
+            ev.evaluate('1 / 0')
+        ev.evaluate('0xFF', mode='programmer')
+        entries = store.history()
+        assert [(e.expression, e.mode, e.result, e.error) for e in entries] == [
+            ('0xFF', 'programmer', 255, None),
+            ('1 / 0', 'basic', None, 'float division by zero'),
+            ('x * 2', 'basic', 8.0, None),
+            ('1 + 1', 'basic', 2.0, None),
+        ]
+        assert [e.expression for e in store.history(limit=1)] == ['0xFF']
+        assert [e.expression for e in store.history(mode='programmer')] == ['0xFF']
+        assert len(store.history(expression='1 + 1')) == 1
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list('history')")}
+    assert 'history_expression_mode' in indexes
+
+
+def test_results_survive_sessions(path):
+    with Store(path) as store:
+        ev = Evaluator(store=store)
+        assert ev.evaluate('sqrt(16) + 2 ^ 10', mode='scientific') == 1028.0
+        ev.evaluate('x + 1', x=1)  # not pure: never cached
+        ev.evaluate('1 << 100', mode='programmer')
+        with pytest.raises(ZeroDivisionError):
+            ev.evaluate('1 / 0')  # errors are logged, not cached
+    with Store(path) as store:
+        ev = Evaluator(store=store)
+        assert ev.evaluate('sqrt(16) + 2 ^ 10', mode='scientific') == 1028.0
+        assert ev.evaluate('1 << 100', mode='programmer') == 1 << 100
+        assert ev.evaluate('1e308 * 10') == math.inf
+        assert (store.hits, store.misses) == (2, 1)
+        assert ev.cache_info().misses == 1  # only the new expression was parsed
+        assert store.counts() == (7, 3)
+
+
+def test_impure_and_rebound_functions_are_not_cached(path):
+    with Store(path) as store:
+        ev = Evaluator(store=store)
+        ev.add_function('sin', lambda x: 42)
+        ev.evaluate('sin(1)', mode='scientific')
+        ev.evaluate('y', y=1)
+        assert store.counts()[1] == 0
+
+
+def test_cached_results_respect_rebound_functions(path):
+    with Store(path) as store:
+        ev = Evaluator(store=store)
+        assert ev.evaluate('sin(1)', mode='scientific') == math.sin(1)
+        assert ev.evaluate('2 ** 1000', mode='programmer') == 2**1000
+        store.flush()
+        ev = Evaluator(store=store)
+        ev.add_function('sin', lambda x: 42.0)
+        assert ev.evaluate('sin(1)', mode='scientific') == 42.0
+        assert ev.evaluate('cos(0) + 1', mode='scientific') == 2.0  # calls nothing rebound: cached
+        assert ev.evaluate('2 ** 1000', mode='programmer') == 2**1000  # served from the cache
+        assert store.hits == 1
+
+
+def test_cached_results_keyed_on_limits(path):
+    with Store(path) as store:
+        assert Evaluator(store=store).evaluate('2 ** 1000', mode='programmer') == 2**1000
+        store.flush()
+        with pytest.raises(LimitError):
+            Evaluator(store=store, limits=Limits(max_int_bits=100)).evaluate('2 ** 1000', mode='programmer')
+        assert store.lookup('2 ** 1000', 'programmer', Limits(max_int_bits=100)) is None
+        assert store.lookup('2 ** 1000', 'programmer') == 2**1000
+
+
+def test_results_past_the_digit_limit(path):
+    with Store(path) as store:
+        ev = Evaluator(store=store, limits=None)
+        assert ev.evaluate('1 << 20000', mode='programmer') == 1 << 20000
+        assert store.history()[0].result == 1 << 20000
+    with Store(path) as store:
+        assert Evaluator(store=store, limits=None).evaluate('1 << 20000', mode='programmer') == 1 << 20000
+        assert store.hits == 1
+
+
+def test_results_pruned_least_recently_used(path):
+    with Store(path, max_results=10) as store:
+        ev = Evaluator(cache_size=0, store=store)
+        ev.evaluate('0 + 0')
+        for i in range(1, 30):
+            store.flush()
+            ev.evaluate('0 + 0')  # keeps this one recent
+            ev.evaluate(f'{i} + 0')
+        store.flush()
+        assert store.counts()[1] <= 11
+        assert store.lookup('0 + 0', 'basic') == 0.0
+        assert store.lookup('1 + 0', 'basic') is None
+
+
+def test_history_pruned(path):
+    with Store(path, max_history=50) as store:
+        for i in range(200):
+            store.record(str(i), 'basic', i)
+        assert store.counts()[0] <= 55
+        assert store.history(limit=1)[0].expression == '199'
+
+
+def test_writes_are_batched(path):
+    with Store(path, flush_interval=60) as store:
+        transactions = []
+        write = store._write
+        store._write = lambda conn, batch, rows: transactions.append(len(batch)) or write(conn, batch, rows)
+        for i in range(5000):
+            store.record(str(i), 'basic', i)
+        assert store.counts()[0] == 5000
+        assert len(transactions) <= 5000 // store.flush_every + 2
+
+
+def test_cli_batch_db(tmp_path, capsys):
+    from kalc_engine.__main__ import main
+    src = tmp_path / 'in.txt'
+    src.write_text('1 + 2\n2 ^ 10\n1 / 0\n')
+    db = str(tmp_path / 'h.sqlite3')
+    assert main(['--batch', '--db', db, str(src)]) == 1
+    assert main(['--batch', '--db', db, str(src)]) == 1
+    assert capsys.readouterr().out.count('3.0\n') == 2
+    with Store(db) as store:
+        assert store.counts() == (6, 2)
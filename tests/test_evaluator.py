@@ -1,5 +1,5 @@
 import pytest
-from kalc_engine.evaluator import Evaluator, EvalError
+from kalc_engine.evaluator import Evaluator, EvalError, TokenError
 
 
 def test_basic_add():
@@ -33,3 +33,133 @@ def test_malformed():
     ev = Evaluator()
     with pytest.raises(EvalError):
         ev.evaluate('2 + * 3', mode='basic')
+
+
+def test_unary_minus_precedence():
+    ev = Evaluator()
+    assert ev.evaluate('2 * -3', mode='basic') == -6
+    assert ev.evaluate('-2 ^ 2', mode='scientific') == -4
+    assert ev.evaluate('2 ^ -1', mode='scientific') == 0.5
+
+
+def test_compile_reusable():
+    ev = Evaluator()
+    compiled = ev.compile('2 ^ 8', mode='scientific')
+    assert compiled() == 256
+    assert compiled() == 256
+    assert ev.compile('2 ^ 8', mode='scientific') is compiled
+    assert ev.compile('2 ^ 8', mode='programmer')() == 10
+
+
+def test_compile_cache_counters():
+    ev = Evaluator(cache_size=2)
+    ev.evaluate('1+1')
+    ev.evaluate('1+1')
+    ev.evaluate('2+2')
+    ev.evaluate('3+3')  # evicts '1+1'
+    ev.evaluate('1+1')
+    info = ev.cache_info()
+    assert (info.hits, info.misses, info.evictions) == (1, 4, 2)
+    assert info.currsize == 2
+    ev.cache_clear()
+    assert ev.cache_info().currsize == 0
+
+
+def test_compile_cache_disabled():
+    ev = Evaluator(cache_size=0)
+    assert ev.compile('1+1') is not ev.compile('1+1')
+    assert ev.cache_info().currsize == 0
+
+
+def test_tokenize_whitespace_separates_tokens():
+    ev = Evaluator()
+    assert ev.tokenize('1\t+ 0xFF') == [('NUMBER', '1'), ('OP', '+'), ('NUMBER', '0xFF')]
+    with pytest.raises(EvalError):
+        ev.evaluate('1 2', mode='basic')
+
+
+def test_tokenize_error_column():
+    ev = Evaluator()
+    with pytest.raises(TokenError) as exc:
+        ev.tokenize('1 + $ 2')
+    assert exc.value.column == 5
+
+
+def test_variables():
+    ev = Evaluator()
+    assert ev.evaluate('sqrt(x^2 + y^2) * k', mode='scientific', x=3, y=4, k=2) == 10
+    assert ev.compile('a * b + a').variables == ('a', 'b')
+    with pytest.raises(EvalError):
+        ev.evaluate('x + 1', mode='basic')
+
+
+def test_function_tables_are_shared_and_read_only():
+    import math
+    from kalc_engine.evaluator import FUNCTIONS
+    a, b = Evaluator(), Evaluator()
+    assert a.functions is b.functions is FUNCTIONS
+    with pytest.raises(TypeError):
+        a.functions['hypot'] = math.hypot
+    a.evaluate('sin(0)', mode='scientific')
+    a.add_function('sin', lambda x: 42)
+    assert a.evaluate('sin(0)', mode='scientific') == 42
+    assert b.evaluate('sin(0)', mode='scientific') == 0.0
+    # a rebound built-in is not constant-folded as the original
+    c = Evaluator(jit_threshold=0)
+    c.add_function('sqrt', lambda x: -1)
+    assert c.evaluate('sqrt(4) + 1', mode='scientific') == 0
+
+
+@pytest.mark.parametrize('jit', [8, 0])
+@pytest.mark.parametrize('expr,mode,limit', [
+    ('0x2 ** 0x40000000', 'basic', 'max_exponent'),
+    ('0xFF ** 999999', 'programmer', 'max_exponent'),
+    ('3 ** 60000', 'programmer', 'max_int_bits'),
+    ('1 << 10 ** 9', 'programmer', 'max_shift'),
+    ('x << 60000 << 60000', 'programmer', 'max_int_bits'),
+    ('(1 << 60000) * (1 << 60000)', 'programmer', 'max_int_bits'),
+    ('0x' + 'F' * 20000, 'basic', 'max_int_bits'),
+    ('(' * 2000 + '1' + ')' * 2000, 'basic', 'max_depth'),
+    ('+'.join(['1'] * 60000), 'basic', 'max_tokens'),
+])
+def test_limits(expr, mode, limit, jit):
+    from kalc_engine.evaluator import LimitError
+    ev = Evaluator(jit_threshold=jit)
+    with pytest.raises(LimitError) as exc:
+        ev.evaluate(expr, mode=mode, x=1)
+    assert exc.value.limit == limit
+
+
+def test_limits_configurable():
+    from kalc_engine.evaluator import LimitError, Limits
+    ev = Evaluator(limits=Limits(max_int_bits=64), jit_threshold=0)
+    assert ev.evaluate('x << 63', mode='programmer', x=1) == 1 << 63
+    with pytest.raises(LimitError):
+        ev.evaluate('x << 64', mode='programmer', x=1)
+    with pytest.raises(LimitError):
+        ev.evaluate('2 ** 100', mode='programmer')  # not constant-folded past the limit
+    assert ev.evaluate('2.0 ** 100', mode='scientific') == 2.0 ** 100  # floats can't grow
+    with pytest.raises(LimitError):
+        ev.eval_rpn(ev.to_rpn(ev.tokenize('0xFF * 0xFF ** 0x8'), 'basic'), 'basic')
+    ev.set_limits(None)
+    assert ev.evaluate('2 ** 100', mode='programmer') == 2 ** 100
+
+
+def test_default_limits_results_print():
+    from kalc_engine.evaluator import LimitError
+    ev = Evaluator()
+    assert len(str(ev.evaluate('-(1 << 13999)', mode='programmer'))) > 4200
+    with pytest.raises(LimitError):
+        ev.evaluate('(1 << 13999) * 2', mode='programmer')
+
+
+@pytest.mark.parametrize('jit', [8, 0])
+def test_time_budget(jit):
+    import pickle
+    from kalc_engine.evaluator import LimitError, Limits
+    ev = Evaluator(limits=Limits(max_int_bits=None, time_budget=0.01), jit_threshold=jit)
+    expr = ' + '.join(f'x ** {40000 + i} % 7' for i in range(500))
+    with pytest.raises(LimitError) as exc:
+        ev.evaluate(expr, mode='programmer', x=3)
+    assert pickle.loads(pickle.dumps(exc.value)).limit == 'time_budget'
+    assert ev.evaluate('x * 2', mode='programmer', x=3) == 6
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+from kalc_engine.batch import run_batch
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.ingest import evaluate_file
+
+LINES = ['1 + 1', '.mode scientific', '2 ^ 3', '# comment', '', 'sqrt(16)', '.mode programmer',
+         '0xF0 | 0x0F', 'bad $', '5 ^ 1']
+
+
+def write(tmp_path, lines, newline='\n'):
+    path = tmp_path / 'exprs.txt'
+    path.write_bytes(newline.join(lines).encode('ascii') + newline.encode('ascii'))
+    return str(path)
+
+
+def test_matches_streaming_batch(tmp_path):
+    path = write(tmp_path, LINES * 50)
+    for json_lines in (False, True):
+        expected = io.StringIO()
+        run_batch(LINES * 50, expected, json_lines=json_lines)
+        for jobs in (1, 2):
+            out = io.StringIO()
+            # tiny ranges so that modes and line numbers have to carry across them
+            assert evaluate_file(path, out, json_lines=json_lines, jobs=jobs, range_size=64) == 50
+            assert out.getvalue() == expected.getvalue()
+
+
+def test_command_spellings_carry_across_ranges(tmp_path):
+    # spelled the way batch.command accepts them, not just '.mode'
+    lines = ['5 ^ 2'] * 50 + ['. mode programmer'] + ['5 ^ 2'] * 50
+    lines += ['  .MODE  scientific', '5 ^ 2', '\t. exit', '1 + 1']
+    path = write(tmp_path, lines)
+    expected = io.StringIO()
+    run_batch(lines, expected)
+    assert expected.getvalue().splitlines()[-2:] == ['7', '25.0']
+    for jobs in (1, 2):
+        out = io.StringIO()
+        evaluate_file(path, out, jobs=jobs, range_size=64)
+        assert out.getvalue() == expected.getvalue()
+
+
+def test_unprintable_result(tmp_path):
+    path = write(tmp_path, ['.mode programmer', '2**20000', '1+1'])
+    out = io.StringIO()
+    assert evaluate_file(path, out, ev=Evaluator(limits=None)) == 1
+    assert out.getvalue().splitlines()[1] == '2'
+
+
+def test_interrupt_surfaces_not_buffer_error(tmp_path):
+    class Interrupt(BaseException):
+        pass
+
+    def interrupt(*args):
+        raise Interrupt
+
+    ev = Evaluator()
+    ev.evaluate = interrupt
+    with pytest.raises(Interrupt):
+        evaluate_file(write(tmp_path, ['1+1', '2+2']), io.StringIO(), ev=ev)
+
+
+def test_exit_and_crlf(tmp_path):
+    path = write(tmp_path, ['1+1', '  .exit', '2+2'], newline='\r\n')
+    out = io.StringIO()
+    assert evaluate_file(path, out, range_size=1) == 0
+    assert out.getvalue() == '2.0\n'
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    assert evaluate_file(str(path), io.StringIO()) == 0
+
+
+def test_compile_memoryview_hits_cache():
+    ev = Evaluator()
+    ev.compile('1+1')
+    view = memoryview(b'1+1 and more')[:3]
+    assert ev.evaluate(view) == 2
+    assert ev.compile(b'1+1') is ev.compile(memoryview(b'1+1'))
+    assert ev.cache_info().currsize == 2  # str and bytes keys are distinct
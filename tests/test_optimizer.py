@@ -0,0 +1,44 @@
+import math
+
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.optimizer import build_dag
+
+
+def dag(expr, mode):
+    ev = Evaluator()
+    return build_dag(ev.compile(expr, mode).program, mode, ev.functions)
+
+
+def test_constant_folding_of_pure_calls():
+    root, nodes = dag('sin(3.14159/2) * 2 + 1', 'scientific')
+    assert root.kind == 'const'
+    assert math.isclose(root.value, math.sin(3.14159 / 2) * 2 + 1)
+
+
+def test_common_subexpressions_are_shared():
+    root, nodes = dag('sqrt(x^2 + y^2) * x + sqrt(x^2 + y^2) * y', 'scientific')
+    calls = [n for n in nodes if n.kind == 'call']
+    assert len(calls) == 1 and calls[0].uses == 2
+    assert len([n for n in nodes if n.kind == 'var']) == 2
+
+
+def test_identities_respect_types():
+    # float x: x*1 and x-0 vanish, x+0 stays (-0.0 + 0.0 is 0.0)
+    root, _ = dag('sqrt(x) * 1 - 0', 'scientific')
+    assert root.kind == 'call'
+    root, _ = dag('sqrt(x) + 0', 'scientific')
+    assert root.op == '+'
+    # unknown type: a variable could be an int, and x * 1.0 would make it a float
+    root, _ = dag('x * 1', 'basic')
+    assert root.op == '*'
+    # int x in programmer mode
+    root, _ = dag('(x & 0xFF) + 0 | 0 << 0', 'programmer')
+    assert root.op == '&'
+
+
+def test_errors_are_not_folded_away():
+    root, _ = dag('1 / 0', 'basic')
+    assert root.kind == 'op'
+    ev = Evaluator()
+    assert ev.evaluate('-0.0 + x - 0', mode='basic', x=-0.0) == 0.0
+    assert math.copysign(1.0, ev.evaluate('sqrt(x) * -1 - 0', mode='scientific', x=0.0)) < 0
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+from kalc_engine.batch import run_batch
+from kalc_engine.evaluator import Evaluator, EvalError, TokenError
+
+
+def test_evaluate_many_keeps_order():
+    ev = Evaluator()
+    exprs = [f'{i} * 2' for i in range(1000)]
+    assert list(ev.evaluate_many(exprs, mode='basic', workers=2, chunk_size=64)) == [i * 2.0 for i in range(1000)]
+
+
+def test_evaluate_many_errors():
+    ev = Evaluator()
+    res = list(ev.evaluate_many(['1+1', '1 $', '2'], workers=2, chunk_size=1, return_exceptions=True))
+    assert res[0] == 2 and res[2] == 2
+    assert isinstance(res[1], TokenError) and res[1].column == 3
+    with pytest.raises(EvalError):
+        list(ev.evaluate_many(['1+1', '1 +'], workers=2))
+
+
+def test_batch_jobs_matches_serial():
+    lines = ['1 + 1', '.mode programmer', '0xF0 | 0x0F', '1 +'] * 600
+    serial, parallel = io.StringIO(), io.StringIO()
+    assert run_batch(lines, serial) == run_batch(lines, parallel, jobs=2) == 600
+    assert serial.getvalue() == parallel.getvalue()
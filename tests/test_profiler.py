@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from kalc_engine.__main__ import main
+from kalc_engine.evaluator import Evaluator, EvalError
+
+INPUT = os.path.join(os.path.dirname(__file__), 'test_input.txt')
+
+
+def test_stats_off_by_default():
+    ev = Evaluator()
+    assert ev.profile is None and ev.stats() is None
+    ev.set_profiling(True)
+    ev.evaluate('1 + 1')
+    assert ev.stats()['evaluations'] == 1
+    ev.set_profiling(False)
+    assert ev.stats() is None
+
+
+def test_stage_and_operator_counters():
+    ev = Evaluator(profile=True, jit_threshold=2)
+    for x in range(5):
+        ev.evaluate('sqrt(x) * 2 + sqrt(4)', 'scientific', x=x)
+    snap = ev.stats()
+    assert snap['evaluations'] == 5
+    stages = snap['stages']
+    assert stages['compile']['calls'] == stages['execute']['calls'] == 5
+    assert stages['tokenize']['calls'] == stages['to_rpn']['calls'] == stages['assemble']['calls'] == 1
+    assert stages['codegen']['calls'] == 1
+    assert all(rec['seconds'] >= 0 for rec in stages.values())
+    assert snap['ops'] == {'*': 5, '+': 5}
+    assert snap['functions'] == {'sqrt': 10}
+    assert snap['cache']['hits'] == 4 and snap['cache']['misses'] == 1
+    assert snap['cache']['hit_rate'] == pytest.approx(0.8)
+
+
+def test_errors_and_reset():
+    ev = Evaluator(profile=True)
+    for expr in ('1 / 0', '1 +', '2 $'):
+        with pytest.raises((EvalError, ZeroDivisionError)):
+            ev.evaluate(expr)
+    assert ev.stats()['errors'] == {'execute: ZeroDivisionError': 1, 'execute: EvalError': 1,
+                                    'compile: TokenError': 1}
+    ev.stats_reset()
+    snap = ev.stats()
+    assert snap['evaluations'] == 0 and snap['errors'] == {} and snap['cache']['hits'] == 0
+    # the cache survives a reset
+    ev.evaluate('1 / 2')
+    ev.evaluate('1 / 2')
+    assert ev.stats()['cache']['hits'] == 1
+
+
+def test_cli_profile(capsys):
+    assert main(['--batch', '--profile', INPUT]) == 0
+    captured = capsys.readouterr()
+    assert captured.out == '4.0\n0.0\n15\n'
+    assert 'evaluations: 3' in captured.err and 'execute' in captured.err
+    with pytest.raises(SystemExit):
+        main(['--batch', '--profile', '--jobs', '2', INPUT])
@@ -0,0 +1,32 @@
+import pickle
+
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.program import EXTENDED_ARG, Program
+
+
+def test_round_trip_to_rpn():
+    ev = Evaluator()
+    for expr, mode in [('0xFF & 0b1010 | 0o7', 'basic'), ('sin(x) * 2.5e-3 + x', 'scientific'),
+                       ('~5 ^ 2 << 1', 'programmer')]:
+        rpn = ev.to_rpn(ev.tokenize(expr), mode)
+        program = Program.from_rpn(rpn, mode)
+        assert program.run(mode, ev.functions, {'x': 0.5}) == ev.eval_rpn(rpn, mode, {'x': 0.5})
+        assert Program.from_rpn(program.to_rpn(), mode) == program
+
+
+def test_constant_pool_and_extended_args():
+    ev = Evaluator()
+    expr = '+'.join(str(i) for i in range(300)) + '+1+1'
+    program = ev.compile(expr).program
+    assert len(program.consts) == 300  # '1' is stored once
+    assert EXTENDED_ARG in program.code[::2]
+    assert program.run('basic', ev.functions) == sum(range(300)) + 2
+
+
+def test_pickle():
+    ev = Evaluator()
+    compiled = ev.compile('sqrt(x^2 + y^2)', mode='scientific')
+    program = pickle.loads(pickle.dumps(compiled.program))
+    assert program == compiled.program
+    clone = pickle.loads(pickle.dumps(compiled))
+    assert clone.expr == compiled.expr and clone(x=3, y=4) == 5
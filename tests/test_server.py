@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+from kalc_engine import server as srv
+from kalc_engine.evaluator import Evaluator
+from kalc_engine.server import Server
+
+
+async def roundtrip(server, requests, path=None):
+    if path is None:
+        host, port = server.address().rsplit(':', 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+    else:
+        reader, writer = await asyncio.open_unix_connection(path)
+    # pipelined: everything is sent before the first response is read
+    writer.write(b''.join((r if isinstance(r, bytes) else json.dumps(r).encode()) + b'\n' for r in requests))
+    await writer.drain()
+    out = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    return out
+
+
+def run(requests, workers=0, path=None, ev=None):
+    async def main():
+        server = Server('basic', workers, ev)
+        await server.start('127.0.0.1', 0, path)
+        try:
+            return await roundtrip(server, requests, path), server.snapshot()
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_requests_and_errors():
+    out, stats = run([
+        {'id': 1, 'expr': '2 ^ 8', 'mode': 'scientific'},
+        {'id': 'b', 'expr': 'x * y', 'vars': {'x': 6, 'y': 7}},
+        {'exprs': ['1 + 1', '1 +']},
+        {'id': 4, 'expr': 'x + 1'},
+        b'not json',
+        {'id': 6, 'expr': '1', 'mode': 'hex'},
+        {'id': 7, 'op': 'ping'},
+    ])
+    assert out[0] == {'id': 1, 'result': 256.0}
+    assert out[1] == {'id': 'b', 'result': 42.0}
+    assert out[2] == {'results': [{'result': 2.0}, {'error': 'Malformed expression'}]}
+    assert out[3] == {'id': 4, 'error': 'Unknown variable: x'}
+    assert out[4] == {'error': 'Invalid JSON'}
+    assert out[5] == {'id': 6, 'error': 'Unknown mode: hex'}
+    assert out[6] == {'id': 7, 'ok': True}
+    assert stats['requests'] == 6 and stats['errors'] == 4 and stats['expressions'] == 5
+
+
+def test_offloaded_responses_keep_order(monkeypatch):
+    monkeypatch.setattr(srv, 'OFFLOAD_MIN', 3)
+    big = [f'{i} * 2' for i in range(1200)]
+    out, stats = run([{'id': 0, 'exprs': big}, {'id': 1, 'expr': '1 + 1'}, {'id': 2, 'exprs': ['1', '2', '1 $']}],
+                     workers=2)
+    assert [r['id'] for r in out] == [0, 1, 2]
+    assert [r['result'] for r in out[0]['results']] == [i * 2.0 for i in range(1200)]
+    assert out[1]['result'] == 2.0
+    assert out[2]['results'][2] == {'error': "Unknown token at column 3: '$'"}
+
+
+def test_unencodable_result_keeps_connection(monkeypatch):
+    monkeypatch.setattr(srv, 'OFFLOAD_MIN', 2)
+    huge = {'expr': '2 ** 20000', 'mode': 'programmer'}  # no limits: evaluates, but has no JSON form
+    out, stats = run([{'id': 1, **huge}, {'id': 2, 'exprs': ['1 + 1', huge['expr']], 'mode': 'programmer'},
+                      {'id': 3, 'expr': '1 + 1'}], workers=1, ev=Evaluator(limits=None))
+    assert list(out[0]) == ['id', 'error'] and out[0]['id'] == 1
+    assert out[1]['results'][0] == {'result': 2} and 'error' in out[1]['results'][1]
+    assert out[2] == {'id': 3, 'result': 2.0}
+    assert stats['errors'] == 2
+
+
+def test_close_cancels_queued_work():
+    async def main():
+        server = Server('basic', 1)
+        exprs = ['1 + 1'] * 20 * srv.DEFAULT_CHUNK_SIZE
+        task = asyncio.ensure_future(server.offload({'mode': 'basic', 'exprs': exprs}))
+        await asyncio.sleep(0)  # submitted, mostly still queued
+        pending = list(server._pending)
+        await server.close()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pending
+    pending = asyncio.run(main())
+    assert any(f.cancelled() for f in pending)
+
+
+def test_stats_op():
+    out, _ = run([{'expr': '1'}] * 10 + [{'op': 'stats'}])
+    stats = out[-1]['stats']
+    assert stats['requests'] == 10 and stats['connections'] == 1
+    assert stats['cache']['hits'] == 9
+    assert 0 <= stats['latency_ms']['p50'] <= stats['latency_ms']['p99'] <= stats['latency_ms']['max']
+
+
+def test_unix_socket(tmp_path):
+    if not hasattr(asyncio, 'open_unix_connection'):
+        pytest.skip('no Unix sockets')
+    out, _ = run([{'expr': '0xF0 | 0x0F', 'mode': 'programmer'}], path=str(tmp_path / 'kalc.sock'))
+    assert out == [{'result': 255}]
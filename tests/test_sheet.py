@@ -0,0 +1,113 @@
+import pytest
+from kalc_engine.evaluator import EvalError
+from kalc_engine.sheet import CycleError, Sheet
+
+
+def test_recalculates_downstream():
+    sheet = Sheet()
+    sheet['a'] = 2
+    sheet['b'] = 3
+    sheet['total'] = 'a + b'
+    sheet['tax'] = 'total * 0.2'
+    assert sheet['total'] == 5 and sheet['tax'] == pytest.approx(1.0)
+    sheet['a'] = 7
+    assert sheet['total'] == 10 and sheet['tax'] == pytest.approx(2.0)
+    assert sheet.dependencies('tax') == ('total',)
+    assert sheet.dependents('total') == ['tax']
+    assert sheet.formula('tax') == 'total * 0.2' and sheet.formula('a') is None
+
+
+def test_only_dirty_cells_are_recomputed(monkeypatch):
+    sheet = Sheet()
+    sheet.update({'x': 1, 'y': 1, 'fx': 'x * 2', 'fy': 'y * 2', 'zero': 'fx - fx', 'tail': 'zero + 1'})
+    computed = []
+    real = Sheet._compute
+
+    def spy(self, compiled, deps):
+        computed.append(compiled.expr)
+        return real(self, compiled, deps)
+
+    monkeypatch.setattr(Sheet, '_compute', spy)
+    sheet['y'] = 5
+    assert computed == ['y * 2'] and sheet['fy'] == 10
+    computed.clear()
+    # 'zero' is recomputed but stays 0, so 'tail' is left alone
+    sheet['x'] = 3
+    assert sorted(computed) == ['fx - fx', 'x * 2'] and sheet['fx'] == 6 and sheet['tail'] == 1
+
+
+def test_batch_is_one_pass(monkeypatch):
+    sheet = Sheet()
+    sheet.update({'a': 1, 'b': 2, 'c': 'a + b'})
+    passes = []
+    real = Sheet.recalculate
+
+    def counting(self):
+        passes.append(set(self._dirty))
+        return real(self)
+
+    monkeypatch.setattr(Sheet, 'recalculate', counting)
+    with sheet.batch():
+        sheet['a'] = 10
+        sheet['b'] = 20
+        with sheet.batch():
+            sheet['d'] = 'c * 2'
+    assert passes == [{'a', 'b', 'd'}]
+    assert sheet['d'] == 60
+
+
+def test_topological_order_on_diamond():
+    sheet = Sheet()
+    sheet.update({'d': 'b + c', 'b': 'a * 2', 'c': 'a * 3', 'a': 1})
+    assert sheet['d'] == 5
+    sheet['a'] = 2
+    assert sheet['d'] == 10
+
+
+def test_cycles_are_rejected():
+    sheet = Sheet()
+    sheet.update({'a': 'b + 1', 'b': 'c + 1', 'c': 1})
+    with pytest.raises(CycleError) as info:
+        sheet['c'] = 'a * 2'
+    assert info.value.cycle == ('c', 'a', 'b', 'c')
+    assert sheet['a'] == 3  # sheet unchanged
+    with pytest.raises(CycleError):
+        sheet['x'] = 'x + 1'
+
+
+def test_errors_propagate_and_clear():
+    sheet = Sheet()
+    sheet['ratio'] = 'num / den'
+    sheet['pct'] = 'ratio * 100'
+    with pytest.raises(EvalError, match='Unknown cell: num'):
+        sheet['pct']
+    sheet.update({'num': 1, 'den': 0})
+    with pytest.raises(ZeroDivisionError):
+        sheet['pct']
+    assert isinstance(sheet.get('ratio'), ZeroDivisionError)
+    sheet['den'] = 4
+    assert sheet['pct'] == 25
+    del sheet['num']
+    with pytest.raises(EvalError):
+        sheet['pct']
+
+
+def test_invalid_cells():
+    sheet = Sheet()
+    with pytest.raises(ValueError):
+        sheet['sin'] = 1
+    with pytest.raises(ValueError):
+        sheet['1a'] = 1
+    with pytest.raises(TypeError):
+        sheet['a'] = [1]
+    with pytest.raises(EvalError):
+        sheet['a'] = '1 $'
+    assert 'a' not in sheet and len(sheet) == 0
+    sheet['a'] = '1 +'
+    assert isinstance(sheet.get('a'), EvalError)
+
+
+def test_programmer_mode_and_self_name():
+    sheet = Sheet('programmer')
+    sheet.update({'self': 0xF0, 'mask': 'self | 0x0F'})
+    assert sheet['mask'] == 0xFF
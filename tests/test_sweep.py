@@ -0,0 +1,71 @@
+import io
+import math
+from array import array
+
+import pytest
+from kalc_engine import vector
+from kalc_engine.evaluator import EvalError, Evaluator
+from kalc_engine.sweep import count_points, sweep, sweep_chunks, write_binary, write_csv
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(vector, 'np', None)
+    return request.param
+
+
+def test_count_points():
+    assert count_points(0, 1, 0.1) == 11  # stop included despite rounding
+    assert count_points(0, 1e6, 0.01) == 100_000_001
+    assert count_points(10, 0, -2) == 6
+    assert count_points(1, 0, 0.5) == 0
+    with pytest.raises(ValueError):
+        count_points(0, 1, 0)
+
+
+def test_sweep_matches_evaluate(backend):
+    ev = Evaluator()
+    points = list(ev.sweep('sin(x) * exp(-x / 10) + k', 'x', 0, 5, 0.25, mode='scientific', k=1))
+    assert len(points) == 21
+    for i, (x, y) in enumerate(points):
+        assert x == i * 0.25
+        assert math.isclose(y, ev.evaluate('sin(x) * exp(-x / 10) + k', mode='scientific', x=x, k=1))
+    assert [y for _, y in sweep('x << 2', 'x', 0, 8, 4, mode='programmer')] == [0, 16, 32]
+
+
+def test_sweep_chunks_and_failures(backend):
+    chunks = list(sweep_chunks('sqrt(x)', 'x', -2, 4, 1, mode='scientific', chunk_size=4))
+    assert [len(xs) for xs, _ in chunks] == [4, 3]
+    ys = [y for _, col in chunks for y in list(col)]
+    assert math.isnan(ys[0]) and math.isnan(ys[1])
+    assert ys[2:] == [0.0, 1.0, math.sqrt(2), math.sqrt(3), 2.0]
+    # argument errors surface at the call, not on the first chunk
+    with pytest.raises(EvalError):
+        sweep_chunks('x + y', 'x', 0, 1, 1)
+    with pytest.raises(ValueError):
+        sweep_chunks('x', 'x', 0, 1, 0)
+
+
+def test_writers(backend):
+    out = io.StringIO()
+    assert write_csv(sweep_chunks('x * 2', 'x', 0, 1, 0.5, chunk_size=2), out, header=('x', 'f(x, 2)')) == 3
+    assert out.getvalue() == 'x,"f(x, 2)"\n0.0,0.0\n0.5,1.0\n1.0,2.0\n'
+    raw = io.BytesIO()
+    assert write_binary(sweep_chunks('x * 2', 'x', 0, 3, 1, chunk_size=3), raw) == 4
+    assert list(array('d', raw.getvalue())) == [0.0, 0.0, 1.0, 2.0, 2.0, 4.0, 3.0, 6.0]
+
+
+def test_repl_table(tmp_path, capsys):
+    from kalc_engine.__main__ import table
+    ev = Evaluator()
+    table(ev, 'x >> 1 x 0 0x4 2', 'programmer')
+    assert capsys.readouterr().out.split() == ['x', 'x', '>>', '1', '0', '0', '2', '1', '4', '2']
+    path = tmp_path / 't.csv'
+    table(ev, f'x ^ 2 x 1 3 1 > {path}', 'basic')
+    assert capsys.readouterr().out == f'3 rows written to {path}\n'
+    assert path.read_text() == 'x,x ^ 2\n1.0,1.0\n2.0,4.0\n3.0,9.0\n'
+    table(ev, 'y x 0 1 1', 'basic')
+    assert capsys.readouterr().out == 'Error: Unknown variable: y\n'
@@ -0,0 +1,40 @@
+import pytest
+from kalc_engine import vector
+from kalc_engine.evaluator import Evaluator, EvalError, Limits
+
+
+def test_batch_pure_python(monkeypatch):
+    monkeypatch.setattr(vector, 'np', None)
+    ev = Evaluator()
+    res = ev.evaluate_batch('sqrt(x^2 + y^2) * k', mode='scientific', x=[3, 6], y=[4, 8], k=2)
+    assert res == [10.0, 20.0]
+
+
+def test_batch_mismatched_columns():
+    ev = Evaluator()
+    with pytest.raises(ValueError):
+        ev.evaluate_batch('x + y', x=[1, 2], y=[1])
+
+
+def test_batch_numpy():
+    np = pytest.importorskip('numpy')
+    ev = Evaluator()
+    x = np.arange(5, dtype=float)
+    res = ev.evaluate_batch('sin(x) * k + 1', mode='scientific', x=x, k=2.0)
+    assert np.allclose(res, np.sin(x) * 2 + 1)
+    assert list(ev.evaluate_batch('x & 0xF ^ 1', mode='programmer', x=[0xFF, 3])) == [14, 2]
+    with pytest.raises(EvalError):
+        ev.evaluate_batch('x | 1', mode='programmer', x=[1.5])
+
+
+def test_batch_int_overflow_matches_evaluate():
+    pytest.importorskip('numpy')
+    ev = Evaluator()
+    # int64 would wrap these; the result must be what evaluate() gives
+    assert ev.evaluate_batch('x * x', x=[2**40, 3]).tolist() == [2**80, 9]
+    assert ev.evaluate_batch('x << 70', mode='programmer', x=[1, 2]).tolist() == [2**70, 2**71]
+    assert ev.evaluate_batch('-x', x=[-2**63]).tolist() == [2**63]
+    assert ev.evaluate_batch('x + 0xFFFFFFFFFFFFFFFFFF', mode='programmer', x=[1]).tolist() == [2**72]
+    assert ev.evaluate_batch('x ** y', mode='programmer', x=[2, 3], y=[-1, 40]).tolist() == [0.5, 3**40]
+    with pytest.raises(EvalError):
+        Evaluator(limits=Limits(max_int_bits=100)).evaluate_batch('x << 99', mode='programmer', x=[1, 2])
@@ -0,0 +1,113 @@
+import io
+
+import pytest
+from kalc_engine.batch import run_batch
+from kalc_engine.evaluator import WORD_MODES, EvalError, Evaluator, parse_mode
+from kalc_engine.program import Program
+from kalc_engine.word import WORDS
+
+I32, U32 = 'programmer:i32', 'programmer:u32'
+
+
+@pytest.fixture(params=['interpreted', 'native'])
+def ev(request):
+    return Evaluator(jit_threshold=0 if request.param == 'native' else 1_000_000)
+
+
+def test_parse_mode():
+    assert parse_mode(['programmer', '32']) == I32
+    assert parse_mode(['programmer', '32', 'signed']) == I32
+    assert parse_mode(['programmer', '32', 'unsigned']) == U32
+    assert parse_mode(['programmer']) == 'programmer'
+    assert parse_mode(['programmer:u8']) == 'programmer:u8'
+    for bad in ([], ['programmer', '12'], ['programmer', '32', 'x'], ['basic', '32'], ['nope']):
+        assert parse_mode(bad) is None
+
+
+@pytest.mark.parametrize('expr, signed, unsigned', [
+    ('~0', -1, 0xFFFFFFFF),
+    ('0xFFFFFFFF + 1', 0, 0),
+    ('-1', -1, 0xFFFFFFFF),
+    ('0x7FFFFFFF + 1', -2**31, 2**31),
+    ('1 << 31', -2**31, 2**31),
+    ('1 << 32', 0, 0),
+    ('0x80000000 >> 40', -1, 0),
+    ('7 / -2', -3, 0),  # truncated; in u32 -2 is 0xFFFFFFFE
+    ('-7 % 2', -1, 1),
+    ('0x80000000 / -1', -2**31, 0),
+    ('3 ^ 5', 6, 6),  # xor, as in programmer mode
+    ('2 ** 40', 0, 0),
+    ('3 ** 21', 3**21 % 2**32, 3**21 % 2**32),
+    ('0xDEADBEEF * 0xDEADBEEF', 0xDEADBEEF**2 % 2**32, 0xDEADBEEF**2 % 2**32),
+])
+def test_wraparound(ev, expr, signed, unsigned):
+    assert ev.evaluate(expr, I32) == signed
+    assert ev.evaluate(expr, U32) == unsigned
+
+
+def test_widths(ev):
+    assert ev.evaluate('127 + 1', 'programmer:i8') == -128
+    assert ev.evaluate('~0', 'programmer:u16') == 0xFFFF
+    assert ev.evaluate('1 << 63', 'programmer:i64') == -2**63
+    assert ev.evaluate('0 - 1', 'programmer:u64') == 2**64 - 1
+    for mode in WORD_MODES:
+        word = WORDS[mode]
+        lo = -word.half if word.signed else 0
+        assert ev.evaluate('x * x + y', mode, x=0xDEADBEEFCAFE, y=-5) in range(lo, lo + word.mask + 1)
+
+
+def test_values_and_errors(ev):
+    assert ev.evaluate('x + 1', U32, x=2**32 - 1) == 0
+    assert ev.evaluate('x + 1', I32, x=4.0) == 5  # an integral float is accepted
+    assert ev.evaluate('sqrt(x)', U32, x=16) == 4
+    with pytest.raises(EvalError):
+        ev.evaluate('x + 1', I32, x=1.5)
+    with pytest.raises(EvalError):
+        ev.evaluate('sqrt(2)', I32)
+    with pytest.raises(EvalError, match='integer literals'):
+        ev.evaluate('1.5 + 1', I32)
+    with pytest.raises(ZeroDivisionError):
+        ev.evaluate('x / 0', I32, x=1)
+    with pytest.raises(EvalError):
+        ev.evaluate('2 ** -1', I32)
+    with pytest.raises(EvalError, match='Unknown variable'):
+        ev.evaluate('x + 1', I32)
+
+
+def test_no_bignums_or_floats():
+    # results stay ints of the word even where unbounded mode would grow or go to float
+    ev = Evaluator(limits=None)
+    assert ev.evaluate('0xFF ** 9999 & 0xFF', 'programmer:u8') == 0xFF
+    assert type(ev.evaluate('(1 << 100) + 10 / 4', U32)) is int
+
+
+def test_eval_rpn_and_program_agree():
+    ev = Evaluator()
+    expr = '(x * 0x9E3779B9 ^ x >> 16) + ~y - (y << 3) % 7'
+    for mode in WORD_MODES:
+        rpn = ev.to_rpn(ev.tokenize(expr), mode)
+        env = {'x': 0x12345678, 'y': 99}
+        expected = Program.from_rpn(rpn, mode).run(mode, ev.functions, env)
+        assert ev.eval_rpn(rpn, mode, env) == expected
+        assert ev.compile(expr, mode)(**env) == expected
+
+
+def test_evaluate_batch_dtype():
+    np = pytest.importorskip('numpy')
+    ev = Evaluator()
+    xs = np.arange(-5, 5, dtype=np.int64)
+    out = ev.evaluate_batch('(x * 0x9E3779B9) >> 3 ^ ~x / 3', U32, x=xs)
+    assert out.dtype == np.uint32
+    assert out.tolist() == [ev.evaluate('(x * 0x9E3779B9) >> 3 ^ ~x / 3', U32, x=int(x)) for x in xs]
+    out = ev.evaluate_batch('x << s', 'programmer:i64', x=[1, -1, 3], s=[63, 64, 2])
+    assert out.dtype == np.int64
+    assert out.tolist() == [-2**63, 0, 12]
+    with pytest.raises(ZeroDivisionError):
+        ev.evaluate_batch('1 / x', I32, x=[1, 0])
+
+
+def test_batch_mode_command():
+    out = io.StringIO()
+    src = ['.mode programmer 32 unsigned', '~0', '.mode programmer 8', '127 + 1', '.mode programmer 12', '1']
+    assert run_batch(src, out) == 1
+    assert out.getvalue().splitlines()[:2] == ['4294967295', '-128']